@@ -0,0 +1,191 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.karte_generator import generate_karte
+from services.memory_profile import (MEMORY_STAGE_GROUPS, MEMORY_STAGE_RECORDS, group_records, profile_memory,
+                                     scan_records)
+from services.txt_parse import parse_medical_text
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_THRESHOLD = 0.25
+# これより小さい行数は数ミリ秒で終わり、処理速度の比較が計測の揺らぎに埋もれるため、メモリだけを比較する
+DEFAULT_MIN_CHECK_LINES = 100000
+ITEM_MEMORY_LABELS = {MEMORY_STAGE_RECORDS: 'レコード', MEMORY_STAGE_GROUPS: 'グループ'}
+
+
+def _best_time(function, repeat):
+    best = None
+    result = None
+
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, result
+
+
+def _median_time(function, repeat):
+    times = []
+    result = None
+
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+
+    return statistics.median(times), result
+
+
+def _peak_memory(function):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _memory_per_item(text):
+    # SOAPレコード1件・グループ1件あたりが保持するバイト数
+    stages = {stage.name: stage for stage in profile_memory(text, top=0).stages}
+    return {name: stages[name].retained / stages[name].items if stages[name].items else 0
+            for name in (MEMORY_STAGE_RECORDS, MEMORY_STAGE_GROUPS)}
+
+
+def measure(line_count, repeat=3, seed=0, duplicate_rate=0.1, overlap_rate=0.05):
+    # 行の走査・グループ化・並べ替えと重複除去・JSON化の各段階と全体の時間、全体のピークメモリ、
+    # レコード1件・グループ1件あたりの保持メモリを測る
+    text = generate_karte(line_count, seed=seed, duplicate_rate=duplicate_rate, overlap_rate=overlap_rate)
+
+    scan_time, records = _best_time(lambda: scan_records(text), repeat)
+    group_time, grouper = _best_time(lambda: group_records(records), repeat)
+    result_time, result = _best_time(grouper.result, repeat)
+    json_time, _ = _best_time(lambda: json.dumps(result, indent=2, ensure_ascii=False), repeat)
+    # 劣化判定に使う全体の時間は、たまたま速かった1回ではなく中央値を採る
+    total_time, _ = _median_time(lambda: parse_medical_text(text), repeat)
+
+    return {
+        'lines': line_count,
+        'bytes': len(text.encode('utf-8')),
+        'records': len(records),
+        'groups': len(result),
+        'stages': {
+            'scan': scan_time,
+            'group': group_time,
+            'result': result_time,
+            'json': json_time,
+        },
+        'total': total_time,
+        'lines_per_second': line_count / total_time,
+        'peak_memory': _peak_memory(lambda: parse_medical_text(text)),
+        'item_memory': _memory_per_item(text),
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, min_lines=DEFAULT_MIN_CHECK_LINES):
+    # 基準値より処理速度がthreshold以上落ちた、またはピークメモリがthreshold以上増えた項目を返す
+    # 処理速度はmin_lines行以上の計測だけを比較する
+    regressions = []
+
+    for size, result in current['results'].items():
+        base = baseline['results'].get(size)
+        if base is None:
+            continue
+
+        if int(size) >= min_lines and result['lines_per_second'] < base['lines_per_second'] * (1 - threshold):
+            regressions.append(f"{size}行: 処理速度 {result['lines_per_second']:.0f}行/秒 "
+                               f"(基準 {base['lines_per_second']:.0f}行/秒)")
+
+        if result['peak_memory'] > base['peak_memory'] * (1 + threshold):
+            regressions.append(f"{size}行: ピークメモリ {result['peak_memory'] / 1e6:.1f}MB "
+                               f"(基準 {base['peak_memory'] / 1e6:.1f}MB)")
+
+        # 1件あたりの保持メモリを記録していない古い基準値とは比較しない
+        for name, per_item in result.get('item_memory', {}).items():
+            base_per_item = base.get('item_memory', {}).get(name)
+            if base_per_item and per_item > base_per_item * (1 + threshold):
+                regressions.append(f"{size}行: {ITEM_MEMORY_LABELS[name]}1件あたりのメモリ {per_item:.0f}B (基準 {base_per_item:.0f}B)")
+
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def format_result(result):
+    stages = "  ".join(f"{name} {elapsed * 1000:.1f}ms" for name, elapsed in result['stages'].items())
+    return (f"{result['lines']:>8}行 {result['records']:>7}件 {result['groups']:>6}グループ  "
+            f"全体 {result['total'] * 1000:.1f}ms ({result['lines_per_second']:.0f}行/秒)  "
+            f"ピーク {result['peak_memory'] / 1e6:.1f}MB  "
+            f"1件 {result['item_memory'][MEMORY_STAGE_RECORDS]:.0f}B "
+            f"1グループ {result['item_memory'][MEMORY_STAGE_GROUPS]:.0f}B  [{stages}]")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="カルテ解析のベンチマーク")
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="生成するカルテの行数")
+    parser.add_argument('-n', '--repeat', type=int, default=5,
+                        help="計測回数（各段階は最短時間、全体は中央値を採用）")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="合成カルテの乱数シード")
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help="基準値ファイル")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="計測結果を基準値として保存する")
+    parser.add_argument('--check', action='store_true',
+                        help="基準値と比較し、劣化があれば終了コード1で終了する")
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="劣化とみなす割合")
+    parser.add_argument('--min-check-lines', type=int, default=DEFAULT_MIN_CHECK_LINES,
+                        help="処理速度を比較する最小の行数（これより小さい行数はメモリだけを比較する）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    results = {'python': platform.python_version(), 'results': {}}
+    for line_count in args.sizes:
+        result = measure(line_count, args.repeat, args.seed)
+        results['results'][str(line_count)] = result
+        print(format_result(result))
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"基準値を保存しました: {args.baseline}")
+
+    if args.check:
+        regressions = compare(results, load_baseline(args.baseline), args.threshold, args.min_check_lines)
+        for regression in regressions:
+            print(f"劣化: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("基準値からの劣化はありません")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import random
+from datetime import date, timedelta
+
+DEPARTMENTS = ['内科', '外科', '整形外科', '循環器内科', '消化器内科', '神経内科', '皮膚科', 'リハビリ科']
+DOCTORS = ['山田', '佐藤', '鈴木', '高橋', '田中', '伊藤']
+VISIT_TYPES = ['外来', '入院', '再診', '往診']
+WEEKDAYS = '月火水木金土日'
+
+SOAP_SECTIONS = ['S', 'O', 'A', 'P', 'F', 'サ']
+SOAP_PHRASES = {
+    'S': ['頭痛があります', '食欲はあります', '夜間よく眠れました', '腰の痛みが続いています', '息苦しさはありません'],
+    'O': ['体温 3{n}.{m}度', '血圧 1{n}{m}/7{m}', 'SpO2 9{n}%', '脈拍 {n}{m}回/分', '腹部 平坦 軟'],
+    'A': ['症状は改善傾向', '経過良好', '感染の兆候なし', '疼痛コントロール良好', '脱水の可能性'],
+    'P': ['内服継続', '採血 {n}日後', '点滴 {m}00ml', '経過観察', 'リハビリ継続'],
+    'F': ['家族へ説明済み', '次回外来予約あり', '転倒に注意', '食事摂取量を確認'],
+    'サ': ['退院時サマリー作成', '入院経過の要約', '紹介状作成済み'],
+}
+
+
+def _phrase(rng, section):
+    return rng.choice(SOAP_PHRASES[section]).format(n=rng.randint(1, 9), m=rng.randint(0, 9))
+
+
+def _date_line(day, admission_day):
+    line = f"{day:%Y/%m/%d}({WEEKDAYS[day.weekday()]})"
+    if admission_day:
+        line += f"（入院{admission_day}日目）"
+    return line
+
+
+def _day_block(rng, day, admission_day, duplicate_rate, descending):
+    lines = [_date_line(day, admission_day)]
+
+    minutes = sorted(rng.sample(range(8 * 60, 20 * 60), rng.randint(1, 3)), reverse=descending)
+    for minute in minutes:
+        department = rng.choice(DEPARTMENTS)
+        lines.append(f"{department} {rng.choice(DOCTORS)} {rng.choice(VISIT_TYPES)} {minute // 60:02d}:{minute % 60:02d}")
+
+        for section in rng.sample(SOAP_SECTIONS, rng.randint(2, len(SOAP_SECTIONS))):
+            content = [_phrase(rng, section) for _ in range(rng.randint(1, 4))]
+            lines.append(f"{section} >")
+            lines.extend(content)
+            if rng.random() < duplicate_rate:
+                # 同じ区分に同じ記載を重ねて書いた重複
+                lines.append(f"{section} >")
+                lines.extend(content)
+
+    return lines
+
+
+def generate_karte(line_count, seed=0, duplicate_rate=0.1, overlap_rate=0.05, descending=False):
+    # 日付・入院日数・診療科・1日複数の時刻・全SOAP区分を含む合成カルテを、行数を指定して決定的に生成する
+    # duplicate_rateはSOAP記載の重複率、overlap_rateは直前の日付ブロックを重ねて取り込んだ割合
+    rng = random.Random(seed)
+    day = date(2024, 1, 1)
+    step = timedelta(days=-1 if descending else 1)
+    admission_day = 0
+
+    blocks = []
+    total = 0
+    previous = None
+
+    while total < line_count:
+        if admission_day or rng.random() < 0.3:
+            admission_day = admission_day + 1 if admission_day < 30 else 0
+
+        block = _day_block(rng, day, admission_day, duplicate_rate, descending)
+        if previous and rng.random() < overlap_rate:
+            # 範囲選択コピーが重なった場合のように、直前のブロックの後半を繰り返す
+            block = previous[len(previous) // 2:] + block
+
+        blocks.append(block)
+        total += len(block)
+        previous = block
+        day += step
+
+    lines = [line for block in blocks for line in block][:line_count]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,242 @@
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from services.json_writer import write_json_lines
+from services.memory_profile import profile_memory
+from services.parse_stats import STAGE_JSON, STAGE_READ, ParseStats
+from services.txt_parse import RecordGrouper, iter_medical_records, parse_medical_text
+
+STDIN_PATH = '-'
+OUTPUT_FORMATS = {'json': '.json', 'jsonl': '.jsonl'}
+
+
+def collect_inputs(paths, pattern='*.txt', recursive=False):
+    inputs = []
+
+    for path in paths:
+        if path == STDIN_PATH or not os.path.isdir(path):
+            inputs.append((path, os.path.basename(path)))
+            continue
+
+        for dir_path, dir_names, file_names in os.walk(path):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                if fnmatch.fnmatch(file_name, pattern):
+                    file_path = os.path.join(dir_path, file_name)
+                    inputs.append((file_path, os.path.relpath(file_path, path)))
+            if not recursive:
+                break
+
+    return inputs
+
+
+def get_output_path(input_path, relative_path, output_dir=None, output_format='json'):
+    if input_path == STDIN_PATH:
+        return STDIN_PATH
+
+    extension = OUTPUT_FORMATS[output_format]
+    if output_dir:
+        return os.path.join(output_dir, os.path.splitext(relative_path)[0] + extension)
+
+    return os.path.splitext(input_path)[0] + extension
+
+
+def is_same_file(input_path, output_path):
+    if STDIN_PATH in (input_path, output_path):
+        return False
+    return os.path.normcase(os.path.realpath(input_path)) == os.path.normcase(os.path.realpath(output_path))
+
+
+def open_output(output_path):
+    if output_path == STDIN_PATH:
+        return sys.stdout
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    return open(output_path, 'w', encoding='utf-8')
+
+
+def convert_file_to_json_lines(input_path, output_path, encoding='utf-8', stats=None):
+    grouper = RecordGrouper(stats)
+
+    if input_path == STDIN_PATH:
+        grouper.add_all(iter_medical_records(sys.stdin, stats=stats))
+    else:
+        with open(input_path, 'r', encoding=encoding) as f:
+            grouper.add_all(iter_medical_records(f, stats=stats))
+
+    output = open_output(output_path)
+    try:
+        if stats is None:
+            return write_json_lines(grouper.iter_result(), output)
+
+        stats.start(STAGE_JSON)
+        try:
+            return write_json_lines(grouper.iter_result(), output)
+        finally:
+            stats.stop()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def read_text(input_path, encoding='utf-8'):
+    if input_path == STDIN_PATH:
+        return sys.stdin.read()
+
+    with open(input_path, 'r', encoding=encoding) as f:
+        return f.read()
+
+
+def convert_file(input_path, output_path, encoding='utf-8', output_format='json', stats=None, workers=None):
+    # workersを指定すると、1つのファイルを日付の区切りで分割して複数プロセスで解析する（json形式のみ）
+    start = time.perf_counter()
+
+    try:
+        if is_same_file(input_path, output_path):
+            # 入力と同じ拡張子のファイルを指定した場合に、入力を変換結果で上書きしない
+            raise ValueError(f"出力先が入力ファイルと同じです: {output_path}")
+
+        if output_format == 'jsonl':
+            record_count = convert_file_to_json_lines(input_path, output_path, encoding, stats)
+            return input_path, record_count, time.perf_counter() - start, None
+
+        if stats is None:
+            text = read_text(input_path, encoding)
+            parsed_data = parse_medical_text(text, workers)
+            json_data = json.dumps(parsed_data, indent=2, ensure_ascii=False)
+        else:
+            stats.start(STAGE_READ)
+            text = read_text(input_path, encoding)
+            stats.stop()
+
+            parsed_data = parse_medical_text(text, workers, stats)
+
+            stats.start(STAGE_JSON)
+            json_data = json.dumps(parsed_data, indent=2, ensure_ascii=False)
+            stats.stop()
+
+        if output_path == STDIN_PATH:
+            sys.stdout.write(json_data + '\n')
+            sys.stdout.flush()
+        else:
+            with open_output(output_path) as f:
+                f.write(json_data)
+
+        return input_path, len(parsed_data), time.perf_counter() - start, None
+    except Exception as e:
+        return input_path, 0, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+
+def convert_file_with_stats(input_path, output_path, encoding='utf-8', output_format='json', collect_stats=False,
+                            workers=None):
+    # 計測結果は変換を実行したプロセスから結果と一緒に返す
+    stats = ParseStats() if collect_stats else None
+    return convert_file(input_path, output_path, encoding, output_format, stats, workers) + (stats,)
+
+
+def run_conversions(jobs, workers=1, encoding='utf-8', output_format='json', collect_stats=False):
+    if workers <= 1 or len(jobs) <= 1:
+        # 1ファイルだけの変換では、ファイル単位の並列化の代わりにファイル内を分割して並列に解析する
+        file_workers = workers if workers > 1 else None
+        for input_path, output_path in jobs:
+            yield convert_file_with_stats(input_path, output_path, encoding, output_format, collect_stats,
+                                          file_workers)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # ワーカープロセスの標準入力は空に置き換えられるため、標準入力は親プロセスで変換する
+        futures = [None if input_path == STDIN_PATH else
+                   executor.submit(convert_file_with_stats, input_path, output_path, encoding, output_format,
+                                   collect_stats)
+                   for input_path, output_path in jobs]
+        for (input_path, output_path), future in zip(jobs, futures):
+            if future is None:
+                yield convert_file_with_stats(input_path, output_path, encoding, output_format, collect_stats)
+            else:
+                yield future.result()
+
+
+def report_memory(input_paths, encoding='utf-8'):
+    failures = 0
+
+    for input_path in input_paths:
+        try:
+            profile = profile_memory(read_text=lambda: read_text(input_path, encoding))
+        except Exception as e:
+            failures += 1
+            print(f"失敗: {input_path} {type(e).__name__}: {e}", file=sys.stderr)
+            continue
+
+        print(f"メモリ: {input_path}", file=sys.stderr)
+        print(profile.report(), file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="カルテ記載テキストをJSON形式に一括変換します（GUIなし）")
+    parser.add_argument('inputs', nargs='*', default=[STDIN_PATH],
+                        help="変換するファイルまたはディレクトリ（'-' で標準入力、省略時も標準入力）")
+    parser.add_argument('-o', '--output-dir',
+                        help="JSONの出力先ディレクトリ（省略時は入力ファイルと同じ場所）")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="並列に変換するプロセス数")
+    parser.add_argument('-p', '--pattern', default='*.txt',
+                        help="ディレクトリ指定時に対象とするファイル名のパターン")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="ディレクトリを再帰的に探索する")
+    parser.add_argument('-e', '--encoding', default='utf-8',
+                        help="入力ファイルの文字コード")
+    parser.add_argument('-f', '--format', dest='output_format', choices=sorted(OUTPUT_FORMATS), default='json',
+                        help="出力形式（jsonl は1グループ1行で逐次書き出す）")
+    parser.add_argument('-s', '--stats', action='store_true',
+                        help="ファイルごとに解析の段階別の時間と件数を表示する")
+    parser.add_argument('-m', '--memory', action='store_true',
+                        help="変換は行わず、解析の段階ごとのメモリ使用量と主な確保箇所を表示する")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    inputs = collect_inputs(args.inputs, args.pattern, args.recursive)
+    jobs = [(input_path, get_output_path(input_path, relative_path, args.output_dir, args.output_format))
+            for input_path, relative_path in inputs]
+
+    if not jobs:
+        print("変換対象のファイルがありません", file=sys.stderr)
+        return 1
+
+    if args.memory:
+        return report_memory([input_path for input_path, output_path in jobs], args.encoding)
+
+    failures = 0
+    total_start = time.perf_counter()
+
+    results = run_conversions(jobs, args.jobs, args.encoding, args.output_format, args.stats)
+
+    for input_path, record_count, elapsed, error, stats in results:
+        if error:
+            failures += 1
+            print(f"失敗: {input_path} ({elapsed:.3f}秒) {error}", file=sys.stderr)
+        else:
+            print(f"完了: {input_path} {record_count}件 ({elapsed:.3f}秒)", file=sys.stderr)
+            if stats is not None:
+                print(stats.report(), file=sys.stderr)
+
+    print(f"合計: {len(jobs)}件中 成功 {len(jobs) - failures}件 / 失敗 {failures}件 "
+          f"({time.perf_counter() - total_start:.3f}秒)", file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
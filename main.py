@@ -1,33 +1,51 @@
-import json
 import tkinter as tk
 from tkinter import messagebox, scrolledtext
 
 import pyperclip
 
 from services import mouse_automation
+from services.capture_buffer import CaptureBuffer
+from services.clipboard_watcher import ClipboardWatcher, create_clipboard_backend
+from services.conversion_task import (ConversionTask, MESSAGE_CANCELLED, MESSAGE_DONE, MESSAGE_ERROR,
+                                      MESSAGE_PROGRESS)
+from services.diagnostics_dialog import DiagnosticsDialog
+from services.live_preview import LivePreview
+from services.memory_profile import MemoryProfileTask
+from services.output_renderer import ChunkedTextRenderer
+from services.parse_stats import ParseStats
+from services.text_stats import TextStats
 from services.txt_editor import TextEditor
-from services.txt_parse import parse_medical_text
-from utils.config_manager import load_config
+from utils.config_manager import load_settings
 from version import VERSION
 
+CONVERSION_POLL_INTERVAL = 50
+MEMORY_REPORT_POLL_INTERVAL = 100
+
 
 class MedicalTextConverter:
     def __init__(self, root):
         self.root = root
-        self.config = load_config()
+        self.settings = load_settings()
 
-        self.window_width = self.config.getint('Appearance', 'window_width', fallback=1100)
-        self.window_height = self.config.getint('Appearance', 'window_height', fallback=800)
-        self.main_window_position = self.config.get('Appearance', 'main_window_position', fallback='+10+10')
-        self.text_area_font_size = self.config.getint('Appearance', 'text_area_font_size', fallback=11)
-        self.text_area_font_name = self.config.get('Appearance', 'text_area_font_name', fallback='Yu Gothic UI')
-        self.button_width = self.config.getint('Appearance', 'button_width', fallback=15)
-        self.button_height = self.config.getint('Appearance', 'button_height', fallback=2)
+        self.window_width = self.settings.window_width
+        self.window_height = self.settings.window_height
+        self.main_window_position = self.settings.main_window_position
+        self.text_area_font_size = self.settings.text_area_font_size
+        self.text_area_font_name = self.settings.text_area_font_name
+        self.button_width = self.settings.button_width
+        self.button_height = self.settings.button_height
 
         self.root.title(f"JSON形式変換 v{VERSION}")
         self.root.geometry(f"{self.window_width}x{self.window_height}{self.main_window_position}")
 
         self.is_monitoring_clipboard = False
+        self.collect_parse_stats = bool(self.settings.collect_parse_stats)
+        self.conversion_task = None
+        self._conversion_after_id = None
+        self.live_preview = LivePreview(self.create_parse_stats())
+        self.capture_buffer = CaptureBuffer()
+        self.helper_runner = mouse_automation.HelperRunner(
+            self.root, persistent_helper=mouse_automation.create_persistent_helper())
 
         self.frame_top = tk.Frame(root)
         self.frame_top.pack(fill=tk.BOTH, expand=True)
@@ -45,6 +63,7 @@ class MedicalTextConverter:
         self.text_output = scrolledtext.ScrolledText(self.frame_json, height=10,
                                                      font=(self.text_area_font_name, self.text_area_font_size))
         self.text_output.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.output_renderer = ChunkedTextRenderer(self.text_output)
 
         self.frame_stats = tk.Frame(root)
         self.frame_stats.pack(fill=tk.X)
@@ -52,6 +71,9 @@ class MedicalTextConverter:
         self.stats_label = tk.Label(self.frame_stats, text="カルテ記載行数: 0  文字数: 0")
         self.stats_label.pack(side=tk.LEFT, padx=5, pady=5)
 
+        self.progress_label = tk.Label(self.frame_stats, text="")
+        self.progress_label.pack(side=tk.LEFT, padx=5, pady=5)
+
         self.monitor_status_label = tk.Label(self.frame_stats, text="クリップボード監視: OFF", fg="red")
         self.monitor_status_label.pack(side=tk.RIGHT, padx=5, pady=5)
 
@@ -78,6 +100,11 @@ class MedicalTextConverter:
                                         width=self.button_width, height=self.button_height)
         self.convert_button.pack(side=tk.LEFT, padx=10)
 
+        self.cancel_button = tk.Button(self.frame_buttons, text="変換中止",
+                                       command=self.cancel_conversion, state=tk.DISABLED,
+                                       width=self.button_width, height=self.button_height)
+        self.cancel_button.pack(side=tk.LEFT, padx=10)
+
         self.clear_button = tk.Button(self.frame_buttons, text="テキストクリア",
                                       command=self.clear_text,
                                       width=self.button_width, height=self.button_height)
@@ -89,16 +116,19 @@ class MedicalTextConverter:
         self.editor_button.pack(side=tk.LEFT, padx=10)
 
         self.close_button = tk.Button(self.frame_buttons, text="閉じる",
-                                      command=self.root.destroy,
+                                      command=self.close,
                                       width=self.button_width, height=self.button_height)
         self.close_button.pack(side=tk.LEFT, padx=10)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
 
-        self.clipboard_content = ''
-        self.is_first_check = True
-        self.check_clipboard()
+        self.clipboard_watcher = ClipboardWatcher(create_clipboard_backend(), self.root,
+                                                  self.on_clipboard_change, self.on_clipboard_error)
 
+        self.text_stats = TextStats(self.text_input, self.stats_label)
         self.text_input.bind("<KeyRelease>", self.update_stats)
 
+        self.root.bind("<F12>", self.open_diagnostics)
+
     def show_notification(self, message, timeout=2000, position=None):
         if position is None:
             position = self.main_window_position
@@ -116,61 +146,158 @@ class MedicalTextConverter:
 
         popup.after(timeout, popup.destroy)
 
-    def check_clipboard(self):
-        if self.is_monitoring_clipboard:
-            try:
-                clipboard_text = pyperclip.paste()
-                if clipboard_text != self.clipboard_content:
-                    self.clipboard_content = clipboard_text
-                    if not self.is_first_check and clipboard_text:
-                        current_text = self.text_input.get("1.0", tk.END).strip()
-                        if current_text:
-                            self.text_input.insert(tk.END, "\n" + clipboard_text)
-                        else:
-                            self.text_input.insert(tk.END, clipboard_text)
-                        self.update_stats(None)
+    def on_clipboard_change(self, clipboard_text):
+        if not clipboard_text:
+            return
 
-                        self.show_notification("コピーしました")
+        self.append_capture(clipboard_text)
+        self.update_stats(None)
 
-                    self.is_first_check = False
-            except Exception as e:
-                print(f"クリップボード監視エラー: {e}")
+        if self.capture_buffer.last_overlap:
+            self.show_notification(f"コピーしました\n（重複 {self.capture_buffer.last_overlap}文字を省略）")
+        else:
+            self.show_notification("コピーしました")
 
-        self.root.after(500, self.check_clipboard)
+    def on_clipboard_error(self, error):
+        print(f"クリップボード監視エラー: {error}")
 
-    def update_stats(self, event):
-        text = self.text_input.get("1.0", tk.END)
-        lines = text.count('\n')
-        chars = len(text) - lines  # 改行文字を除く
+    def append_capture(self, text):
+        # 入力欄は取り込みバッファの表示とし、手入力で編集された場合だけ入力欄の内容を読み直す
+        is_edited = self.text_input.edit_modified()
+        if is_edited:
+            self.capture_buffer.reset(self.text_input.get("1.0", "end-1c"))
 
-        if text.strip() == "":
-            lines = 0
-            chars = 0
+        chunk = self.capture_buffer.append(text)
+        self.text_input.insert(tk.END, chunk)
+        self.text_input.edit_modified(False)
 
-        self.stats_label.config(text=f"行数: {lines}  文字数: {chars}")
+        # 取り込んだ分だけを解析してプレビューを更新する
+        if is_edited or self.live_preview is None:
+            self.live_preview = LivePreview(self.create_parse_stats())
+            self.live_preview.append(self.capture_buffer.text())
+        else:
+            self.live_preview.append(chunk)
+
+        self.output_renderer.render(self.live_preview.to_json())
+
+    def update_stats(self, event):
+        self.text_stats.schedule(event)
 
     def soap_copy(self):
         try:
+            command = mouse_automation.get_helper_command("soap_copy")
+            request = mouse_automation.get_helper_request("soap_copy")
+            if not self.helper_runner.run(command, self._on_soap_copy_done, request=request):
+                self.show_notification("実行中です", timeout=1000)
+                return
             self.root.iconify()
-            mouse_automation.main("soap_copy")
-            self.root.deiconify()
         except Exception as e:
             messagebox.showerror("エラー", f"SOAPコピー中にエラーが発生しました: {e}")
 
+    def _on_soap_copy_done(self, error):
+        self.root.deiconify()
+        if error is not None:
+            messagebox.showerror("エラー", f"SOAPコピー中にエラーが発生しました: {error}")
+
     def convert_to_json(self):
+        if self.conversion_task is not None:
+            return
+
         try:
-            text = self.text_input.get("1.0", tk.END)
-            if not text.strip():
+            is_edited = self.text_input.edit_modified()
+            if is_edited:
+                text = self.text_input.get("1.0", "end-1c")
+                has_text = bool(text.strip())
+            else:
+                has_text = self.capture_buffer.has_content
+
+            if not has_text:
                 messagebox.showwarning("警告", "変換するテキストがありません。")
                 return
 
             self.set_monitoring_state(False)
 
-            parsed_data = parse_medical_text(text)
-            json_data = json.dumps(parsed_data, indent=2, ensure_ascii=False)
+            if self.live_preview is not None and not is_edited:
+                # 取り込みごとに解析済みのため、そのまま結果を出力する
+                self._show_conversion_result(self.live_preview.to_json())
+                return
+
+            if not is_edited:
+                text = self.capture_buffer.text()
+
+            # 全体を解析し直す間は差分解析の状態を無効にし、完了時に変換結果の解析状態を引き継ぐ
+            self.live_preview = None
+            self.capture_buffer.reset(text)
+            self.text_input.edit_modified(False)
+            self.conversion_task = ConversionTask(text, stats=self.create_parse_stats())
+            self.conversion_task.start()
+            self.set_converting_state(True)
+            self.progress_label.config(text=f"変換中: 0 / {self.conversion_task.total_lines}行")
+
+            self._conversion_after_id = self.root.after(CONVERSION_POLL_INTERVAL, self.poll_conversion)
 
-            self.text_output.delete("1.0", tk.END)
-            self.text_output.insert(tk.END, json_data)
+        except Exception as e:
+            self.conversion_task = None
+            messagebox.showerror("エラー", f"変換中にエラーが発生しました: {e}")
+
+    def poll_conversion(self):
+        # 中止・破棄された変換のメッセージは読まず、現在の変換の結果だけを反映する
+        self._conversion_after_id = None
+        task = self.conversion_task
+        if task is None:
+            return
+
+        for message in task.poll():
+            kind = message[0]
+            if kind == MESSAGE_PROGRESS:
+                processed_lines, total_lines, record_count = message[1:]
+                self.progress_label.config(text=f"変換中: {processed_lines} / {total_lines}行  {record_count}件")
+            elif kind == MESSAGE_DONE:
+                self._finish_conversion()
+                if not self.text_input.edit_modified():
+                    self.live_preview = task.preview
+                self._show_conversion_result(message[1])
+                return
+            elif kind == MESSAGE_ERROR:
+                self._finish_conversion()
+                messagebox.showerror("エラー", f"変換中にエラーが発生しました: {message[1]}")
+                return
+            elif kind == MESSAGE_CANCELLED:
+                self._finish_conversion()
+                self.progress_label.config(text="変換を中止しました")
+                return
+
+        self._conversion_after_id = self.root.after(CONVERSION_POLL_INTERVAL, self.poll_conversion)
+
+    def cancel_conversion(self):
+        if self.conversion_task is not None:
+            self.conversion_task.cancel()
+            self.progress_label.config(text="変換を中止しています...")
+
+    def set_converting_state(self, converting):
+        self.convert_button.config(state=tk.DISABLED if converting else tk.NORMAL)
+        self.cancel_button.config(state=tk.NORMAL if converting else tk.DISABLED)
+
+    def _discard_conversion(self):
+        # 新しいテキストに切り替える前に実行中の変換を中止して切り離し、
+        # 前のテキストの結果がプレビューやクリップボードに反映されないようにする
+        if self.conversion_task is None:
+            return
+
+        self.conversion_task.cancel()
+        if self._conversion_after_id is not None:
+            self.root.after_cancel(self._conversion_after_id)
+            self._conversion_after_id = None
+        self._finish_conversion()
+
+    def _finish_conversion(self):
+        self.conversion_task = None
+        self.set_converting_state(False)
+        self.progress_label.config(text="")
+
+    def _show_conversion_result(self, json_data):
+        try:
+            self.output_renderer.render(json_data)
 
             pyperclip.copy(json_data)
 
@@ -180,40 +307,92 @@ class MedicalTextConverter:
             messagebox.showerror("エラー", f"変換中にエラーが発生しました: {e}")
 
     def clear_text(self):
+        self._discard_conversion()
         self.text_input.delete("1.0", tk.END)
-        self.text_output.delete("1.0", tk.END)
+        self.output_renderer.clear()
+        self.text_input.edit_modified(False)
+        self.live_preview = LivePreview(self.create_parse_stats())
+        self.capture_buffer = CaptureBuffer()
         self.update_stats(None)
 
     def set_monitoring_state(self, enabled):
         self.is_monitoring_clipboard = enabled
         if enabled:
+            self.clipboard_watcher.start()
             self.monitor_status_label.config(text="クリップボード監視: ON", fg="green")
         else:
+            self.clipboard_watcher.stop()
             self.monitor_status_label.config(text="クリップボード監視: OFF", fg="red")
 
     def start_monitoring(self):
-        self.set_monitoring_state(True)
+        # 空にしたクリップボードを基準に監視を始め、以降のコピーだけを取り込む
         self.clear_text()
         pyperclip.copy("")
-        self.clipboard_content = ""
-        self.is_first_check = False
+        self.set_monitoring_state(True)
 
     def run_mouse_automation(self):
         try:
+            command = mouse_automation.get_helper_command()
+            request = mouse_automation.get_helper_request()
+            if not self.helper_runner.run(command, self._on_mouse_automation_done, request=request):
+                self.show_notification("実行中です", timeout=1000)
+                return
             self.root.iconify()
-            mouse_automation.main()
-            self.show_notification("設定完了", timeout=2000)
         except Exception as e:
             messagebox.showerror("エラー", f"マウス操作中にエラーが発生しました: {e}")
 
+    def _on_mouse_automation_done(self, error):
+        if error is not None:
+            messagebox.showerror("エラー", f"マウス操作中にエラーが発生しました: {error}")
+            return
+        self.show_notification("設定完了", timeout=2000)
+
     def open_text_editor(self):
         self.set_monitoring_state(False)
         self.root.withdraw()
         editor = TextEditor(self.root, "")
         editor.on_close = self._restore_clipboard_monitoring
 
+    def create_parse_stats(self):
+        return ParseStats() if self.collect_parse_stats else None
+
+    def open_diagnostics(self, event=None):
+        stats = self.live_preview.stats if self.live_preview is not None else None
+        DiagnosticsDialog(self.root, stats, self.collect_parse_stats, self.set_parse_stats_enabled,
+                          self.create_memory_report, self.capture_buffer.report())
+
+    def create_memory_report(self, on_done):
+        # 入力欄からの取得を含め、現在のテキストを段階ごとに解析し直してメモリを計測する
+        # 入力欄の読み出しだけをGUIスレッドで計測し、解析以降はワーカースレッドで計測する
+        task = MemoryProfileTask(read_text=lambda: self.text_input.get("1.0", "end-1c"))
+        task.start()
+        self.root.after(MEMORY_REPORT_POLL_INTERVAL, self.poll_memory_report, task, on_done)
+
+    def poll_memory_report(self, task, on_done):
+        message = task.poll()
+        if message is None:
+            self.root.after(MEMORY_REPORT_POLL_INTERVAL, self.poll_memory_report, task, on_done)
+            return
+
+        kind, value = message
+        if kind == MESSAGE_DONE:
+            on_done(value.report())
+        else:
+            on_done(f"メモリの計測中にエラーが発生しました: {value}")
+
+    def set_parse_stats_enabled(self, enabled):
+        # 解析状態を作り直すことで、次の取り込み・変換から計測の有無を切り替える
+        self.collect_parse_stats = enabled
+        self.live_preview = None
+
+    def close(self):
+        # 常駐ヘルパーを残さないよう終了させてからウィンドウを閉じる
+        self.helper_runner.close()
+        self.root.destroy()
+
     def _restore_clipboard_monitoring(self):
         self.is_monitoring_clipboard = False
+        self.clipboard_watcher.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+from services.parse_stats import pad_label
+
+MAX_OVERLAP_LENGTH = 1 << 14
+MIN_OVERLAP_LINES = 2
+
+
+def text_fingerprint(text):
+    # strはハッシュ値をオブジェクトに保持するため、同じ文字列との比較は2回目以降O(1)になる
+    return len(text), hash(text)
+
+
+def z_array(text):
+    # z[i]はtext[i:]とtextの最長共通接頭辞の長さ
+    length = len(text)
+    z = [0] * length
+    if length:
+        z[0] = length
+
+    left = right = 0
+    for i in range(1, length):
+        if i < right:
+            z[i] = min(right - i, z[i - left])
+        while i + z[i] < length and text[z[i]] == text[i + z[i]]:
+            z[i] += 1
+        if i + z[i] > right:
+            left, right = i, i + z[i]
+
+    return z
+
+
+def find_overlap(tail, text, min_lines=MIN_OVERLAP_LINES):
+    # tailの末尾とtextの先頭が一致する最長の長さを返す。一致範囲は行単位に揃え、min_lines行以上に限る
+    # tailの先頭は行頭として扱う
+    length = min(len(tail), len(text))
+    if not length:
+        return 0
+
+    z = z_array(text[:length] + tail[len(tail) - length:])
+
+    # 比較する末尾の長さは先頭部分を超えないため、末尾まで一致する位置が接尾辞と接頭辞の一致を表す
+    for start in range(length):
+        overlap = length - start
+        if z[length + start] != overlap:
+            continue
+
+        before = len(tail) - overlap - 1
+        if before >= 0 and tail[before] != "\n":
+            continue
+        if overlap < len(text) and text[overlap] != "\n" and text[overlap - 1] != "\n":
+            continue
+        if text[:overlap].strip().count("\n") + 1 < min_lines:
+            continue
+
+        return overlap
+
+    return 0
+
+
+class CaptureBuffer:
+    # クリップボードから取り込んだテキストを取り込み単位で保持する
+    # 入力欄はこの内容の表示であり、追記の判断に入力欄全体を読み出さない
+    def __init__(self):
+        self.chunks = []
+        self.length = 0
+        self.has_content = False
+
+        self.capture_count = 0
+        self.last_overlap = 0
+        self.stitched_count = 0
+        self.saved_length = 0
+        self.saved_bytes = 0
+
+    def append(self, text):
+        # 直前までの末尾と重なる行は省き、区切りの改行を付けて追記する。入力欄に挿入する文字列を返す
+        self.capture_count += 1
+        overlap = self._find_overlap(text) if self.has_content else 0
+        self.last_overlap = overlap
+
+        if overlap:
+            self.stitched_count += 1
+            self.saved_length += overlap
+            self.saved_bytes += len(text[:overlap].encode('utf-8', 'surrogatepass'))
+            chunk = text[overlap:]
+        else:
+            chunk = "\n" + text if self.has_content else text
+
+        self.chunks.append(chunk)
+        self.length += len(chunk)
+
+        if not self.has_content and text.strip():
+            self.has_content = True
+
+        return chunk
+
+    def _find_overlap(self, text):
+        # 比較するのは末尾の一定長だけとし、取り込みが増えても判定の費用は変わらない
+        tail_length = min(len(text), MAX_OVERLAP_LENGTH)
+        pieces = []
+        collected = 0
+        for chunk in reversed(self.chunks):
+            pieces.append(chunk)
+            collected += len(chunk)
+            if collected >= tail_length:
+                break
+
+        tail = "".join(reversed(pieces))
+        if len(tail) > tail_length:
+            line_start = tail.find("\n", len(tail) - tail_length - 1) + 1
+            tail = tail[line_start:] if line_start else ""
+
+        return find_overlap(tail, text)
+
+    def reset(self, text=""):
+        # 入力欄が手で編集された場合は、その内容を1つの取り込みとして持ち直す
+        self.chunks = []
+        self.length = 0
+        self.has_content = False
+
+        if text:
+            self.append(text)
+
+    def text(self):
+        return "".join(self.chunks)
+
+    def report(self):
+        # 診断情報に表示する、取り込みの回数と重なりを省いた累計
+        return "\n".join([
+            "クリップボードの取り込み",
+            f"  {pad_label('取り込み回数')} {self.capture_count:>10}",
+            f"  {pad_label('重なりを省いた回数')} {self.stitched_count:>10}",
+            f"  {pad_label('省いた文字数')} {self.saved_length:>10}",
+            f"  {pad_label('省いたバイト数')} {self.saved_bytes:>10}",
+        ])
+
+    def __len__(self):
+        return self.length
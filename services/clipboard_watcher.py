@@ -0,0 +1,159 @@
+import sys
+
+import pyperclip
+
+from services.capture_buffer import text_fingerprint
+
+CLIPBOARD_MIN_INTERVAL = 250
+CLIPBOARD_MAX_INTERVAL = 2000
+
+
+class PyperclipBackend:
+    # 変更を検知する手段がない環境向け。毎回クリップボードの内容を読み出して比較する
+    has_change_token = False
+
+    def change_token(self):
+        return None
+
+    def read(self):
+        return pyperclip.paste()
+
+
+class Win32ClipboardBackend:
+    # GetClipboardSequenceNumberで変更を検知し、変更があった時だけ内容を読み出す
+    has_change_token = True
+
+    def __init__(self):
+        import ctypes
+
+        self._get_sequence_number = ctypes.windll.user32.GetClipboardSequenceNumber
+        self._get_sequence_number.restype = ctypes.c_uint32
+
+    def change_token(self):
+        # 0はクリップボードへのアクセス権がない場合で、変更の有無が分からないため読み出して比較する
+        return self._get_sequence_number() or None
+
+    def read(self):
+        return pyperclip.paste()
+
+
+class FakeClipboardBackend:
+    # テスト用のメモリ上のクリップボード。読み出し回数などを記録する
+    def __init__(self, text="", has_change_token=True):
+        self.text = text
+        self.has_change_token = has_change_token
+        self.sequence = 1
+        self.error = None
+        self.token_count = 0
+        self.read_count = 0
+
+    def set_text(self, text):
+        self.text = text
+        self.sequence += 1
+
+    def change_token(self):
+        self.token_count += 1
+        if self.error:
+            raise self.error
+        return self.sequence if self.has_change_token else None
+
+    def read(self):
+        self.read_count += 1
+        if self.error:
+            raise self.error
+        return self.text
+
+
+def create_clipboard_backend():
+    if sys.platform == 'win32':
+        try:
+            return Win32ClipboardBackend()
+        except (AttributeError, OSError):
+            pass
+
+    return PyperclipBackend()
+
+
+class ClipboardWatcher:
+    # 監視中だけafter()で確認処理を予約し、停止中は一切ポーリングしない
+    # 変更を検知できないバックエンドでは、変化がない間は確認間隔を倍々に延ばす
+    def __init__(self, backend, scheduler, on_change, on_error=None,
+                 min_interval=CLIPBOARD_MIN_INTERVAL, max_interval=CLIPBOARD_MAX_INTERVAL):
+        self.backend = backend
+        self.scheduler = scheduler
+        self.on_change = on_change
+        self.on_error = on_error
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+        self.is_running = False
+        self.interval = min_interval
+        self.last_fingerprint = None
+        self._token = None
+        self._after_id = None
+
+    def start(self):
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self.interval = self.min_interval
+
+        try:
+            self._token = self.backend.change_token()
+            self.last_fingerprint = text_fingerprint(self.backend.read())
+        except Exception as e:
+            self._report_error(e)
+
+        self._schedule()
+
+    def stop(self):
+        self.is_running = False
+
+        if self._after_id is not None:
+            self.scheduler.after_cancel(self._after_id)
+            self._after_id = None
+
+    def poll(self):
+        self._after_id = None
+        if not self.is_running:
+            return
+
+        try:
+            changed = self.check()
+        except Exception as e:
+            self._report_error(e)
+            changed = False
+
+        if changed or self.backend.has_change_token:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+
+        if self.is_running:
+            self._schedule()
+
+    def check(self):
+        token = self.backend.change_token()
+        if token is not None:
+            if token == self._token:
+                return False
+            self._token = token
+
+        # 前回の内容は保持せず、長さとハッシュ値だけで比較する
+        text = self.backend.read()
+        fingerprint = text_fingerprint(text)
+        if fingerprint == self.last_fingerprint:
+            return False
+
+        self.last_fingerprint = fingerprint
+        self.on_change(text)
+
+        return True
+
+    def _schedule(self):
+        self._after_id = self.scheduler.after(self.interval, self.poll)
+
+    def _report_error(self, error):
+        if self.on_error:
+            self.on_error(error)
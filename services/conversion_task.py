@@ -0,0 +1,69 @@
+import queue
+import threading
+
+from services.live_preview import LivePreview
+
+MESSAGE_PROGRESS = 'progress'
+MESSAGE_DONE = 'done'
+MESSAGE_ERROR = 'error'
+MESSAGE_CANCELLED = 'cancelled'
+
+CONVERSION_CHUNK_SIZE = 1 << 16
+
+
+class ConversionTask:
+    # 変換処理をワーカースレッドで実行し、進捗と結果をキュー経由でGUIスレッドへ渡す
+    def __init__(self, text, chunk_size=CONVERSION_CHUNK_SIZE, stats=None):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.total_lines = text.count("\n")
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = None
+        self.preview = LivePreview(stats)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def run(self):
+        try:
+            processed_lines = 0
+            record_count = 0
+
+            for start in range(0, len(self.text), self.chunk_size):
+                if self.cancel_event.is_set():
+                    self.messages.put((MESSAGE_CANCELLED,))
+                    return
+
+                end = start + self.chunk_size
+                record_count += self.preview.append(self.text[start:end])
+
+                processed_lines += self.text.count("\n", start, end)
+                self.messages.put((MESSAGE_PROGRESS, processed_lines, self.total_lines, record_count))
+
+            if self.cancel_event.is_set():
+                self.messages.put((MESSAGE_CANCELLED,))
+                return
+
+            # 解析状態は閉じずに残し、変換後のクリップボード取り込みを差分解析で続けられるようにする
+            # 結果はJSON文字列だけを渡し、辞書の一覧には戻さない
+            self.messages.put((MESSAGE_DONE, self.preview.to_json()))
+        except Exception as e:
+            self.messages.put((MESSAGE_ERROR, e))
+
+    def poll(self):
+        # GUIスレッドから呼び出し、溜まっているメッセージをすべて取り出す
+        messages = []
+
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
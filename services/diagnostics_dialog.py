@@ -0,0 +1,72 @@
+import tkinter as tk
+from tkinter import scrolledtext
+
+
+class DiagnosticsDialog:
+    # 直近の解析で記録した段階ごとの時間と件数を表示し、計測の有効・無効を切り替える
+    # on_memory_reportを渡すと、段階ごとのメモリ使用量を計測して表示するボタンを加える
+    # on_memory_reportは表示用のコールバックを受け取り、計測を終えたらGUIスレッドで報告の文字列を渡す
+    # capture_reportを渡すと、クリップボードの取り込みの累計を計測結果の後に表示する
+    def __init__(self, parent, stats, enabled, on_toggle, on_memory_report=None, capture_report=None):
+        self.enabled = enabled
+        self.on_toggle = on_toggle
+        self.on_memory_report = on_memory_report
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("診断情報")
+        self.window.geometry("560x420")
+
+        self.text_area = scrolledtext.ScrolledText(self.window, font=("MS Gothic", 10))
+        self.text_area.pack(expand=True, fill=tk.BOTH, padx=10, pady=10)
+        message = self.get_message(stats)
+        if capture_report:
+            message += "\n\n" + capture_report
+        self.set_text(message)
+
+        button_frame = tk.Frame(self.window)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        toggle_button = tk.Button(button_frame, text="計測を無効にする" if enabled else "計測を有効にする",
+                                  command=self.toggle, width=16)
+        toggle_button.pack(side=tk.LEFT, padx=5)
+
+        self.memory_button = None
+        if on_memory_report is not None:
+            self.memory_button = tk.Button(button_frame, text="メモリ内訳", command=self.show_memory_report,
+                                           width=16)
+            self.memory_button.pack(side=tk.LEFT, padx=5)
+
+        close_button = tk.Button(button_frame, text="閉じる", command=self.window.destroy, width=16)
+        close_button.pack(side=tk.LEFT, padx=5)
+
+    def set_text(self, text):
+        self.text_area.config(state=tk.NORMAL)
+        self.text_area.delete("1.0", tk.END)
+        self.text_area.insert(tk.END, text)
+        self.text_area.config(state=tk.DISABLED)
+
+    def show_memory_report(self):
+        # 計測中はボタンを無効にし、結果はset_memory_reportで表示する
+        self.memory_button.config(state=tk.DISABLED)
+        self.window.config(cursor="watch")
+        self.set_text("メモリを計測しています...")
+        self.on_memory_report(self.set_memory_report)
+
+    def set_memory_report(self, report):
+        # 計測中にダイアログが閉じられていれば何もしない
+        if not self.window.winfo_exists():
+            return
+        self.window.config(cursor="")
+        self.memory_button.config(state=tk.NORMAL)
+        self.set_text(report)
+
+    def get_message(self, stats):
+        if stats is not None:
+            return stats.report()
+        if self.enabled:
+            return "計測結果はまだありません。\nクリップボードの取り込みまたは変換を行うと表示されます。"
+        return "解析の計測は無効です。\n有効にすると、次の取り込み・変換から段階ごとの時間と件数を記録します。"
+
+    def toggle(self):
+        self.on_toggle(not self.enabled)
+        self.window.destroy()
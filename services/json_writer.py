@@ -0,0 +1,31 @@
+import json
+
+
+def write_json_lines(records, stream, flush_every=None):
+    # 1グループ1行のJSON Lines形式で書き出す
+    # flush_everyを省略すると、パイプや端末への出力は1行ごとにflushして下流へすぐに渡し、
+    # ファイルへの出力は途中でflushせずにバッファへまとめて書き込む
+    if flush_every is None:
+        flush_every = 0 if _is_seekable(stream) else 1
+
+    count = 0
+
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False))
+        stream.write("\n")
+        count += 1
+
+        if flush_every and count % flush_every == 0:
+            stream.flush()
+
+    stream.flush()
+
+    return count
+
+
+def _is_seekable(stream):
+    # 標準出力をファイルへリダイレクトした場合もファイルとして扱う
+    try:
+        return stream.seekable()
+    except (AttributeError, ValueError, OSError):
+        return False
@@ -0,0 +1,253 @@
+import json
+from bisect import bisect_left
+
+from services.parse_stats import STAGE_JSON
+from services.txt_parse import MedicalTextParser, RecordGrouper, build_group_record, record_dedupe_key
+
+FRAGMENT_BLOCK_SIZE = 256
+
+
+def group_json(key, group):
+    # 1グループ分を、json.dumps(一覧, indent=2)の要素と同じ字下げのJSON断片と重複判定キーにする
+    record = build_group_record((key, group))
+    return json.dumps([record], indent=2, ensure_ascii=False)[2:-2], record_dedupe_key(record)
+
+
+def join_fragments(fragments):
+    # 全体の文字列を作る複製は1回だけにするため、括弧は先頭と末尾の断片に付けてから連結する
+    if not fragments:
+        return "[]"
+    fragments = list(fragments)
+    fragments[0] = "[\n" + fragments[0]
+    fragments[-1] += "\n]"
+    return ",\n".join(fragments)
+
+
+class FragmentList:
+    # JSON断片を(並べ替えキー, 出現順, グループキー)の順に、block_size件前後のブロックに分けて保持する
+    # ブロックごとに連結済みの文字列を保持し、断片が変わったブロックだけを連結し直す
+    # 未確定の断片は保持している一覧を変えずに、該当するブロックの複製に重ねて出力する
+    def __init__(self, block_size=FRAGMENT_BLOCK_SIZE):
+        self.block_size = block_size
+        self._entries = []
+        self._fragments = []
+        self._texts = []
+        self._maxes = []
+
+    def set(self, entry, fragment):
+        # 同じ位置の断片があれば置き換え、なければ挿入する
+        position = entry[:2]
+        if not self._entries:
+            self._entries.append([entry])
+            self._fragments.append([fragment])
+            self._texts.append(None)
+            self._maxes.append(position)
+            return
+
+        index, offset = self._locate(position)
+        entries = self._entries[index]
+        fragments = self._fragments[index]
+        self._texts[index] = None
+
+        if offset < len(entries) and entries[offset][:2] == position:
+            fragments[offset] = fragment
+            return
+
+        entries.insert(offset, entry)
+        fragments.insert(offset, fragment)
+        if offset == len(entries) - 1:
+            self._maxes[index] = position
+        if len(entries) > 2 * self.block_size:
+            self._split(index)
+
+    def text(self, pending=None):
+        texts = self._block_texts()
+        for index, (_, fragments) in self._pending_blocks(pending).items():
+            if index < len(texts):
+                texts[index] = ",\n".join(fragments)
+            else:
+                texts.append(",\n".join(fragments))
+
+        return join_fragments(texts)
+
+    def items(self, pending=None):
+        # 未確定の断片を重ねた(位置, 断片)を出力順に返す
+        changed = self._pending_blocks(pending)
+        for index in range(len(self._entries) or len(changed)):
+            entries, fragments = changed.get(index) or (self._entries[index], self._fragments[index])
+            yield from zip(entries, fragments)
+
+    def _locate(self, position):
+        index = bisect_left(self._maxes, position)
+        if index == len(self._maxes):
+            index -= 1
+        return index, bisect_left(self._entries[index], position)
+
+    def _split(self, index):
+        half = self.block_size
+        entries = self._entries[index]
+        fragments = self._fragments[index]
+
+        self._entries[index:index + 1] = [entries[:half], entries[half:]]
+        self._fragments[index:index + 1] = [fragments[:half], fragments[half:]]
+        self._texts[index:index + 1] = [None, None]
+        self._maxes[index:index + 1] = [entries[half - 1][:2], entries[-1][:2]]
+
+    def _block_texts(self):
+        texts = self._texts
+        for index, text in enumerate(texts):
+            if text is None:
+                texts[index] = ",\n".join(self._fragments[index])
+        return list(texts)
+
+    def _pending_blocks(self, pending):
+        # 未確定の断片を重ねたブロックの複製を、ブロックの番号ごとに返す
+        changed = {}
+        if not pending:
+            return changed
+
+        for entry, fragment in pending.items():
+            position = entry[:2]
+            if self._entries:
+                index, _ = self._locate(position)
+            else:
+                index = 0
+
+            block = changed.get(index)
+            if block is None:
+                if self._entries:
+                    block = (list(self._entries[index]), list(self._fragments[index]))
+                else:
+                    block = ([], [])
+                changed[index] = block
+
+            entries, fragments = block
+            offset = bisect_left(entries, position)
+            if offset < len(entries) and entries[offset][:2] == position:
+                fragments[offset] = fragment
+            else:
+                entries.insert(offset, entry)
+                fragments.insert(offset, fragment)
+
+        return changed
+
+
+class LivePreview:
+    # 追記されたテキストだけを解析し、解析状態とグループ化結果を取り込みをまたいで保持する
+    # グループごとのJSON断片を保持し、取り込みで変わったグループと未確定のグループだけを作り直す
+    # 出力順は(並べ替えキー, 出現順)の順とし、RecordGrouperの出力（安定ソート）と同じ順にする
+    # statsを渡すと、取り込みをまたいだ解析の段階ごとの計測結果を記録する
+    def __init__(self, stats=None):
+        self.stats = stats
+        self.parser = MedicalTextParser(stats)
+        self.grouper = RecordGrouper(stats)
+        self.has_text = False
+
+        # 前回の出力以降に確定レコードが追加されたグループ（出現順を保つため辞書で持つ）
+        self._dirty = {}
+        self._fragments = FragmentList()
+        self._positions = {}
+        # 同一内容のグループは最初の1件だけを出力するため、重複判定キーごとのグループ数を数える
+        self._dedupe_keys = {}
+        self._dedupe_counts = {}
+        self._duplicate_groups = 0
+
+        self._json_data = None
+
+    def append(self, text):
+        records = self.parser.feed(text)
+        self.grouper.add_all(records)
+
+        dirty = self._dirty
+        for record in records:
+            dirty[record[:3]] = None
+
+        if text:
+            self.has_text = True
+            self._json_data = None
+
+        return len(records)
+
+    def records(self):
+        # 出力と同じ内容を辞書の一覧で返す。結果は保持しないため、確認やテストなど必要な場合だけ使う
+        return json.loads(self.to_json())
+
+    def to_json(self):
+        # 末尾の未確定レコードは解析状態を変えずに取り出し、確定済みのグループに重ねて出力する
+        if self._json_data is None:
+            if self.stats is not None:
+                self.stats.start(STAGE_JSON)
+            self._update_fragments()
+            self._json_data = self._pending_json(self.grouper.touched_groups(self.parser.pending_records()))
+            if self.stats is not None:
+                self.stats.stop()
+
+        return self._json_data
+
+    def _update_fragments(self):
+        for key in self._dirty:
+            group = self.grouper.group(key)
+            fragment, dedupe_key = group_json(key, group)
+
+            position = self._positions.get(key)
+            if position is None:
+                position = self._positions[key] = (group[0], len(self._positions))
+            else:
+                self._count_dedupe_key(self._dedupe_keys[key], -1)
+            self._fragments.set(position + (key,), fragment)
+
+            self._dedupe_keys[key] = dedupe_key
+            self._count_dedupe_key(dedupe_key, 1)
+
+        self._dirty.clear()
+
+    def _count_dedupe_key(self, dedupe_key, delta):
+        count = self._dedupe_counts.get(dedupe_key, 0)
+        if delta > 0:
+            if count:
+                self._duplicate_groups += 1
+        elif count > 1:
+            self._duplicate_groups -= 1
+
+        count += delta
+        if count:
+            self._dedupe_counts[dedupe_key] = count
+        else:
+            del self._dedupe_counts[dedupe_key]
+
+    def _pending_json(self, pending_groups):
+        pending = {}
+        pending_keys = {}
+        has_duplicates = self._duplicate_groups > 0
+        next_sequence = len(self._positions)
+
+        for key, group in pending_groups.items():
+            fragment, dedupe_key = group_json(key, group)
+
+            position = self._positions.get(key)
+            if position is None:
+                position = (group[0], next_sequence)
+                next_sequence += 1
+            pending[position + (key,)] = fragment
+
+            # 確定済みの別グループや他の未確定グループと同じ内容になる場合は重複除去が必要になる
+            count = self._dedupe_counts.get(dedupe_key, 0)
+            if self._dedupe_keys.get(key) == dedupe_key:
+                count -= 1
+            if count > 0 or dedupe_key in pending_keys.values():
+                has_duplicates = True
+            pending_keys[key] = dedupe_key
+
+        if not has_duplicates:
+            return self._fragments.text(pending)
+
+        # 重複グループがある場合だけ、出力順に走査して2件目以降を除く
+        seen = set()
+        fragments = []
+        for (_, _, key), fragment in self._fragments.items(pending):
+            dedupe_key = pending_keys[key] if key in pending_keys else self._dedupe_keys[key]
+            if dedupe_key not in seen:
+                seen.add(dedupe_key)
+                fragments.append(fragment)
+
+        return join_fragments(fragments)
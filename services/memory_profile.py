@@ -0,0 +1,214 @@
+import gc
+import json
+import os
+import queue
+import sys
+import threading
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from services.conversion_task import MESSAGE_DONE, MESSAGE_ERROR
+from services.parse_stats import pad_label
+from services.txt_parse import MedicalTextParser, RecordGrouper
+
+MEMORY_TOP_SITES = 5
+IGNORED_FILES = (tracemalloc.__file__, __file__)
+
+MEMORY_STAGE_INPUT = 'input'
+MEMORY_STAGE_RECORDS = 'records'
+MEMORY_STAGE_GROUPS = 'groups'
+MEMORY_STAGE_RESULT = 'result'
+MEMORY_STAGE_JSON = 'json'
+
+MEMORY_STAGE_LABELS = {
+    MEMORY_STAGE_INPUT: '入力テキストの取得',
+    MEMORY_STAGE_RECORDS: 'SOAPレコード一覧',
+    MEMORY_STAGE_GROUPS: 'グループ化',
+    MEMORY_STAGE_RESULT: '並べ替え・重複除去',
+    MEMORY_STAGE_JSON: 'JSON文字列',
+}
+
+
+@dataclass
+class StageMemory:
+    name: str
+    peak: int
+    retained: int
+    items: int
+    top_sites: List[Tuple[str, int, int]] = field(default_factory=list)
+
+
+class MemoryProfile:
+    # 段階の前後でtracemallocのスナップショットを取り、段階中のピークと段階後も保持されるバイト数、
+    # 保持量の多い確保箇所を記録する
+    def __init__(self, top=MEMORY_TOP_SITES):
+        self.top = top
+        self.stages = []
+        self.input_size = 0
+        self._sites = None
+
+    def measure(self, name, function, count=len):
+        gc.collect()
+        # 確保箇所の集計は重いため、直前の段階の集計結果を次の段階の開始時点として使い回す
+        if self.top and self._sites is None:
+            self._sites = _site_totals(tracemalloc.take_snapshot())
+        current_before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+        result = function()
+
+        current_after, peak = tracemalloc.get_traced_memory()
+        top_sites = []
+        if self.top:
+            sites = _site_totals(tracemalloc.take_snapshot())
+            top_sites = self._top_sites(self._sites, sites)
+            self._sites = sites
+
+        self.stages.append(StageMemory(name, peak - current_before, current_after - current_before,
+                                       count(result), top_sites))
+        return result
+
+    def _top_sites(self, before, after):
+        differences = []
+        for frame, (size, count) in after.items():
+            # 計測処理そのものの確保は除く
+            if frame.filename in IGNORED_FILES:
+                continue
+            before_size, before_count = before.get(frame, (0, 0))
+            if size > before_size:
+                differences.append((size - before_size, count - before_count, frame))
+
+        differences.sort(key=lambda difference: difference[0], reverse=True)
+
+        return [(f"{os.path.basename(frame.filename)}:{frame.lineno}", size, count)
+                for size, count, frame in differences[:self.top]]
+
+    def total_retained(self):
+        return sum(stage.retained for stage in self.stages)
+
+    def to_dict(self):
+        return {
+            'input_size': self.input_size,
+            'stages': [{'name': stage.name, 'peak': stage.peak, 'retained': stage.retained,
+                        'items': stage.items, 'top_sites': stage.top_sites} for stage in self.stages],
+        }
+
+    def report(self):
+        lines = [f"入力テキスト {self.input_size / 1e6:.2f}MB", "段階ごとのメモリ（ピーク / 保持 / 1件あたり）"]
+
+        for stage in self.stages:
+            per_item = stage.retained / stage.items if stage.items else 0
+            lines.append(f"  {pad_label(MEMORY_STAGE_LABELS.get(stage.name, stage.name))} "
+                         f"{stage.peak / 1e6:>9.2f}MB {stage.retained / 1e6:>9.2f}MB "
+                         f"{per_item:>8.0f}B x {stage.items}件")
+
+        lines.append(f"  {pad_label('保持の合計')} {'':>11} {self.total_retained() / 1e6:>9.2f}MB")
+
+        for stage in self.stages:
+            if not stage.top_sites:
+                continue
+            lines.append(f"{MEMORY_STAGE_LABELS.get(stage.name, stage.name)}の主な確保箇所")
+            for location, size, count in stage.top_sites:
+                lines.append(f"  {location:<32} {size / 1e6:>9.2f}MB {count:>9}個")
+
+        return "\n".join(lines)
+
+
+def _site_totals(snapshot):
+    return {statistic.traceback[0]: (statistic.size, statistic.count) for statistic in snapshot.statistics('lineno')}
+
+
+def scan_records(text):
+    parser = MedicalTextParser()
+    records = parser.feed(text)
+    records.extend(parser.close())
+    return records
+
+
+def group_records(records):
+    grouper = RecordGrouper()
+    grouper.add_all(records)
+    return grouper
+
+
+def profile_memory(text=None, read_text=None, top=MEMORY_TOP_SITES):
+    # parse_medical_textとJSON化を段階に分けて実行し、各段階のメモリを計測する
+    # read_textを渡すと、Textウィジェットやファイルからの取得も段階として計測する
+    # topを0にすると確保箇所を集計せず、ピークと保持量だけを速く計測する
+    profile = MemoryProfile(top)
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+
+    try:
+        if read_text is not None:
+            text = _measure_input(profile, read_text)
+        _measure_parse(profile, text)
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    return profile
+
+
+def _measure_input(profile, read_text):
+    return profile.measure(MEMORY_STAGE_INPUT, read_text, count=lambda text: text.count("\n"))
+
+
+def _measure_parse(profile, text):
+    profile.input_size = sys.getsizeof(text)
+
+    records = profile.measure(MEMORY_STAGE_RECORDS, lambda: scan_records(text))
+    grouper = profile.measure(MEMORY_STAGE_GROUPS, lambda: group_records(records))
+    result = profile.measure(MEMORY_STAGE_RESULT, grouper.result)
+    profile.measure(MEMORY_STAGE_JSON, lambda: json.dumps(result, indent=2, ensure_ascii=False),
+                    count=lambda json_data: len(result))
+
+
+class MemoryProfileTask:
+    # 入力の取得だけを呼び出し元のスレッドで計測し、解析以降の段階をワーカースレッドで計測する
+    # Textウィジェットのように呼び出し元のスレッドでしか読めない入力も、GUIスレッドを待たせずに計測できる
+    # 結果のMemoryProfileまたは例外はキュー経由で渡し、GUIスレッドはpoll()で受け取る
+    def __init__(self, read_text, top=MEMORY_TOP_SITES):
+        self.read_text = read_text
+        self.profile = MemoryProfile(top)
+        self.messages = queue.Queue()
+        self.thread = None
+        self._started_tracing = False
+
+    def start(self):
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+        try:
+            text = _measure_input(self.profile, self.read_text)
+        except Exception as e:
+            self._finish((MESSAGE_ERROR, e))
+            return
+
+        self.thread = threading.Thread(target=self.run, args=(text,), daemon=True)
+        self.thread.start()
+
+    def run(self, text):
+        try:
+            _measure_parse(self.profile, text)
+            message = (MESSAGE_DONE, self.profile)
+        except Exception as e:
+            message = (MESSAGE_ERROR, e)
+        self._finish(message)
+
+    def poll(self):
+        # GUIスレッドから呼び出し、結果がまだなければNoneを返す
+        try:
+            return self.messages.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _finish(self, message):
+        # 結果を渡す前に計測を止め、続けて始めた計測のtracemallocを止めないようにする
+        if self._started_tracing:
+            tracemalloc.stop()
+        self.messages.put(message)
@@ -1,7 +1,18 @@
 import os
+import queue
 import subprocess
+import threading
+import time
 
-from utils.config_manager import load_config
+from utils.config_manager import load_config, load_settings
+
+HELPER_POLL_INTERVAL = 50
+HELPER_PING_TIMEOUT = 2
+
+HELPER_PATH_SETTINGS = {
+    "soap_copy": "soap_copy_file_path",
+    "mouse_operation": "operation_file_path",
+}
 
 
 def soap_copy():
@@ -41,3 +52,266 @@ def main(operation_type=None):
         soap_copy()
     else:
         run_mouse_operation()
+
+
+def get_helper_command(operation_type=None):
+    settings = load_settings()
+    name = HELPER_PATH_SETTINGS.get(operation_type, "operation_file_path")
+    return [getattr(settings, name)]
+
+
+def get_helper_request(operation_type=None):
+    return operation_type if operation_type in HELPER_PATH_SETTINGS else "mouse_operation"
+
+
+class PersistentHelper:
+    # 常駐ヘルパーを1度だけ起動し、標準入力に1行の要求を書き込み、標準出力の1行を応答として受け取る
+    # 要求は操作名（soap_copy / mouse_operation / ping）、応答は ok / pong / error <内容> とする
+    # 応答は読み取りスレッドがキューに入れるため、GUIスレッドは待たずに確認できる
+    # 起動時はpingを送るだけで戻り、pongの到着はpoll_ready()で確認する
+    def __init__(self, command, ping_timeout=HELPER_PING_TIMEOUT):
+        self.command = command
+        self.ping_timeout = ping_timeout
+
+        self.process = None
+        self.responses = None
+        self.ready = False
+        self.ping_deadline = None
+        self.start_count = 0
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.stop()
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        text=True, encoding='utf-8', bufsize=1)
+        self.responses = queue.Queue()
+        self.start_count += 1
+        threading.Thread(target=self._read_responses, args=(self.process, self.responses), daemon=True).start()
+
+        self.ping_deadline = time.monotonic() + self.ping_timeout
+        self.submit("ping")
+
+    def stop(self):
+        self.ready = False
+        if self.process is None:
+            return
+
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process = None
+
+    def poll_ready(self):
+        # 起動時のpingに応答していればTrue、まだならFalseを返す
+        # 終了した・エラーを返した・制限時間内に応答しなかった場合は停止してRuntimeErrorを送出する
+        if self.ready:
+            return True
+
+        try:
+            response = self.poll_response()
+        except RuntimeError:
+            self.stop()
+            raise
+
+        if response is None:
+            if time.monotonic() < self.ping_deadline:
+                return False
+            self.stop()
+            raise RuntimeError("常駐ヘルパーが応答しません")
+
+        if response != "pong":
+            self.stop()
+            raise RuntimeError(f"常駐ヘルパーの応答が不正です: {response}")
+
+        self.ready = True
+        return True
+
+    def request(self, request, timeout):
+        # 応答を待つ同期版。GUIスレッドでは使わず、遅延の計測などに使う
+        self.submit(request)
+        try:
+            response = self.responses.get(timeout=timeout)
+        except queue.Empty:
+            self.stop()
+            raise subprocess.TimeoutExpired(self.command, timeout)
+        return self._check_response(response)
+
+    def submit(self, request):
+        self.process.stdin.write(request + "\n")
+        self.process.stdin.flush()
+
+    def poll_response(self):
+        # 応答がまだなければNoneを返す
+        try:
+            response = self.responses.get_nowait()
+        except queue.Empty:
+            return None
+        return self._check_response(response)
+
+    def _check_response(self, response):
+        if response is None:
+            self.stop()
+            raise RuntimeError("常駐ヘルパーが終了しました")
+        if response.startswith("error"):
+            raise RuntimeError(f"常駐ヘルパーエラー: {response[len('error'):].strip()}")
+        return response
+
+    @staticmethod
+    def _read_responses(process, responses):
+        for line in process.stdout:
+            responses.put(line.rstrip("\n"))
+        responses.put(None)
+
+
+def create_persistent_helper():
+    # 常駐ヘルパーが設定されていなければ、毎回実行ファイルを起動する方式を使う
+    path = load_settings().helper_server_path
+    if not path:
+        return None
+    return PersistentHelper([path])
+
+
+class HelperRunner:
+    # 外部ヘルパーEXEを待たずに起動し、終了をafter()で確認してGUIスレッドでon_doneを呼ぶ
+    # 常駐ヘルパーがあれば要求を送って応答を待ち、使えない場合は毎回EXEを起動する
+    # 常駐ヘルパーの起動と応答確認もafter()の確認の中で進め、GUIスレッドを待たせない
+    # 実行中は次の起動を受け付けず、制限時間を過ぎたプロセスは強制終了する
+    def __init__(self, scheduler, poll_interval=HELPER_POLL_INTERVAL, persistent_helper=None):
+        self.scheduler = scheduler
+        self.poll_interval = poll_interval
+        self.persistent_helper = persistent_helper
+
+        self.process = None
+        self.request = None
+        self.submitted = False
+        self.command = None
+        self.timeout = None
+        self.started = None
+        self.deadline = None
+        self.on_done = None
+        self.last_elapsed = None
+        self._after_id = None
+
+    def is_running(self):
+        return self.on_done is not None
+
+    def run(self, command, on_done, timeout=None, request=None):
+        if self.is_running():
+            return False
+
+        if timeout is None:
+            timeout = load_settings().helper_timeout
+
+        if not (request is not None and self._submit(request)):
+            # 起動に失敗した場合は例外をそのまま呼び出し元へ返す
+            self.process = subprocess.Popen(command)
+
+        self.command = command
+        self.timeout = timeout
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout
+        self.on_done = on_done
+        self._after_id = self.scheduler.after(self.poll_interval, self.poll)
+        return True
+
+    def cancel(self):
+        if self._after_id is not None:
+            self.scheduler.after_cancel(self._after_id)
+            self._after_id = None
+        if self.process is not None:
+            self._kill()
+        elif self.request is not None:
+            self.persistent_helper.stop()
+        self._reset()
+
+    def close(self):
+        self.cancel()
+        if self.persistent_helper is not None:
+            self.persistent_helper.stop()
+
+    def poll(self):
+        self._after_id = None
+        if not self.is_running():
+            return
+
+        try:
+            finished, error = self._check_finished()
+        except Exception as e:
+            finished, error = True, e
+
+        if not finished:
+            if time.monotonic() < self.deadline:
+                self._after_id = self.scheduler.after(self.poll_interval, self.poll)
+                return
+            if self.process is not None:
+                self._kill()
+            else:
+                self.persistent_helper.stop()
+            error = subprocess.TimeoutExpired(self.command, self.timeout)
+
+        on_done = self.on_done
+        self.last_elapsed = time.monotonic() - self.started
+        self._reset()
+        on_done(error)
+
+    def _submit(self, request):
+        helper = self.persistent_helper
+        if helper is None:
+            return False
+
+        try:
+            if not helper.is_alive():
+                # 起動してpingを送るだけで戻り、応答はpoll()で確認してから要求を送る
+                helper.start()
+            elif helper.ready:
+                helper.submit(request)
+                self.submitted = True
+        except OSError as e:
+            print(f"常駐ヘルパーを使用できません: {e}")
+            helper.stop()
+            return False
+
+        self.request = request
+        return True
+
+    def _check_finished(self):
+        if self.process is None:
+            helper = self.persistent_helper
+            if self.submitted:
+                return helper.poll_response() is not None, None
+
+            try:
+                if helper.poll_ready():
+                    helper.submit(self.request)
+                    self.submitted = True
+            except (OSError, RuntimeError) as e:
+                # 常駐ヘルパーが起動しなかった場合は、今回の操作だけEXEを起動して続ける
+                print(f"常駐ヘルパーを使用できません: {e}")
+                helper.stop()
+                self.process = subprocess.Popen(self.command)
+            return False, None
+
+        returncode = self.process.poll()
+        if returncode is None:
+            return False, None
+        if returncode != 0:
+            return True, subprocess.CalledProcessError(returncode, self.command)
+        return True, None
+
+    def _kill(self):
+        self.process.kill()
+        self.process.wait()
+
+    def _reset(self):
+        self.process = None
+        self.request = None
+        self.submitted = False
+        self.command = None
+        self.deadline = None
+        self.on_done = None
@@ -0,0 +1,48 @@
+import tkinter as tk
+
+OUTPUT_CHUNK_SIZE = 1 << 15
+OUTPUT_CHUNK_DELAY = 1
+
+
+class ChunkedTextRenderer:
+    # 大きなテキストを行単位のチャンクに分けてafter()で少しずつTextウィジェットに挿入する
+    # 最初のチャンクはすぐに表示し、文書全体はtextに保持してコピーや保存に使う
+    def __init__(self, text_widget, chunk_size=OUTPUT_CHUNK_SIZE, delay=OUTPUT_CHUNK_DELAY):
+        self.text_widget = text_widget
+        self.chunk_size = chunk_size
+        self.delay = delay
+
+        self.text = ""
+        self.position = 0
+        self._after_id = None
+
+    def render(self, text):
+        self.cancel()
+        self.text_widget.delete("1.0", tk.END)
+
+        self.text = text
+        self.position = 0
+        self._render_next()
+
+    def clear(self):
+        self.render("")
+
+    def cancel(self):
+        if self._after_id is not None:
+            self.text_widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def is_complete(self):
+        return self.position >= len(self.text)
+
+    def _render_next(self):
+        self._after_id = None
+        if self.is_complete():
+            return
+
+        end = self.text.find("\n", self.position + self.chunk_size) + 1 or len(self.text)
+        self.text_widget.insert(tk.END, self.text[self.position:end])
+        self.position = end
+
+        if not self.is_complete():
+            self._after_id = self.text_widget.after(self.delay, self._render_next)
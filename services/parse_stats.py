@@ -0,0 +1,119 @@
+import time
+import unicodedata
+
+STAGE_READ = 'read'
+STAGE_CLASSIFY = 'classify'
+STAGE_FLUSH = 'flush'
+STAGE_GROUP = 'group'
+STAGE_TIMESTAMP = 'timestamp'
+STAGE_SORT = 'sort'
+STAGE_BUILD = 'build'
+STAGE_DEDUPE = 'dedupe'
+STAGE_JSON = 'json'
+
+STAGE_LABELS = {
+    STAGE_READ: '読み込み',
+    STAGE_CLASSIFY: '行の分類',
+    STAGE_FLUSH: 'レコード確定',
+    STAGE_GROUP: 'グループ化',
+    STAGE_TIMESTAMP: 'タイムスタンプ変換',
+    STAGE_SORT: '並べ替え',
+    STAGE_BUILD: 'グループ出力',
+    STAGE_DEDUPE: '重複グループ除去',
+    STAGE_JSON: 'JSON化',
+}
+
+COUNT_LINES = 'lines'
+COUNT_MARKERS = 'markers'
+COUNT_RECORDS = 'records'
+COUNT_DUPLICATE_CONTENTS = 'duplicate_contents'
+COUNT_GROUPS = 'groups'
+COUNT_DUPLICATE_GROUPS = 'duplicate_groups'
+COUNT_OUTPUT_GROUPS = 'output_groups'
+
+COUNT_LABELS = {
+    COUNT_LINES: '行数',
+    COUNT_MARKERS: '見出し候補',
+    COUNT_RECORDS: 'SOAPレコード',
+    COUNT_DUPLICATE_CONTENTS: '省略した重複記載',
+    COUNT_GROUPS: 'グループ',
+    COUNT_DUPLICATE_GROUPS: '省略した重複グループ',
+    COUNT_OUTPUT_GROUPS: '出力グループ',
+}
+
+
+class ParseStats:
+    # 解析の段階ごとの経過時間・呼び出し回数と、行数・レコード数などの件数を記録する
+    # 段階は入れ子にでき、内側の段階の時間は外側の段階から差し引いて記録する
+    # 解析処理はstatsがNoneなら計測を一切行わない
+    def __init__(self):
+        self.times = {}
+        self.calls = {}
+        self.counts = {}
+        self._stack = []
+
+    def start(self, stage):
+        self._stack.append([stage, time.perf_counter(), 0.0])
+
+    def stop(self):
+        stage, started, inner = self._stack.pop()
+        elapsed = time.perf_counter() - started
+
+        self.times[stage] = self.times.get(stage, 0.0) + elapsed - inner
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def total_time(self):
+        return sum(self.times.values())
+
+    def to_dict(self):
+        return {
+            'times': dict(self.times),
+            'calls': dict(self.calls),
+            'counts': dict(self.counts),
+        }
+
+    def report(self):
+        lines = ["段階ごとの時間"]
+        total = self.total_time()
+
+        for stage, label in STAGE_LABELS.items():
+            if stage not in self.times:
+                continue
+            elapsed = self.times[stage]
+            share = elapsed / total * 100 if total else 0
+            lines.append(f"  {pad_label(label)} {elapsed * 1000:>10.1f}ms {share:>5.1f}% {self.calls[stage]:>9}回")
+
+        lines.append(f"  {pad_label('合計')} {total * 1000:>10.1f}ms")
+        lines.append("件数")
+
+        for name, label in COUNT_LABELS.items():
+            if name in self.counts:
+                lines.append(f"  {pad_label(label)} {self.counts[name]:>10}")
+
+        return "\n".join(lines)
+
+
+def pad_label(label, width=20):
+    # 全角文字を2桁として数え、等幅フォントで列がそろうように空白を補う
+    used = sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in label)
+    return label + " " * max(width - used, 0)
+
+
+def iter_timed(items, stats, stage):
+    # 反復の取り出しにかかる時間をstageとして記録する（並列解析の待ち時間などに使う）
+    iterator = iter(items)
+
+    while True:
+        stats.start(stage)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            stats.stop()
+        yield item
@@ -0,0 +1,35 @@
+import tkinter as tk
+
+STATS_REFRESH_DELAY = 150
+
+
+class TextStats:
+    # Textウィジェットの行数・文字数をラベルに表示する
+    # 内容を文字列として取り出さずTk側のindex/countで数え、連続する更新要求はまとめて1回だけ反映する
+    def __init__(self, text_widget, label, delay=STATS_REFRESH_DELAY):
+        self.text_widget = text_widget
+        self.label = label
+        self.delay = delay
+        self._after_id = None
+
+    def schedule(self, event=None):
+        if self._after_id is not None:
+            self.text_widget.after_cancel(self._after_id)
+        self._after_id = self.text_widget.after(self.delay, self.refresh)
+
+    def refresh(self):
+        self._after_id = None
+        lines, chars = self.count()
+        self.label.config(text=f"行数: {lines}  文字数: {chars}")
+
+    def count(self):
+        # 空白以外の文字がなければ0件とする
+        if not self.text_widget.search(r"\S", "1.0", tk.END, regexp=True):
+            return 0, 0
+
+        # 末尾に自動で付く改行を含め、改行の数と改行を除いた文字数を数える
+        lines = int(self.text_widget.index(tk.END).split(".")[0]) - 1
+        counted = self.text_widget.count("1.0", tk.END, "chars")
+        total = counted[0] if counted else 0
+
+        return lines, total - lines
@@ -6,21 +6,22 @@ from tkinter import messagebox, scrolledtext
 
 import pyperclip
 
-from utils.config_manager import load_config
+from services.text_stats import TextStats
+from utils.config_manager import load_settings
 
 
 class TextEditor:
     def __init__(self, parent=None, initial_text=""):
         self.parent = parent
-        self.config = load_config()
+        self.settings = load_settings()
 
-        self.editor_width = self.config.getint('Appearance', 'editor_width', fallback=800)
-        self.editor_height = self.config.getint('Appearance', 'editor_height', fallback=800)
-        self.editor_window_position = self.config.get('Appearance', 'editor_window_position', fallback='+10+10')
-        self.font_size = self.config.getint('Appearance', 'text_area_font_size', fallback=11)
-        self.font_name = self.config.get('Appearance', 'text_area_font_name', fallback='Yu Gothic UI')
-        self.button_width = self.config.getint('Appearance', 'button_width', fallback=15)
-        self.button_height = self.config.getint('Appearance', 'button_height', fallback=2)
+        self.editor_width = self.settings.editor_width
+        self.editor_height = self.settings.editor_height
+        self.editor_window_position = self.settings.editor_window_position
+        self.font_size = self.settings.text_area_font_size
+        self.font_name = self.settings.text_area_font_name
+        self.button_width = self.settings.button_width
+        self.button_height = self.settings.button_height
 
         self.on_close = None
 
@@ -64,21 +65,14 @@ class TextEditor:
                                  width=self.button_width, height=self.button_height)
         close_button.pack(side=tk.LEFT, padx=5)
 
+        self.text_stats = TextStats(self.text_area, self.stats_label)
         self.text_area.bind("<KeyRelease>", self.update_stats)
         self.update_stats(None)
 
         self.window.protocol("WM_DELETE_WINDOW", self.close_window)
 
     def update_stats(self, event):
-        text = self.text_area.get("1.0", tk.END)
-        lines = text.count('\n')
-        chars = len(text) - lines  # 改行文字を除く
-
-        if text.strip() == "":
-            lines = 0
-            chars = 0
-
-        self.stats_label.config(text=f"行数: {lines}  文字数: {chars}")
+        self.text_stats.schedule(event)
 
     def paste_text(self):
         try:
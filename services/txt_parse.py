@@ -1,42 +1,74 @@
 import json
 import os
 import re
-from collections import defaultdict
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from io import StringIO
+from functools import lru_cache
+from typing import NamedTuple
 
+from services.parse_stats import (COUNT_DUPLICATE_CONTENTS, COUNT_DUPLICATE_GROUPS, COUNT_GROUPS, COUNT_LINES,
+                                  COUNT_MARKERS, COUNT_OUTPUT_GROUPS, COUNT_RECORDS, STAGE_BUILD, STAGE_CLASSIFY,
+                                  STAGE_DEDUPE, STAGE_FLUSH, STAGE_GROUP, STAGE_READ, STAGE_SORT, STAGE_TIMESTAMP,
+                                  iter_timed)
 
-def convert_to_timestamp(date_str, time_str):
+
+TIMESTAMP_CACHE_SIZE = 4096
+# 日付・時刻の形式に合わないグループの並べ替えキー。形式に合うグループより前に並ぶ
+NO_TIMESTAMP = -1
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def timestamp_sort_key(date_str, time_str):
+    # 「YYYY/MM/DD」「HH:MM」で始まる日付・時刻を、ISO文字列と同じ順に並ぶ整数YYYYMMDDHHMMにする
+    # 正規表現を使わず固定位置で切り出し、同じ日付・時刻の組は一度だけ変換する
     try:
-        date_match = re.match(r"(\d{4})/(\d{2})/(\d{2})", date_str)
-        if not date_match:
-            return None
+        if not (date_str[4] == date_str[7] == '/' and time_str[2] == ':'):
+            return NO_TIMESTAMP
+        digits = date_str[:4] + date_str[5:7] + date_str[8:10] + time_str[:2] + time_str[3:5]
+    except (TypeError, IndexError):
+        return NO_TIMESTAMP
 
-        year, month, day = date_match.groups()
+    if len(digits) != 12 or not digits.isdecimal():
+        return NO_TIMESTAMP
 
-        time_match = re.match(r"(\d{2}):(\d{2})", time_str)
-        if not time_match:
-            return None
+    return int(digits)
 
-        hour, minute = time_match.groups()
 
-        timestamp = f"{year}-{month}-{day}T{hour}:{minute}:00Z"
+def format_timestamp(date_str, time_str):
+    # timestamp_sort_keyで形式を確認済みの日付・時刻からISO文字列を作る
+    return f"{date_str[:4]}-{date_str[5:7]}-{date_str[8:10]}T{time_str[:2]}:{time_str[3:5]}:00Z"
 
-        return timestamp
-    except Exception:
+
+def convert_to_timestamp(date_str, time_str):
+    try:
+        if timestamp_sort_key(date_str, time_str) == NO_TIMESTAMP:
+            return None
+    except TypeError:
+        # キャッシュのキーにできない値
         return None
 
+    return format_timestamp(date_str, time_str)
+
+
+class SoapRecord(NamedTuple):
+    # 解析で確定したSOAPレコード。件数が多くなるため辞書ではなくタプルで保持する
+    # 日付・診療科・時刻・SOAP区分はsys.internで同じ文字列を共有し、辞書にするのはJSON出力のグループ単位だけにする
+    date: str
+    department: str
+    time: str
+    soap_section: str
+    content: str
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(sys.intern(record['date']), sys.intern(record.get('department', '')),
+                   sys.intern(record.get('time', '')), sys.intern(record['soap_section']), record['content'])
+
 
 def process_record(current_record, content_buffer, records, new_record_data=None):
     if current_record.get('date') and current_record.get('soap_section') and content_buffer.strip():
-        record = {
-            'date': current_record['date'],
-            'department': current_record.get('department', ''),
-            'time': current_record.get('time', ''),
-            'soap_section': current_record['soap_section'],
-            'content': content_buffer.strip()
-        }
-        records.append(record)
+        records.append(SoapRecord.from_dict({**current_record, 'content': content_buffer.strip()}))
 
     if new_record_data:
         current_record.update(new_record_data)
@@ -44,41 +76,367 @@ def process_record(current_record, content_buffer, records, new_record_data=None
     return ""
 
 
-def group_records_by_datetime(records):
-    grouped = defaultdict(dict)
-
-    for record in records:
-        key = (record['date'], record['department'], record['time'])
-
-        soap_section = record['soap_section']
-        soap_mapping = {
-            'S': 'subject',
-            'O': 'object',
-            'A': 'assessment',
-            'P': 'plan',
-            'F': 'comment',
-            'サ': 'summary'
-        }
-        soap_field = soap_mapping.get(soap_section, f"{soap_section}")
-
-        if 'timestamp' not in grouped[key]:
-            timestamp = convert_to_timestamp(record['date'], record['time'])
-            grouped[key]['timestamp'] = timestamp
-            grouped[key]['department'] = record['department']
-
-        content = record['content'].strip()
-        if soap_field in grouped[key]:
-            existing_content = grouped[key][soap_field]
-            if content not in existing_content:
-                grouped[key][soap_field] += "\n" + content
+SOAP_FIELD_MAPPING = {
+    'S': 'subject',
+    'O': 'object',
+    'A': 'assessment',
+    'P': 'plan',
+    'F': 'comment',
+    'サ': 'summary'
+}
+
+
+# 連結済みの記載がこの文字数を超えたフィールドは、既出判定を接尾辞オートマトンに切り替える
+CONTENT_SCAN_LIMIT = 1 << 16
+
+
+class SuffixAutomaton:
+    # 追記しながら「文字列が連結済みのテキストの部分文字列か」を判定する
+    # 追記は1文字あたり償却定数時間、判定は判定する文字列の長さに比例する時間で行う
+    # 状態ごとに遷移の辞書を持つため、1文字あたり数百バイトを使う
+    __slots__ = ('transitions', 'links', 'lengths', 'last')
+
+    def __init__(self, text=""):
+        self.transitions = [{}]
+        self.links = [-1]
+        self.lengths = [0]
+        self.last = 0
+        self.extend(text)
+
+    def extend(self, text):
+        transitions = self.transitions
+        links = self.links
+        lengths = self.lengths
+        last = self.last
+
+        for char in text:
+            current = len(lengths)
+            transitions.append({})
+            links.append(0)
+            lengths.append(lengths[last] + 1)
+
+            state = last
+            while state != -1 and char not in transitions[state]:
+                transitions[state][char] = current
+                state = links[state]
+
+            if state != -1:
+                target = transitions[state][char]
+                if lengths[state] + 1 == lengths[target]:
+                    links[current] = target
+                else:
+                    clone = len(lengths)
+                    transitions.append(dict(transitions[target]))
+                    links.append(links[target])
+                    lengths.append(lengths[state] + 1)
+
+                    while state != -1 and transitions[state].get(char) == target:
+                        transitions[state][char] = clone
+                        state = links[state]
+
+                    links[target] = clone
+                    links[current] = clone
+
+            last = current
+
+        self.last = last
+
+    def __contains__(self, text):
+        transitions = self.transitions
+        state = 0
+
+        for char in text:
+            state = transitions[state].get(char)
+            if state is None:
+                return False
+
+        return True
+
+
+class ContentAccumulator:
+    # SOAPフィールドの記載を出現順に保持し、出力時に一度だけ文字列化する
+    # 既出判定は同一記載ならseenで即座に行い、それ以外は連結済みの記載への部分一致で行う
+    # 記載が1件だけのフィールドが大半のため、seenは2件目を受け取るまで最初の記載そのものを保持する
+    # 連結済みの記載がCONTENT_SCAN_LIMIT文字以下の間は文字列を直接探索し（1回あたりの費用は上限で抑えられる）、
+    # 超えたら記載の一覧と接尾辞オートマトンに切り替えるため、記載数に対して全体で線形時間になる
+    __slots__ = ('seen', 'joined', 'parts', 'automaton')
+
+    def __init__(self):
+        self.seen = None
+        self.joined = None
+        self.parts = None
+        self.automaton = None
+
+    def add(self, content):
+        # 記載を追加した場合にTrue、既出として省略した場合にFalseを返す
+        seen = self.seen
+        if seen is None:
+            self.seen = content
+            self.joined = content
+            return True
+
+        if type(seen) is str:
+            if content == seen:
+                return False
+            self.seen = {seen, content}
+        elif content in seen:
+            return False
         else:
-            grouped[key][soap_field] = content
+            seen.add(content)
+
+        joined = self.joined
+        if joined is not None:
+            if content in joined:
+                return False
+
+            joined = f"{joined}\n{content}"
+            if len(joined) <= CONTENT_SCAN_LIMIT:
+                self.joined = joined
+            else:
+                self.joined = None
+                self.parts = [joined]
+                self.automaton = SuffixAutomaton(joined)
+            return True
+
+        automaton = self.automaton
+        if automaton is None:
+            # 複製した直後は、最初の判定時にオートマトンを作り直す
+            automaton = self.automaton = SuffixAutomaton("\n".join(self.parts))
+
+        if content in automaton:
+            return False
+
+        automaton.extend("\n")
+        automaton.extend(content)
+        self.parts.append(content)
+        return True
+
+    def text(self):
+        if self.joined is not None:
+            return self.joined
+        return "\n".join(self.parts)
+
+    def copy(self):
+        # オートマトンは複製せず、複製側で必要になったときに作り直す
+        accumulator = ContentAccumulator()
+        accumulator.seen = set(self.seen) if type(self.seen) is set else self.seen
+        accumulator.joined = self.joined
+        accumulator.parts = list(self.parts) if self.parts is not None else None
+        return accumulator
+
+
+# 新しいグループが出現した順序の分類
+ORDER_ASCENDING = 'ascending'
+ORDER_DESCENDING_RUNS = 'descending_runs'
+ORDER_UNORDERED = 'unordered'
+
+
+class RecordGrouper:
+    # 重複除去・日時グループ化・並べ替えを1パスで行う
+    # カルテは日付ブロック単位で古い順または新しい順に並んでいることが多いため、
+    # グループの出現順を追跡し、並べ替え済みなら出現順のまま、逆順なら区間を逆につないで出力する
+    def __init__(self, stats=None):
+        self._groups = {}
+        self.stats = stats
+        self.order = ORDER_ASCENDING
+        self._run_count = 1
+        self._last_key = None
+        self._run_first_key = None
+        self._previous_run_first_key = None
+
+    def add(self, record):
+        # 辞書で渡されたレコードも受け付ける
+        if type(record) is not SoapRecord:
+            record = SoapRecord.from_dict(record)
+        date, department, time, soap_section, content = record
+        key = (date, department, time)
+        stats = self.stats
+
+        group = self._groups.get(key)
+        if group is None:
+            if stats is not None:
+                stats.start(STAGE_TIMESTAMP)
+            group = (timestamp_sort_key(date, time), {})
+            if stats is not None:
+                stats.stop()
+                stats.count(COUNT_GROUPS)
+            if self.order != ORDER_UNORDERED:
+                self._track_order(group[0])
+            self._groups[key] = group
+
+        soap_field = SOAP_FIELD_MAPPING.get(soap_section, f"{soap_section}")
+
+        fields = group[1]
+        accumulator = fields.get(soap_field)
+        if accumulator is None:
+            accumulator = fields[soap_field] = ContentAccumulator()
+
+        if not accumulator.add(content.strip()) and stats is not None:
+            stats.count(COUNT_DUPLICATE_CONTENTS)
+
+    def _track_order(self, sort_key):
+        # キーが下がった位置で新しい昇順の区間を始める
+        # どの区間のキーも直前の区間の先頭より小さい間は、区間を逆順につなげば安定ソートと同じ結果になる
+        if self._last_key is None:
+            self._run_first_key = sort_key
+        elif sort_key < self._last_key:
+            self.order = ORDER_DESCENDING_RUNS
+            self._run_count += 1
+            self._previous_run_first_key = self._run_first_key
+            self._run_first_key = sort_key
+
+        if self._previous_run_first_key is not None and sort_key >= self._previous_run_first_key:
+            self.order = ORDER_UNORDERED
+
+        self._last_key = sort_key
+
+    def __len__(self):
+        return len(self._groups)
+
+    def add_all(self, records):
+        if self.stats is None:
+            for record in records:
+                self.add(record)
+            return
+
+        self.stats.start(STAGE_GROUP)
+        try:
+            for record in records:
+                self.add(record)
+        finally:
+            self.stats.stop()
+
+    def touched_groups(self, records):
+        # 自身のグループは変更せず、レコードを加えた後の追加先のグループだけを出現順に返す
+        # 追加先の既存グループはフィールドだけを複製し、その他のグループには触れないため、費用はレコード数だけで決まる
+        touched = {}
+
+        for record in records:
+            if type(record) is not SoapRecord:
+                record = SoapRecord.from_dict(record)
+            date, department, time, soap_section, content = record
+            key = (date, department, time)
+
+            group = touched.get(key)
+            if group is None:
+                group = self._groups.get(key)
+                if group is None:
+                    group = (timestamp_sort_key(date, time), {})
+                else:
+                    sort_key, fields = group
+                    group = (sort_key, {field: accumulator.copy() for field, accumulator in fields.items()})
+                touched[key] = group
+
+            soap_field = SOAP_FIELD_MAPPING.get(soap_section, f"{soap_section}")
+            fields = group[1]
+            accumulator = fields.get(soap_field)
+            if accumulator is None:
+                accumulator = fields[soap_field] = ContentAccumulator()
+            accumulator.add(content.strip())
+
+        return touched
+
+    def group(self, key):
+        return self._groups[key]
+
+    def sorted_groups(self):
+        return list(self._iter_sorted_groups())
+
+    def _ordered_groups(self):
+        groups = self._groups.items()
+
+        if self.order == ORDER_ASCENDING:
+            return groups
+
+        if self.order == ORDER_DESCENDING_RUNS:
+            if self._run_count == len(self._groups):
+                return reversed(groups)
+            return _reverse_runs(list(groups))
+
+        # 部分的に並んだ区間の検出とマージはsorted（Timsort）に任せる
+        return sorted(groups, key=_group_sort_key)
+
+    def _iter_sorted_groups(self):
+        stats = self.stats
+        if stats is None:
+            for group in self._ordered_groups():
+                yield build_group_record(group)
+            return
+
+        stats.start(STAGE_SORT)
+        groups = self._ordered_groups()
+        stats.stop()
+
+        for group in groups:
+            stats.start(STAGE_BUILD)
+            record = build_group_record(group)
+            stats.stop()
+            yield record
+
+    def iter_result(self):
+        seen_records = set()
+        stats = self.stats
+
+        for record in self._iter_sorted_groups():
+            if stats is not None:
+                stats.start(STAGE_DEDUPE)
+            record_key = record_dedupe_key(record)
+            is_new = record_key not in seen_records
+            if is_new:
+                seen_records.add(record_key)
+            if stats is not None:
+                stats.stop()
+                stats.count(COUNT_OUTPUT_GROUPS if is_new else COUNT_DUPLICATE_GROUPS)
+
+            if is_new:
+                yield record
+
+    def result(self):
+        return list(self.iter_result())
+
+
+def _group_sort_key(item):
+    return item[1][0]
+
+
+def _reverse_runs(groups):
+    # 昇順の区間を後ろの区間から順につなぐ
+    ordered = []
+    end = len(groups)
+
+    for index in range(end - 1, 0, -1):
+        if groups[index][1][0] < groups[index - 1][1][0]:
+            ordered.extend(groups[index:end])
+            end = index
 
-    result = list(grouped.values())
+    ordered.extend(groups[:end])
+    return ordered
 
-    result.sort(key=lambda x: x['timestamp'] if x['timestamp'] else '')
 
-    return result
+def build_group_record(item):
+    # グループは(日付, 診療科, 時刻)をキーに(並べ替えキー, フィールド)を保持し、ISO文字列は出力時に作る
+    (date, department, time), (sort_key, fields) = item
+    timestamp = format_timestamp(date, time) if sort_key != NO_TIMESTAMP else None
+
+    record = {'timestamp': timestamp, 'department': department}
+    for soap_field, accumulator in fields.items():
+        record[soap_field] = accumulator.text()
+
+    return record
+
+
+def record_dedupe_key(record):
+    try:
+        return frozenset(record.items())
+    except TypeError:
+        return json.dumps(record, sort_keys=True, ensure_ascii=False)
+
+
+def group_records_by_datetime(records):
+    grouper = RecordGrouper()
+    grouper.add_all(records)
+
+    return grouper.sorted_groups()
 
 
 def remove_duplicates(records):
@@ -86,65 +444,379 @@ def remove_duplicates(records):
     unique_records = []
 
     for record in records:
-        record_str = json.dumps(record, sort_keys=True, ensure_ascii=False)
+        record_key = record_dedupe_key(record)
 
-        if record_str not in seen_records:
-            seen_records.add(record_str)
+        if record_key not in seen_records:
+            seen_records.add(record_key)
             unique_records.append(record)
 
     return unique_records
 
 
-def parse_medical_text(text):
-    records = []
-    current_record = {}
-    content_buffer = ""
+DATE_PATTERN = re.compile(r"(\d{4}/\d{2}/\d{2}\(.?\))(?:\s*（入院\s*(\d+)\s*日目）)?")
+SOAP_PATTERN = re.compile(r"([SOAPFサ])\s*>")
+WHITESPACE_RUN_PATTERN = re.compile(r"\s+")
+SPACED_TIME_PATTERN = re.compile(r"\s(\d{2}:\d{2})")
+TIME_PATTERN = re.compile(r"\d{2}:\d{2}")
+# 「診療科 担当医 区分 時刻」の典型的なエントリ行
+SIMPLE_ENTRY_PATTERN = re.compile(r"(\S+)\s+\S+\s+\S+\s+(\d{2}:\d{2})")
+DATE_LINE_CANDIDATE_PATTERN = re.compile(r"^[^\S\n]*\d{4}/\d{2}/\d{2}\(", re.MULTILINE)
+# 日付・エントリ・SOAP行になりうる箇所だけを全文から出現順に拾い出す
+# 行頭の候補は、日付行（group 1）・「:」を含まないSOAP行（group 2）を行末まで捕捉し、
+# それ以外の日付らしき行・SOAP記号で始まる行は行頭だけを拾う
+# 行中の候補は「空白 + 時刻」の時刻を拾う。どの分岐も固定文字から始めて、正規表現エンジンの高速な前方探索を効かせる
+MARKER_PATTERN = re.compile(
+    r"\n[^\S\n]*(?:(\d{4}/\d{2}/\d{2}\(.?\))[^\n]*|([SOAPFサ])[^\S\n]*>[^:\n]*(?![^\n])"
+    r"|\d{4}/\d{2}/\d{2}\(|[SOAPFサ][^\S\n]*>)"
+    r"|:(?<=[^\S\n]\d{2}:)\d{2}")
+
+CONTENT_BLOCK_SIZE = 1 << 18
+PARALLEL_MIN_CHUNK_SIZE = 1 << 20
+
+LINE_DATE = 'date'
+LINE_ENTRY = 'entry'
+LINE_SOAP = 'soap'
+
+
+def match_entry_line(line):
+    # 旧パターン (.+?)\s+(.+?)\s+(.+?)\s+(\d{2}:\d{2}) と同じ結果を、
+    # バックトラックを起こさない線形時間の探索で求める
+    simple_match = SIMPLE_ENTRY_PATTERN.match(line)
+    if simple_match:
+        return simple_match.groups()
+
+    first_gap = WHITESPACE_RUN_PATTERN.search(line)
+    if first_gap is None:
+        return None
 
-    date_pattern = re.compile(r"(\d{4}/\d{2}/\d{2}\(.?\))(?:\s*（入院\s*(\d+)\s*日目）)?")
-    entry_pattern = re.compile(r"(.+?)\s+(.+?)\s+(.+?)\s+(\d{2}:\d{2})")
-    soap_pattern = re.compile(r"([SOAPFサ])\s*>")
+    gap_start, gap_end = first_gap.span()
+    department = line[:gap_start]
 
-    for line in StringIO(text):
-        line = line.strip()
-        if not line:
-            continue
+    second_gap = WHITESPACE_RUN_PATTERN.search(line, gap_end)
+    if second_gap:
+        second_start, second_end = second_gap.span()
 
-        date_match = date_pattern.match(line)
-        if date_match:
-            content_buffer = process_record(current_record, content_buffer, records, {'date': date_match.group(1)})
-            continue
+        time_match = SPACED_TIME_PATTERN.search(line, second_end + 1)
+        if time_match:
+            return department, time_match.group(1)
 
-        entry_match = entry_pattern.match(line)
-        if entry_match and current_record.get('date'):
-            content_buffer = process_record(current_record, content_buffer, records, {
-                'department': entry_match.group(1).strip(),
-                'time': entry_match.group(4).strip()
-            })
-            continue
+        if second_end - second_start >= 3:
+            time_match = TIME_PATTERN.match(line, second_end)
+            if time_match:
+                return department, time_match.group(0)
+
+    if gap_end - gap_start >= 3:
+        time_match = SPACED_TIME_PATTERN.search(line, gap_end + 1)
+        if time_match:
+            return department, time_match.group(1)
+
+    if gap_end - gap_start >= 5:
+        time_match = TIME_PATTERN.match(line, gap_end)
+        if time_match:
+            return department, time_match.group(0)
 
-        soap_match = soap_pattern.match(line)
-        if soap_match and current_record.get('department'):
-            content_buffer = process_record(current_record, content_buffer, records,
-                                            {'soap_section': soap_match.group(1)})
+    return None
+
+
+def classify_line(line):
+    date_match = DATE_PATTERN.match(line)
+    if date_match:
+        return LINE_DATE, date_match.group(1)
+
+    entry = match_entry_line(line)
+    if entry:
+        return LINE_ENTRY, entry
+
+    soap_match = SOAP_PATTERN.match(line)
+    if soap_match:
+        return LINE_SOAP, soap_match.group(1)
+
+    return None, None
+
+
+class MedicalTextParser:
+    # feed()で受け取ったチャンクをまとめて走査し、確定したSOAPレコードを返す
+    # 本文は見出し行の間の範囲をレコード確定時に一度だけ文字列化する
+    def __init__(self, stats=None):
+        self.stats = stats
+        self.current_record = {}
+        self._carried_content = []
+        self._partial_line = ""
+        self._records = []
+
+    def feed(self, chunk):
+        if self.stats is not None:
+            self.stats.count(COUNT_LINES, chunk.count("\n"))
+
+        text = self._partial_line + chunk
+        end = text.rfind("\n") + 1
+        self._partial_line = text[end:]
+
+        if end:
+            self._scan(text, end)
+
+        return self._take_records()
+
+    def close(self):
+        if self._partial_line:
+            if self.stats is not None:
+                self.stats.count(COUNT_LINES)
+            self._scan(self._partial_line + "\n")
+            self._partial_line = ""
+
+        self._flush_record()
+
+        return self._take_records()
+
+    def pending_records(self):
+        # 状態を変更せずに、この時点でclose()した場合に確定するレコードを返す
+        parser = MedicalTextParser()
+        parser.current_record = dict(self.current_record)
+        parser._carried_content = list(self._carried_content)
+        parser._partial_line = self._partial_line
+
+        return parser.close()
+
+    def resume(self, current_record):
+        # 並列解析で他プロセスが解析した区間の直後の状態から解析を続ける
+        self._flush_record()
+        self.current_record = dict(current_record)
+
+        return self._take_records()
+
+    def _take_records(self):
+        records = self._records
+        self._records = []
+        return records
+
+    def _scan(self, text, end=None):
+        if end is None:
+            end = len(text)
+
+        if self.stats is not None:
+            self.stats.start(STAGE_CLASSIFY)
+
+        content_start = 0
+        marker_count = 0
+        current_record = self.current_record
+
+        for line_start, line_end, line_type, value in _iter_marker_lines(text, end):
+            marker_count += 1
+            if line_type == LINE_ENTRY:
+                if not current_record.get('date'):
+                    continue
+            elif line_type == LINE_SOAP:
+                if not current_record.get('department'):
+                    continue
+            elif line_type != LINE_DATE:
+                continue
+
+            # 直前の見出しとの間に本文がなく持ち越した本文もなければ、確定するレコードはないため状態だけを更新する
+            if content_start < line_start and current_record.get('soap_section'):
+                self._flush_record(text, content_start, line_start)
+            elif self._carried_content:
+                self._flush_record()
+            content_start = line_end + 1
+
+            if line_type == LINE_DATE:
+                current_record['date'] = sys.intern(value)
+            elif line_type == LINE_ENTRY:
+                current_record['department'] = sys.intern(value[0])
+                current_record['time'] = sys.intern(value[1])
+            else:
+                current_record['soap_section'] = sys.intern(value)
+
+        # 次のチャンクへ持ち越す本文は、チャンク全体を保持せずに整形済みの該当部分だけを残す
+        if content_start < end and current_record.get('soap_section'):
+            content = _build_content(text, content_start, end)
+            if content:
+                self._carried_content.append(content)
+
+        if self.stats is not None:
+            self.stats.count(COUNT_MARKERS, marker_count)
+            self.stats.stop()
+
+    def _flush_record(self, text="", start=0, end=0):
+        # text[start:end]を直前の見出しからの本文として、持ち越した本文と合わせてレコードを確定する
+        stats = self.stats
+        if stats is not None:
+            stats.start(STAGE_FLUSH)
+
+        content = _build_content(text, start, end) if start < end else ""
+
+        if self._carried_content:
+            if content:
+                self._carried_content.append(content)
+            content = "\n".join(self._carried_content)
+            self._carried_content = []
+
+        current_record = self.current_record
+        if content and current_record.get('date') and current_record.get('soap_section'):
+            # NamedTupleの__new__を経由せずに直接タプルを作る
+            self._records.append(tuple.__new__(SoapRecord, (
+                current_record['date'], current_record.get('department', ''), current_record.get('time', ''),
+                current_record['soap_section'], content)))
+            if stats is not None:
+                stats.count(COUNT_RECORDS)
+
+        if stats is not None:
+            stats.stop()
+
+
+def _build_content(text, start, end):
+    if end - start <= CONTENT_BLOCK_SIZE:
+        return "\n".join(filter(None, map(str.strip, text[start:end].split("\n"))))
+
+    # 巨大な本文は行境界で区切ったブロックごとに整形し、一時的な行リストの大きさを抑える
+    blocks = []
+    while start < end:
+        stop = text.find("\n", min(start + CONTENT_BLOCK_SIZE, end - 1), end) + 1 or end
+        block = "\n".join(filter(None, map(str.strip, text[start:stop].split("\n"))))
+        if block:
+            blocks.append(block)
+        start = stop
+
+    return "\n".join(blocks)
+
+
+def _iter_marker_lines(text, end):
+    # 見出し候補の行を(行頭, 行末, 行の種類, 値)として出現順に返す。見出しでない候補の行は種類をNoneとする
+    # 候補を拾った分岐で判定を振り分け、classify_lineの日付→エントリ→SOAPの順の照合は必要な行だけで行う
+    # ・日付・SOAP行の分岐に一致した行は、行末までの一致でそのまま判定する
+    # ・行中の時刻で拾った行は、日付・SOAP行ではありえないためエントリ行かどうかだけを調べる
+    line_end = text.find("\n")
+    if line_end < 0:
+        line_end = len(text)
+    yield (0, line_end) + classify_line(text[:line_end].strip())
+
+    for match in MARKER_PATTERN.finditer(text, 0, end):
+        position = match.start()
+        if position < line_end:
             continue
 
-        if current_record.get('soap_section'):
-            content_buffer += line + "\n"
+        kind = match.lastindex
+        if kind == 1:
+            line_end = match.end()
+            yield position + 1, line_end, LINE_DATE, match.group(1)
+        elif kind == 2:
+            line_end = match.end()
+            yield position + 1, line_end, LINE_SOAP, match.group(2)
+        elif text[position] == "\n":
+            line_start = position + 1
+            line_end = text.find("\n", line_start)
+            if line_end < 0:
+                line_end = len(text)
+            yield (line_start, line_end) + classify_line(text[line_start:line_end].strip())
+        else:
+            line_start = text.rfind("\n", 0, position) + 1
+            line_end = text.find("\n", position)
+            if line_end < 0:
+                line_end = len(text)
 
-    process_record(current_record, content_buffer, records)
+            entry = match_entry_line(text[line_start:line_end].strip())
+            yield line_start, line_end, LINE_ENTRY if entry else None, entry
 
-    unique_records = []
-    seen_keys = set()
 
-    for record in records:
-        key = (record['date'], record['department'], record['time'], record['soap_section'], record['content'])
+def iter_medical_records(stream, chunk_size=65536, stats=None):
+    parser = MedicalTextParser(stats)
 
-        if key not in seen_keys:
-            seen_keys.add(key)
-            unique_records.append(record)
+    while True:
+        if stats is None:
+            chunk = stream.read(chunk_size)
+        else:
+            stats.start(STAGE_READ)
+            chunk = stream.read(chunk_size)
+            stats.stop()
+        if not chunk:
+            break
+        yield from parser.feed(chunk)
+
+    yield from parser.close()
+
+
+def split_at_date_headers(text, chunk_count):
+    boundaries = [0]
+    chunk_size = len(text) // chunk_count
+
+    for index in range(1, chunk_count):
+        position = max(index * chunk_size, boundaries[-1] + 1)
+
+        for date_match in DATE_LINE_CANDIDATE_PATTERN.finditer(text, position):
+            line_start = date_match.start()
+            line_end = text.find("\n", line_start)
+            line = text[line_start:line_end if line_end >= 0 else len(text)].strip()
+            if classify_line(line)[0] == LINE_DATE:
+                boundaries.append(line_start)
+                break
+        else:
+            break
+
+    boundaries.append(len(text))
+
+    return [text[start:end] for start, end in zip(boundaries, boundaries[1:])]
+
+
+def _find_sync_offset(chunk):
+    # 日付行で始まるチャンクでは、最初のエントリ行の後に現れるSOAP行以降は直前のチャンクの状態に依存しない
+    has_entry = False
+
+    for line_start, _, line_type, _ in _iter_marker_lines(chunk, len(chunk)):
+        if line_type == LINE_ENTRY:
+            has_entry = True
+        elif line_type == LINE_SOAP and has_entry:
+            return line_start
+
+    return None
+
+
+def _parse_chunk(chunk):
+    sync_offset = _find_sync_offset(chunk)
+    if sync_offset is None:
+        return None, [], None
+
+    parser = MedicalTextParser()
+    records = parser.feed(chunk)
+    records.extend(parser.close())
+
+    return sync_offset, records, parser.current_record
+
+
+def iter_medical_records_parallel(text, workers=None, chunk_count=None, stats=None):
+    workers = workers or os.cpu_count() or 1
+    chunk_count = chunk_count or workers * 4
+    chunks = split_at_date_headers(text, chunk_count)
+
+    parser = MedicalTextParser(stats)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk, (sync_offset, records, current_record) in zip(chunks, executor.map(_parse_chunk, chunks)):
+            if sync_offset is None:
+                yield from parser.feed(chunk)
+                continue
+
+            # 同期点より前は直前のチャンクの状態を引き継いで逐次解析する
+            yield from parser.feed(chunk[:sync_offset])
+            yield from parser.resume(current_record)
+            yield from records
+
+    yield from parser.close()
+
+
+def parse_medical_text(text, workers=None, stats=None):
+    grouper = RecordGrouper(stats)
+
+    if workers and workers > 1 and len(text) >= PARALLEL_MIN_CHUNK_SIZE * 2:
+        chunk_count = min(workers * 4, len(text) // PARALLEL_MIN_CHUNK_SIZE)
+        records = iter_medical_records_parallel(text, workers, chunk_count, stats)
+        if stats is not None:
+            # 他プロセスでの解析の待ち時間は行の分類として記録する
+            records = iter_timed(records, stats, STAGE_CLASSIFY)
+        grouper.add_all(records)
+        return grouper.result()
 
-    grouped_records = group_records_by_datetime(unique_records)
+    parser = MedicalTextParser(stats)
 
-    final_records = remove_duplicates(grouped_records)
+    grouper.add_all(parser.feed(text))
+    grouper.add_all(parser.close())
 
-    return final_records
+    return grouper.result()
@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+from benchmarks.bench_parse import compare, main, measure
+from benchmarks.karte_generator import generate_karte
+from services.txt_parse import parse_medical_text
+
+
+class TestGenerateKarte:
+    """合成カルテ生成のテスト"""
+
+    def test_deterministic(self):
+        """同じシードで同じテキストを生成することのテスト"""
+        assert generate_karte(500, seed=3) == generate_karte(500, seed=3)
+        assert generate_karte(500, seed=3) != generate_karte(500, seed=4)
+
+    def test_line_count(self):
+        """指定した行数で生成することのテスト"""
+        for line_count in (1, 10, 1000):
+            assert generate_karte(line_count).count("\n") == line_count
+
+    def test_covers_all_sections(self):
+        """入院日数・1日複数の時刻・全SOAP区分を含むことのテスト"""
+        text = generate_karte(2000)
+        parsed = parse_medical_text(text)
+
+        assert "入院" in text and "日目）" in text
+        for field in ('subject', 'object', 'assessment', 'plan', 'comment', 'summary'):
+            assert any(field in record for record in parsed)
+
+        dates = [record['timestamp'][:10] for record in parsed]
+        assert len(set(dates)) < len(dates)
+
+    def test_duplicate_rate(self):
+        """重複率を上げると解析前のレコード数だけが増えることのテスト"""
+        plain = generate_karte(2000, duplicate_rate=0, overlap_rate=0)
+        duplicated = generate_karte(2000, duplicate_rate=1, overlap_rate=0)
+
+        assert duplicated.count(" >\n") > plain.count(" >\n")
+        assert all(record['timestamp'] for record in parse_medical_text(duplicated))
+
+    def test_descending(self):
+        """新しい日付から並べた生成のテスト"""
+        def date_lines(text):
+            return [line[:10] for line in text.split("\n") if line[:4].isdigit()]
+
+        ascending = date_lines(generate_karte(1000))
+        descending = date_lines(generate_karte(1000, descending=True))
+
+        assert ascending == sorted(set(ascending))
+        assert descending == sorted(set(descending), reverse=True)
+        assert descending[0] == "2024/01/01"
+
+
+class TestBenchmark:
+    """ベンチマークと劣化判定のテスト"""
+
+    def test_measure(self):
+        """計測結果の項目のテスト"""
+        result = measure(300, repeat=1)
+
+        assert result['lines'] == 300
+        assert set(result['stages']) == {'scan', 'group', 'result', 'json'}
+        assert result['records'] >= result['groups'] > 0
+        assert result['lines_per_second'] > 0
+        assert result['peak_memory'] > 0
+        assert result['item_memory']['groups'] > result['item_memory']['records'] > 0
+
+    def test_compare(self):
+        """基準値からの劣化判定のテスト"""
+        baseline = {'results': {'1000': {'lines_per_second': 1000.0, 'peak_memory': 1000}}}
+
+        def current(lines_per_second, peak_memory):
+            return {'results': {'1000': {'lines_per_second': lines_per_second, 'peak_memory': peak_memory},
+                                '5000': {'lines_per_second': 1.0, 'peak_memory': 10 ** 9}}}
+
+        assert compare(current(800.0, 1200), baseline, threshold=0.25, min_lines=1000) == []
+
+        regressions = compare(current(700.0, 1300), baseline, threshold=0.25, min_lines=1000)
+        assert len(regressions) == 2
+        assert all(regression.startswith("1000行") for regression in regressions)
+
+        # 小さい行数の処理速度は揺らぎが大きいため比較せず、メモリだけを比較する
+        assert compare(current(700.0, 1200), baseline, threshold=0.25) == []
+        assert len(compare(current(700.0, 1300), baseline, threshold=0.25)) == 1
+
+    def test_compare_item_memory(self):
+        """1件あたりのメモリの劣化判定と、記録のない基準値との比較のテスト"""
+        result = {'lines_per_second': 1000.0, 'peak_memory': 1000, 'item_memory': {'records': 300, 'groups': 1000}}
+        current = {'results': {'1000': result}}
+
+        old_baseline = {'results': {'1000': {'lines_per_second': 1000.0, 'peak_memory': 1000}}}
+        assert compare(current, old_baseline) == []
+
+        baseline = {'results': {'1000': dict(result, item_memory={'records': 200, 'groups': 1000})}}
+        assert compare(current, baseline) == ["1000行: レコード1件あたりのメモリ 300B (基準 200B)"]
+
+    def test_check_exit_code(self, tmp_path, capsys):
+        """基準値を保存し、劣化があれば終了コード1を返すことのテスト"""
+        baseline_path = tmp_path / "baseline.json"
+
+        assert main(['-s', '200', '-n', '1', '--baseline', str(baseline_path), '--save-baseline']) == 0
+
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        baseline['results']['200']['lines_per_second'] *= 1000
+        baseline_path.write_text(json.dumps(baseline), encoding="utf-8")
+
+        assert main(['-s', '200', '-n', '1', '--baseline', str(baseline_path), '--check']) == 0
+        assert main(['-s', '200', '-n', '1', '--baseline', str(baseline_path), '--check',
+                     '--min-check-lines', '200']) == 1
+        assert "劣化: 200行: 処理速度" in capsys.readouterr().err
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,109 @@
+import pytest
+
+from services.capture_buffer import CaptureBuffer, find_overlap, text_fingerprint, z_array
+
+
+class TestCaptureBuffer:
+    """CaptureBufferクラスのテスト"""
+
+    def test_append_adds_separator_after_content(self):
+        """内容がある場合だけ改行で区切ることのテスト"""
+        buffer = CaptureBuffer()
+
+        assert buffer.append("  \n") == "  \n"
+        assert buffer.has_content is False
+        assert buffer.append("一件目") == "一件目"
+        assert buffer.append("二件目") == "\n二件目"
+
+        assert buffer.text() == "  \n一件目\n二件目"
+        assert buffer.chunks == ["  \n", "一件目", "\n二件目"]
+        assert len(buffer) == 10
+
+    def test_text_fingerprint(self):
+        """長さとハッシュ値による指紋のテスト"""
+        assert text_fingerprint("一件目") == text_fingerprint("".join(["一件", "目"]))
+        assert text_fingerprint("一件目") != text_fingerprint("一件")
+
+    def test_reset(self):
+        """編集後の内容で持ち直すテスト"""
+        buffer = CaptureBuffer()
+        buffer.append("一件目")
+
+        buffer.reset("編集後")
+        assert buffer.text() == "編集後"
+        assert buffer.has_content is True
+
+        buffer.reset()
+        assert buffer.text() == ""
+        assert buffer.chunks == []
+        assert len(buffer) == 0
+
+
+class TestOverlapStitching:
+    """取り込み時の重複行の省略のテスト"""
+
+    def test_z_array(self):
+        """Z配列の計算テスト"""
+        assert z_array("aabxaab") == [7, 1, 0, 0, 3, 1, 0]
+        assert z_array("") == []
+
+    def test_find_overlap_is_line_aligned(self):
+        """行単位でのみ一致とみなすことのテスト"""
+        tail = "S >\n頭痛\n発熱\n咳嗽"
+
+        assert find_overlap(tail, "頭痛\n発熱\n咳嗽\nO >") == len("頭痛\n発熱\n咳嗽")
+        assert find_overlap(tail, "痛\n発熱\n咳嗽\nO >") == 0
+        assert find_overlap(tail, "発熱\n咳嗽があります") == 0
+        assert find_overlap(tail + "\n", "発熱\n咳嗽\nO >") == len("発熱\n咳嗽\n")
+
+    def test_single_line_is_not_stitched(self):
+        """1行だけの一致は記載の繰り返しとして残すことのテスト"""
+        assert find_overlap("S >\n頭痛", "頭痛\nO >") == 0
+        assert find_overlap("S >\n頭痛", "頭痛\nO >", min_lines=1) == len("頭痛")
+
+    def test_overlapping_captures_are_stitched(self):
+        """画面送りで重なった行を省いて追記することのテスト"""
+        buffer = CaptureBuffer()
+        buffer.append("2024/05/26(日)\n内科 医師 外来 14:30\nS >\n頭痛")
+
+        chunk = buffer.append("S >\n頭痛\nO >\n体温 36.5度")
+
+        assert chunk == "\nO >\n体温 36.5度"
+        assert buffer.text() == "2024/05/26(日)\n内科 医師 外来 14:30\nS >\n頭痛\nO >\n体温 36.5度"
+        assert buffer.last_overlap == len("S >\n頭痛")
+        assert buffer.stitched_count == 1
+        assert buffer.saved_length == len("S >\n頭痛")
+        assert buffer.saved_bytes == len("S >\n頭痛".encode('utf-8'))
+
+        report = buffer.report().split("\n")
+        assert report[0] == "クリップボードの取り込み"
+        assert report[1].split() == ["取り込み回数", "2"]
+        assert report[2].split() == ["重なりを省いた回数", "1"]
+        assert report[3].split() == ["省いた文字数", str(len("S >\n頭痛"))]
+        assert report[4].split() == ["省いたバイト数", str(len("S >\n頭痛".encode('utf-8')))]
+
+    def test_fully_contained_capture_adds_nothing(self):
+        """末尾と同じ内容の取り込みは追記しないことのテスト"""
+        buffer = CaptureBuffer()
+        buffer.append("A\nB\nC\nD")
+
+        assert buffer.append("C\nD") == ""
+        assert buffer.text() == "A\nB\nC\nD"
+        assert buffer.capture_count == 2
+
+    def test_overlap_search_is_bounded(self, monkeypatch):
+        """比較する末尾の長さが上限内に収まることのテスト"""
+        monkeypatch.setattr("services.capture_buffer.MAX_OVERLAP_LENGTH", 10)
+        buffer = CaptureBuffer()
+        buffer.append("AAAA\nBBBB\nCCCC\nDDDD")
+
+        # 上限を超える重なりは検出せず、そのまま追記する
+        assert buffer.append("BBBB\nCCCC\nDDDD\nEEEE") == "\nBBBB\nCCCC\nDDDD\nEEEE"
+
+        # 上限内の重なりは検出する
+        buffer.reset("AAAA\nBBBB\nCCCC\nDDDD")
+        assert buffer.append("CCCC\nDDDD\nEEEE") == "\nEEEE"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,217 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from cli import collect_inputs, get_output_path, convert_file, main
+
+
+SAMPLE_TEXT = """2024/05/26(日)
+内科    担当医    外来    14:30
+S >
+頭痛があります
+"""
+
+
+class TestCollectInputs:
+    """入力ファイル収集のテスト"""
+
+    def test_collect_files_and_directories(self, tmp_path):
+        """ファイルとディレクトリ指定の収集テスト"""
+        (tmp_path / "a.txt").write_text(SAMPLE_TEXT, encoding="utf-8")
+        (tmp_path / "b.log").write_text(SAMPLE_TEXT, encoding="utf-8")
+        sub_dir = tmp_path / "sub"
+        sub_dir.mkdir()
+        (sub_dir / "c.txt").write_text(SAMPLE_TEXT, encoding="utf-8")
+
+        result = collect_inputs([str(tmp_path)])
+        assert [relative for _, relative in result] == ["a.txt"]
+
+        result = collect_inputs([str(tmp_path)], recursive=True)
+        assert [relative for _, relative in result] == ["a.txt", os.path.join("sub", "c.txt")]
+
+        result = collect_inputs([str(tmp_path / "b.log"), "-"])
+        assert result == [(str(tmp_path / "b.log"), "b.log"), ("-", "-")]
+
+    def test_get_output_path(self, tmp_path):
+        """出力先パスの決定テスト"""
+        input_path = os.path.join("in", "sub", "a.txt")
+
+        assert get_output_path(input_path, os.path.join("sub", "a.txt")) == os.path.join("in", "sub", "a.json")
+        assert get_output_path(input_path, os.path.join("sub", "a.txt"), "out") == os.path.join("out", "sub", "a.json")
+        assert get_output_path("-", "-", "out") == "-"
+
+
+class TestConvertFile:
+    """ファイル変換のテスト"""
+
+    def test_convert_file_success(self, tmp_path):
+        """正常な変換テスト"""
+        input_path = tmp_path / "a.txt"
+        input_path.write_text(SAMPLE_TEXT, encoding="utf-8")
+        output_path = tmp_path / "out" / "a.json"
+
+        path, record_count, elapsed, error = convert_file(str(input_path), str(output_path))
+
+        assert error is None
+        assert record_count == 1
+        data = json.loads(output_path.read_text(encoding="utf-8"))
+        assert data[0]['subject'] == '頭痛があります'
+
+    def test_convert_file_failure(self, tmp_path):
+        """読み込みエラー時のテスト"""
+        input_path = tmp_path / "broken.txt"
+        input_path.write_bytes(b"\xff\xfe\x00\xd8")
+
+        path, record_count, elapsed, error = convert_file(str(input_path), str(tmp_path / "broken.json"))
+
+        assert error is not None
+        assert "UnicodeDecodeError" in error
+        assert not (tmp_path / "broken.json").exists()
+
+
+class TestMain:
+    """コマンドライン実行のテスト"""
+
+    @pytest.mark.parametrize("jobs", ["1", "2"])
+    def test_convert_directory(self, tmp_path, capsys, jobs):
+        """ディレクトリ一括変換のテスト"""
+        input_dir = tmp_path / "in"
+        input_dir.mkdir()
+        for name in ("a.txt", "b.txt", "c.txt"):
+            (input_dir / name).write_text(SAMPLE_TEXT, encoding="utf-8")
+
+        exit_code = main([str(input_dir), "-o", str(tmp_path / "out"), "-j", jobs])
+
+        assert exit_code == 0
+        assert sorted(os.listdir(tmp_path / "out")) == ["a.json", "b.json", "c.json"]
+        stderr = capsys.readouterr().err
+        assert stderr.count("完了:") == 3
+        assert "失敗 0件" in stderr
+
+    def test_failure_sets_exit_status(self, tmp_path, capsys):
+        """失敗したファイルがある場合の終了ステータスのテスト"""
+        (tmp_path / "a.txt").write_text(SAMPLE_TEXT, encoding="utf-8")
+        (tmp_path / "b.txt").write_bytes(b"\xff\xfe\x00\xd8")
+
+        exit_code = main([str(tmp_path), "-j", "1"])
+
+        assert exit_code == 1
+        assert (tmp_path / "a.json").exists()
+        stderr = capsys.readouterr().err
+        assert "失敗: " in stderr
+        assert "失敗 1件" in stderr
+
+    def test_stdin_to_stdout(self, monkeypatch, capsys):
+        """標準入力から標準出力への変換テスト"""
+        monkeypatch.setattr(sys, "stdin", io.StringIO(SAMPLE_TEXT))
+
+        exit_code = main(["-"])
+
+        assert exit_code == 0
+        data = json.loads(capsys.readouterr().out)
+        assert data[0]['timestamp'] == '2024-05-26T14:30:00Z'
+
+    @pytest.mark.parametrize("output_format", ["json", "jsonl"])
+    def test_stdin_with_files_in_parallel(self, tmp_path, monkeypatch, capsys, output_format):
+        """標準入力とファイルを並列に変換しても標準入力を読み込むことのテスト"""
+        monkeypatch.setattr(sys, "stdin", io.StringIO(SAMPLE_TEXT))
+        (tmp_path / "a.txt").write_text(SAMPLE_TEXT, encoding="utf-8")
+
+        exit_code = main(["-", str(tmp_path / "a.txt"), "-j", "2", "-f", output_format])
+
+        assert exit_code == 0
+        out = capsys.readouterr().out
+        data = json.loads(out) if output_format == "json" else [json.loads(line) for line in out.splitlines()]
+        assert data[0]['subject'] == '頭痛があります'
+        assert (tmp_path / f"a.{output_format}").exists()
+
+    @pytest.mark.parametrize("output_format", ["json", "jsonl"])
+    def test_input_is_not_overwritten(self, tmp_path, capsys, output_format):
+        """出力先が入力ファイルと同じ場合は上書きせずに失敗とすることのテスト"""
+        input_path = tmp_path / f"a.{output_format}"
+        input_path.write_text(SAMPLE_TEXT, encoding="utf-8")
+
+        exit_code = main([str(input_path), "-j", "1", "-f", output_format])
+
+        assert exit_code == 1
+        assert input_path.read_text(encoding="utf-8") == SAMPLE_TEXT
+        assert "出力先が入力ファイルと同じです" in capsys.readouterr().err
+
+    def test_json_lines_format(self, tmp_path, capsys):
+        """JSON Lines形式での出力テスト"""
+        (tmp_path / "a.txt").write_text(SAMPLE_TEXT + "2024/05/27(月)\n外科 担当医 外来 09:00\nP >\n経過観察\n",
+                                        encoding="utf-8")
+
+        exit_code = main([str(tmp_path), "-f", "jsonl", "-j", "1"])
+
+        assert exit_code == 0
+        lines = (tmp_path / "a.jsonl").read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line)['timestamp'] for line in lines] == ['2024-05-26T14:30:00Z', '2024-05-27T09:00:00Z']
+
+    def test_single_file_is_parsed_in_parallel(self, tmp_path, capsys, monkeypatch):
+        """1ファイルだけの変換でファイル内を並列に解析するテスト"""
+        monkeypatch.setattr('services.txt_parse.PARALLEL_MIN_CHUNK_SIZE', 64)
+        text = "".join(SAMPLE_TEXT.replace("26", f"{day:02d}") for day in range(1, 29))
+        (tmp_path / "a.txt").write_text(text, encoding="utf-8")
+
+        calls = []
+        parse = sys.modules['cli'].parse_medical_text
+
+        def spy(text, workers=None, stats=None):
+            calls.append(workers)
+            return parse(text, workers, stats)
+
+        monkeypatch.setattr('cli.parse_medical_text', spy)
+
+        assert main([str(tmp_path / "a.txt"), "-j", "2"]) == 0
+        assert calls == [2]
+        assert json.loads((tmp_path / "a.json").read_text(encoding="utf-8")) == parse(text)
+
+        (tmp_path / "b.txt").write_text(SAMPLE_TEXT, encoding="utf-8")
+        assert main([str(tmp_path), "-j", "1"]) == 0
+        assert calls[1:] == [None, None]
+
+    @pytest.mark.parametrize("output_format, jobs", [("json", "1"), ("jsonl", "1"), ("json", "2")])
+    def test_stats(self, tmp_path, capsys, output_format, jobs):
+        """段階別の計測結果を表示するテスト"""
+        for name in ("a.txt", "b.txt"):
+            (tmp_path / name).write_text(SAMPLE_TEXT, encoding="utf-8")
+
+        exit_code = main([str(tmp_path), "-f", output_format, "-j", jobs, "--stats"])
+
+        assert exit_code == 0
+        stderr = capsys.readouterr().err
+        assert stderr.count("段階ごとの時間") == 2
+        assert "読み込み" in stderr
+        assert "JSON化" in stderr
+        assert "SOAPレコード" in stderr
+
+    def test_memory(self, tmp_path, capsys):
+        """変換せずにメモリの内訳を表示するテスト"""
+        (tmp_path / "a.txt").write_text(SAMPLE_TEXT, encoding="utf-8")
+
+        exit_code = main([str(tmp_path), "--memory"])
+
+        assert exit_code == 0
+        assert not (tmp_path / "a.json").exists()
+        stderr = capsys.readouterr().err
+        assert "メモリ: " in stderr
+        assert "SOAPレコード一覧" in stderr
+        assert "JSON文字列" in stderr
+
+    def test_no_gui_modules_imported(self):
+        """tkinterとpyperclipを読み込まないことのテスト"""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = "import sys, cli; print('tkinter' in sys.modules, 'pyperclip' in sys.modules)"
+
+        result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+
+        assert result.stdout.strip() == "False False"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,156 @@
+import pytest
+
+from services.clipboard_watcher import (ClipboardWatcher, FakeClipboardBackend, PyperclipBackend,
+                                        create_clipboard_backend)
+
+
+class FakeScheduler:
+    """after()/after_cancel()を仮想時刻で実行するスケジューラ"""
+
+    def __init__(self):
+        self.now = 0
+        self.pending = {}
+        self.next_id = 0
+
+    def after(self, delay, callback):
+        self.next_id += 1
+        self.pending[self.next_id] = (self.now + delay, callback)
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_until(self, time):
+        while self.pending:
+            after_id = min(self.pending, key=lambda key: self.pending[key][0])
+            due, callback = self.pending[after_id]
+            if due > time:
+                break
+            del self.pending[after_id]
+            self.now = due
+            callback()
+        self.now = time
+
+
+def create_watcher(backend, **kwargs):
+    scheduler = FakeScheduler()
+    captured = []
+    errors = []
+    watcher = ClipboardWatcher(backend, scheduler, captured.append, errors.append, **kwargs)
+    return watcher, scheduler, captured, errors
+
+
+class TestClipboardWatcher:
+    """ClipboardWatcherクラスのテスト"""
+
+    def test_no_polling_while_stopped(self):
+        """停止中は確認処理を予約しないことのテスト"""
+        backend = FakeClipboardBackend()
+        watcher, scheduler, captured, errors = create_watcher(backend)
+
+        assert scheduler.pending == {}
+
+        watcher.start()
+        assert len(scheduler.pending) == 1
+
+        watcher.stop()
+        scheduler.run_until(10000)
+
+        assert scheduler.pending == {}
+        assert backend.token_count == 1
+
+    def test_change_token_avoids_reading_unchanged_clipboard(self):
+        """変更番号が変わった時だけ内容を読み出すことのテスト"""
+        backend = FakeClipboardBackend("初期")
+        watcher, scheduler, captured, errors = create_watcher(backend)
+
+        watcher.start()
+        scheduler.run_until(5000)
+        assert backend.read_count == 1
+
+        backend.set_text("一件目")
+        scheduler.run_until(5250)
+        backend.set_text("二件目")
+        scheduler.run_until(5500)
+
+        assert captured == ["一件目", "二件目"]
+        assert backend.read_count == 3
+        assert watcher.interval == watcher.min_interval
+
+    def test_same_text_is_not_captured_again(self):
+        """同じ内容の再コピーは取り込まないことのテスト"""
+        backend = FakeClipboardBackend("初期")
+        watcher, scheduler, captured, errors = create_watcher(backend)
+
+        watcher.start()
+        backend.set_text("同じ内容")
+        scheduler.run_until(250)
+        backend.set_text("同じ内容")
+        scheduler.run_until(500)
+
+        assert captured == ["同じ内容"]
+
+    def test_polling_backoff_without_change_token(self):
+        """変更を検知できない場合に確認間隔を延ばすことのテスト"""
+        backend = FakeClipboardBackend("初期", has_change_token=False)
+        watcher, scheduler, captured, errors = create_watcher(backend, min_interval=250, max_interval=2000)
+
+        watcher.start()
+        scheduler.run_until(60000)
+
+        # 250 + 500 + 1000 + 2000 * n のため、1分間の読み出しは30回程度に抑えられる
+        assert watcher.interval == 2000
+        assert backend.read_count < 35
+
+        # 変更を検知すると最短間隔に戻る
+        backend.set_text("新しい内容")
+        next_poll = min(due for due, callback in scheduler.pending.values())
+        scheduler.run_until(next_poll)
+
+        assert captured == ["新しい内容"]
+        assert watcher.interval == 250
+
+    def test_capture_latency_is_bounded(self):
+        """取り込みまでの遅延が最大確認間隔以内であることのテスト"""
+        for has_change_token, max_latency in ((True, 250), (False, 2000)):
+            backend = FakeClipboardBackend(has_change_token=has_change_token)
+            latencies = []
+            scheduler = FakeScheduler()
+            watcher = ClipboardWatcher(backend, scheduler, lambda text: latencies.append(scheduler.now - copied_at))
+
+            watcher.start()
+            for index in range(5):
+                scheduler.run_until(scheduler.now + 7000)
+                copied_at = scheduler.now
+                backend.set_text(f"コピー{index}")
+                scheduler.run_until(scheduler.now + max_latency)
+
+            assert len(latencies) == 5
+            assert max(latencies) <= max_latency
+
+    def test_errors_are_reported_and_polling_continues(self):
+        """読み出しエラーを通知し、監視を続けることのテスト"""
+        backend = FakeClipboardBackend()
+        watcher, scheduler, captured, errors = create_watcher(backend)
+
+        watcher.start()
+        backend.error = OSError("クリップボードを開けません")
+        scheduler.run_until(250)
+
+        assert [str(error) for error in errors] == ["クリップボードを開けません"]
+
+        backend.error = None
+        backend.set_text("復旧後")
+        scheduler.run_until(500)
+
+        assert captured == ["復旧後"]
+
+    def test_default_backend_outside_windows(self, monkeypatch):
+        """Windows以外では読み出し比較のバックエンドを使うことのテスト"""
+        monkeypatch.setattr("sys.platform", "linux")
+
+        assert isinstance(create_clipboard_backend(), PyperclipBackend)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,124 @@
+import builtins
+import configparser
+import os
+
+import pytest
+
+from utils import config_manager
+from utils.config_manager import AppSettings, load_config, load_settings, save_config
+
+
+CONFIG_TEXT = """[Appearance]
+window_width = 1200
+text_area_font_name = MS Gothic
+
+[Paths]
+operation_file_path = C:\\test\\mouseoperation.exe
+"""
+
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    path = tmp_path / "config.ini"
+    path.write_text(CONFIG_TEXT, encoding="utf-8")
+    monkeypatch.setattr(config_manager, "CONFIG_PATH", str(path))
+    config_manager.clear_config_cache()
+    yield path
+    config_manager.clear_config_cache()
+
+
+@pytest.fixture
+def open_calls(config_path, monkeypatch):
+    """設定ファイルを開いた回数を記録する"""
+    calls = []
+    original_open = builtins.open
+
+    def counting_open(file, *args, **kwargs):
+        if os.fspath(file) == str(config_path):
+            calls.append(args[0] if args else kwargs.get('mode', 'r'))
+        return original_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", counting_open)
+    return calls
+
+
+def touch_later(path, text):
+    """内容を書き換え、更新日時を確実に変える"""
+    stat = os.stat(path)
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestLoadConfig:
+    """設定読み込みのキャッシュのテスト"""
+
+    def test_repeated_calls_do_not_open_file(self, open_calls):
+        """2回目以降の読み込みでファイルを開かないことのテスト"""
+        first = load_config()
+        for _ in range(10):
+            assert load_config() is first
+            load_settings()
+
+        assert open_calls == ['r']
+
+    def test_reload_when_file_changes(self, config_path, open_calls):
+        """ファイルが更新された場合に読み直すことのテスト"""
+        assert load_settings().window_width == 1200
+
+        touch_later(config_path, CONFIG_TEXT.replace("1200", "1300"))
+
+        assert load_settings().window_width == 1300
+        assert load_settings().window_width == 1300
+        assert open_calls == ['r', 'r']
+
+    def test_save_config_updates_cache(self, config_path, open_calls):
+        """保存した設定がファイルを読み直さずに反映されることのテスト"""
+        config = load_config()
+        config.set('Appearance', 'window_width', '1400')
+
+        save_config(config)
+
+        assert load_config() is config
+        assert load_settings().window_width == 1400
+        assert open_calls == ['r', 'w']
+
+        reread = configparser.ConfigParser()
+        reread.read(str(config_path), encoding="utf-8")
+        assert reread.getint('Appearance', 'window_width') == 1400
+
+    def test_missing_file(self, config_path, monkeypatch):
+        """設定ファイルがない場合のテスト"""
+        monkeypatch.setattr(config_manager, "CONFIG_PATH", str(config_path) + ".missing")
+
+        with pytest.raises(FileNotFoundError):
+            load_config()
+
+
+class TestAppSettings:
+    """型付き設定値のテスト"""
+
+    def test_typed_values_and_fallbacks(self, config_path):
+        """型変換と既定値のテスト"""
+        settings = load_settings()
+
+        assert settings.window_width == 1200
+        assert settings.window_height == 800
+        assert settings.text_area_font_name == 'MS Gothic'
+        assert settings.text_area_font_size == 11
+        assert settings.operation_file_path == 'C:\\test\\mouseoperation.exe'
+        assert settings.soap_copy_file_path == ''
+
+    def test_settings_are_shared(self, config_path):
+        """同じ設定から作った値を使い回すことのテスト"""
+        assert load_settings() is load_settings()
+
+    def test_from_config(self):
+        """ConfigParserからの変換テスト"""
+        config = configparser.ConfigParser()
+        config.read_string("[Appearance]\nbutton_width = 20\n")
+
+        assert AppSettings.from_config(config) == AppSettings(button_width=20)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
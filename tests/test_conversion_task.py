@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from services.conversion_task import (ConversionTask, MESSAGE_CANCELLED, MESSAGE_DONE, MESSAGE_ERROR,
+                                      MESSAGE_PROGRESS)
+from services.txt_parse import parse_medical_text
+
+
+SAMPLE_TEXT = """2024/05/26(日)
+内科    担当医    外来    14:30
+S >
+頭痛があります
+O >
+体温 36.5度
+2024/05/27(月)
+外科    担当医    外来    09:00
+P >
+経過観察
+"""
+
+
+class TestConversionTask:
+    """ConversionTaskクラスのテスト"""
+
+    def test_run_reports_progress_and_result(self):
+        """進捗と変換結果が順にキューへ送られることのテスト"""
+        task = ConversionTask(SAMPLE_TEXT, chunk_size=16)
+
+        task.run()
+        messages = task.poll()
+
+        progress = [message for message in messages if message[0] == MESSAGE_PROGRESS]
+        assert len(progress) == -(-len(SAMPLE_TEXT) // 16)
+        assert [message[1] for message in progress] == sorted(message[1] for message in progress)
+        assert progress[-1][1:3] == (10, 10)
+
+        kind, json_data = messages[-1]
+        assert kind == MESSAGE_DONE
+        assert json.loads(json_data) == parse_medical_text(SAMPLE_TEXT)
+        assert task.poll() == []
+
+    def test_cancel_before_run(self):
+        """中止要求後は変換結果を送らないことのテスト"""
+        task = ConversionTask(SAMPLE_TEXT, chunk_size=16)
+
+        task.cancel()
+        task.run()
+
+        assert task.poll() == [(MESSAGE_CANCELLED,)]
+
+    def test_error_is_reported(self, monkeypatch):
+        """変換中の例外がキュー経由で通知されることのテスト"""
+        def broken_feed(self, chunk):
+            raise ValueError("パースエラー")
+
+        monkeypatch.setattr("services.txt_parse.MedicalTextParser.feed", broken_feed)
+        task = ConversionTask(SAMPLE_TEXT)
+
+        task.run()
+        messages = task.poll()
+
+        assert messages[-1][0] == MESSAGE_ERROR
+        assert str(messages[-1][1]) == "パースエラー"
+
+    def test_start_runs_in_worker_thread(self):
+        """ワーカースレッドで変換が完了することのテスト"""
+        task = ConversionTask(SAMPLE_TEXT)
+
+        task.start()
+        task.thread.join(timeout=5)
+
+        assert not task.is_running()
+        assert task.poll()[-1][0] == MESSAGE_DONE
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
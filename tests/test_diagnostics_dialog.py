@@ -0,0 +1,108 @@
+import pytest
+from unittest.mock import Mock, patch
+
+from services.parse_stats import ParseStats
+from services.txt_parse import parse_medical_text
+
+
+class TestDiagnosticsDialog:
+    """DiagnosticsDialogクラスのテスト"""
+
+    @patch('tkinter.Toplevel')
+    @patch('tkinter.scrolledtext.ScrolledText')
+    @patch('tkinter.Frame')
+    @patch('tkinter.Button')
+    def test_shows_report(self, mock_button, mock_frame, mock_scrolled_text, mock_toplevel):
+        """計測結果を表示するテスト"""
+        from services.diagnostics_dialog import DiagnosticsDialog
+
+        stats = ParseStats()
+        parse_medical_text("2024/05/26(日)\n内科 医師 外来 14:30\nS >\n頭痛があります\n", stats=stats)
+        mock_text_area = Mock()
+        mock_scrolled_text.return_value = mock_text_area
+
+        DiagnosticsDialog(Mock(), stats, True, Mock())
+
+        mock_text_area.insert.assert_called_once_with("end", stats.report())
+        mock_toplevel.return_value.title.assert_called_with("診断情報")
+        assert mock_button.call_args_list[0][1]['text'] == "計測を無効にする"
+        assert [call[1]['text'] for call in mock_button.call_args_list] == ["計測を無効にする", "閉じる"]
+
+    @patch('tkinter.Toplevel')
+    @patch('tkinter.scrolledtext.ScrolledText')
+    @patch('tkinter.Frame')
+    @patch('tkinter.Button')
+    def test_shows_capture_report(self, mock_button, mock_frame, mock_scrolled_text, mock_toplevel):
+        """取り込みの累計を計測結果の後に表示するテスト"""
+        from services.diagnostics_dialog import DiagnosticsDialog
+
+        mock_text_area = Mock()
+        mock_scrolled_text.return_value = mock_text_area
+
+        DiagnosticsDialog(Mock(), None, True, Mock(), capture_report="取り込みの累計")
+
+        message = mock_text_area.insert.call_args[0][1]
+        assert message.startswith("計測結果はまだありません。")
+        assert message.endswith("\n\n取り込みの累計")
+
+    @patch('tkinter.Toplevel')
+    @patch('tkinter.scrolledtext.ScrolledText')
+    @patch('tkinter.Frame')
+    @patch('tkinter.Button')
+    def test_toggle(self, mock_button, mock_frame, mock_scrolled_text, mock_toplevel):
+        """計測が無効な場合の表示と切り替えのテスト"""
+        from services.diagnostics_dialog import DiagnosticsDialog
+
+        on_toggle = Mock()
+        mock_text_area = Mock()
+        mock_scrolled_text.return_value = mock_text_area
+
+        dialog = DiagnosticsDialog(Mock(), None, False, on_toggle)
+
+        assert "計測は無効です" in mock_text_area.insert.call_args[0][1]
+        assert mock_button.call_args_list[0][1]['text'] == "計測を有効にする"
+
+        dialog.toggle()
+
+        on_toggle.assert_called_once_with(True)
+        mock_toplevel.return_value.destroy.assert_called_once()
+
+    @patch('tkinter.Toplevel')
+    @patch('tkinter.scrolledtext.ScrolledText')
+    @patch('tkinter.Frame')
+    @patch('tkinter.Button')
+    def test_memory_report(self, mock_button, mock_frame, mock_scrolled_text, mock_toplevel):
+        """メモリ内訳の表示テスト"""
+        from services.diagnostics_dialog import DiagnosticsDialog
+
+        mock_text_area = Mock()
+        mock_scrolled_text.return_value = mock_text_area
+        on_memory_report = Mock()
+
+        dialog = DiagnosticsDialog(Mock(), None, False, Mock(), on_memory_report)
+
+        assert [call[1]['text'] for call in mock_button.call_args_list] == ["計測を有効にする", "メモリ内訳", "閉じる"]
+
+        # 計測を始めるだけで戻り、計測中はボタンを無効にする
+        dialog.show_memory_report()
+
+        on_memory_report.assert_called_once_with(dialog.set_memory_report)
+        dialog.memory_button.config.assert_called_with(state="disabled")
+        mock_text_area.insert.assert_called_with("end", "メモリを計測しています...")
+
+        dialog.set_memory_report("メモリの計測結果")
+
+        dialog.memory_button.config.assert_called_with(state="normal")
+        mock_text_area.delete.assert_called_with("1.0", "end")
+        mock_text_area.insert.assert_called_with("end", "メモリの計測結果")
+
+        # 計測中に閉じられたダイアログには表示しない
+        mock_toplevel.return_value.winfo_exists.return_value = False
+        mock_text_area.reset_mock()
+        dialog.set_memory_report("閉じた後の結果")
+
+        mock_text_area.insert.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,81 @@
+import io
+import json
+
+import pytest
+
+from services.json_writer import write_json_lines
+
+
+class FlushCountingStream(io.StringIO):
+    def __init__(self, seekable=True):
+        super().__init__()
+        self.flushed_lengths = []
+        self._seekable = seekable
+
+    def seekable(self):
+        return self._seekable
+
+    def flush(self):
+        self.flushed_lengths.append(len(self.getvalue()))
+        super().flush()
+
+
+class TestWriteJsonLines:
+    """JSON Lines出力のテスト"""
+
+    def test_one_record_per_line(self):
+        """1レコード1行で出力されることのテスト"""
+        records = [
+            {'timestamp': '2024-05-26T14:30:00Z', 'department': '内科', 'subject': '頭痛\n発熱'},
+            {'timestamp': '2024-05-26T15:30:00Z', 'department': '外科', 'plan': '経過観察'}
+        ]
+        stream = io.StringIO()
+
+        count = write_json_lines(records, stream)
+
+        lines = stream.getvalue().splitlines()
+        assert count == 2
+        assert len(lines) == 2
+        assert [json.loads(line) for line in lines] == records
+        assert '内科' in lines[0]
+
+    def test_flushes_incrementally_to_pipe(self):
+        """パイプへの出力はレコードごとに書き出されることのテスト"""
+        stream = FlushCountingStream(seekable=False)
+
+        def records():
+            yield {'subject': 'A'}
+            # 2件目を生成する時点で1件目は既に書き出されている
+            assert stream.flushed_lengths
+            yield {'subject': 'B'}
+
+        write_json_lines(records(), stream)
+
+        assert len(stream.flushed_lengths) >= 2
+
+    def test_file_is_flushed_once(self):
+        """ファイルへの出力はレコードごとにflushしないことのテスト"""
+        stream = FlushCountingStream()
+
+        write_json_lines(({'subject': str(i)} for i in range(10)), stream)
+
+        assert stream.flushed_lengths == [len(stream.getvalue())]
+
+    def test_flush_every(self):
+        """flush間隔指定のテスト"""
+        stream = FlushCountingStream()
+
+        write_json_lines(({'subject': str(i)} for i in range(10)), stream, flush_every=5)
+
+        assert len(stream.flushed_lengths) == 3
+
+    def test_empty_records(self):
+        """空のレコード列のテスト"""
+        stream = io.StringIO()
+
+        assert write_json_lines([], stream) == 0
+        assert stream.getvalue() == ""
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,172 @@
+import json
+import statistics
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from services.live_preview import FragmentList, LivePreview
+from services.txt_parse import parse_medical_text
+
+
+CAPTURES = [
+    "2024/05/26(日)\n内科    担当医    外来    14:30\nS >\n頭痛があります",
+    "\n発熱もあります\nO >\n体温 37.5度",
+    "\n2024/05/26(日)\n内科    担当医    外来    14:30\nS >\n頭痛があります",
+    "\n2024/05/27(月)\n外科    担当医    外来    09:00\nP >\n経過観察\n",
+    "A >\n",
+    "改善傾向"
+]
+
+
+def _karte_lines(group_count):
+    """1日1グループのカルテを行の一覧で作る"""
+    lines = []
+    for i in range(group_count):
+        day = date(2020, 1, 1) + timedelta(days=i)
+        lines += [f"{day:%Y/%m/%d}(月)", "内科    担当医    外来    09:00", "S >", f"記載{i}", "O >", f"所見{i}"]
+    return lines
+
+
+def _capture_times(lines, lines_per_capture):
+    """取り込みごとの追記とJSON化の時間を計測する"""
+    preview = LivePreview()
+    times = []
+    for start in range(0, len(lines), lines_per_capture):
+        capture = "\n".join(lines[start:start + lines_per_capture]) + "\n"
+        started = time.perf_counter()
+        preview.append(capture)
+        preview.to_json()
+        times.append(time.perf_counter() - started)
+    return preview, times
+
+
+class TestLivePreview:
+    """LivePreviewクラスのテスト"""
+
+    def test_matches_full_parse_after_each_capture(self):
+        """取り込みごとの結果が全体を解析した結果と一致することのテスト"""
+        preview = LivePreview()
+        text = ""
+
+        for capture in CAPTURES:
+            preview.append(capture)
+            text += capture
+
+            assert preview.records() == parse_medical_text(text)
+
+    def test_records_do_not_change_parser_state(self):
+        """未確定レコードの取り出しが以降の解析に影響しないことのテスト"""
+        preview = LivePreview()
+        preview.append("2024/05/26(日)\n内科 担当医 外来 14:30\nS >\n頭痛")
+
+        assert preview.records()[0]['subject'] == '頭痛'
+        assert preview.records()[0]['subject'] == '頭痛'
+
+        preview.append("があります\n続きの記載\n")
+
+        assert preview.records()[0]['subject'] == '頭痛があります\n続きの記載'
+
+    def test_to_json_is_cached_until_append(self):
+        """JSON文字列は次の追記まで再生成されないことのテスト"""
+        preview = LivePreview()
+        preview.append(CAPTURES[0])
+
+        json_data = preview.to_json()
+
+        assert preview.to_json() is json_data
+        assert json.loads(json_data) == parse_medical_text(CAPTURES[0])
+
+        preview.append(CAPTURES[1])
+
+        assert preview.to_json() is not json_data
+
+    def test_capture_cost_does_not_grow_with_history(self):
+        """取り込み1回あたりの費用が、それまでの取り込み量に比例して増えないことのテスト"""
+        lines = _karte_lines(3000)
+        preview, times = _capture_times(lines, 60)
+
+        early = statistics.median(times[5:35])
+        late = statistics.median(times[-30:])
+
+        assert late < early * 4
+        assert preview.to_json() == json.dumps(parse_medical_text("\n".join(lines) + "\n"), indent=2,
+                                               ensure_ascii=False)
+
+    def test_pending_groups_follow_sort_order(self):
+        """新しい順のカルテに重ねた未確定のグループが日時順に並ぶことのテスト"""
+        captures = [
+            "2024/05/28(火)\n内科 担当医 外来 09:00\nS >\n記載1\n",
+            "2024/05/27(月)\n内科 担当医 外来 09:00\nS >\n記載2\n2024/05/26(日)\n内科 担当医 外来 09:00\nS >\n追記",
+            "\n2024/05/29(水)\n内科 担当医 外来 09:00\nS >\n追記",
+            "\n2024/05/27(月)\n内科 担当医 外来 09:00\nS >\n記載3",
+        ]
+        preview = LivePreview()
+        text = ""
+
+        for capture in captures:
+            preview.append(capture)
+            text += capture
+
+            assert preview.records() == parse_medical_text(text)
+
+        assert [record['timestamp'][:10] for record in preview.records()] == ['2024-05-26', '2024-05-27',
+                                                                              '2024-05-28', '2024-05-29']
+
+    def test_duplicate_groups_are_removed(self):
+        """日時と内容が同じ別グループを、取り込みをまたいで1件だけ出力することのテスト"""
+        captures = [
+            "2024/05/26(日)\n内科 担当医 外来 14:30\nS >\n頭痛\n",
+            "2024/05/26(月)\n内科 担当医 外来 14:30\nS >\n頭",
+            "痛\n",
+            "追記\n",
+        ]
+        preview = LivePreview()
+        text = ""
+
+        for capture in captures:
+            preview.append(capture)
+            text += capture
+
+            assert preview.to_json() == json.dumps(parse_medical_text(text), indent=2, ensure_ascii=False)
+
+    def test_has_text(self):
+        """テキスト取り込み有無の判定テスト"""
+        preview = LivePreview()
+        assert preview.has_text is False
+
+        preview.append("")
+        assert preview.has_text is False
+
+        preview.append("テキスト")
+        assert preview.has_text is True
+
+
+class TestFragmentList:
+    """FragmentListクラスのテスト"""
+
+    def test_keeps_order_across_blocks(self):
+        """ブロックの分割をまたいで位置順に連結することのテスト"""
+        fragments = FragmentList(block_size=2)
+        for position in [5, 1, 3, 2, 4, 0, 6]:
+            fragments.set((position, position, f"key{position}"), f"f{position}")
+        fragments.set((3, 3, "key3"), "f3'")
+
+        assert fragments.text() == "[\nf0,\nf1,\nf2,\nf3',\nf4,\nf5,\nf6\n]"
+
+    def test_pending_does_not_change_fragments(self):
+        """未確定の断片は保持している断片を変えずに重ねることのテスト"""
+        fragments = FragmentList(block_size=2)
+        assert fragments.text({(0, 0, "a"): "p"}) == "[\np\n]"
+
+        for position in range(4):
+            fragments.set((position, position, position), f"f{position}")
+
+        assert fragments.text({(1, 1, 1): "p1", (9, 4, 9): "p9"}) == "[\nf0,\np1,\nf2,\nf3,\np9\n]"
+        assert fragments.text() == "[\nf0,\nf1,\nf2,\nf3\n]"
+        assert [fragment for _, fragment in fragments.items({(1, 1, 1): "p1"})] == ["f0", "p1", "f2", "f3"]
+        assert FragmentList().text() == "[]"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
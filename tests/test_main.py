@@ -1,7 +1,30 @@
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 import json
+import subprocess
 import tkinter as tk
+import time
+
+from services.clipboard_watcher import FakeClipboardBackend
+from utils.config_manager import AppSettings
+from services.txt_parse import parse_medical_text
+
+
+def set_widget_text(widget, text):
+    """Textウィジェットのモックに、get("1.0", END)がtextを返す状態のindex/count/searchを設定する"""
+    widget.get.return_value = text
+    widget.search.return_value = "1.0" if text.strip() else ""
+    widget.index.return_value = f"{text.count(chr(10)) + 1}.0"
+    widget.count.return_value = (len(text),)
+
+
+SAMPLE_TEXT = "2024/05/26(日)\n内科 医師 外来 14:30\nS >\n頭痛があります\n"
+
+
+def run_conversion(converter):
+    """ワーカースレッドの終了を待ってからGUI側のポーリングを実行する"""
+    converter.conversion_task.thread.join(timeout=5)
+    converter.poll_conversion()
 
 
 class TestMedicalTextConverter:
@@ -9,31 +32,24 @@ class TestMedicalTextConverter:
 
     def create_mock_converter(self):
         """テスト用のモックコンバーターを作成"""
-        with patch('main.load_config') as mock_load_config, \
+        with patch('main.load_settings') as mock_load_settings, \
                 patch('tkinter.Frame') as mock_frame, \
                 patch('tkinter.LabelFrame') as mock_labelframe, \
                 patch('tkinter.scrolledtext.ScrolledText') as mock_scrolled_text, \
                 patch('tkinter.Label') as mock_label, \
                 patch('tkinter.Button') as mock_button, \
                 patch('pyperclip.copy') as mock_copy, \
-                patch('main.parse_medical_text') as mock_parse, \
+                patch('main.create_clipboard_backend', return_value=FakeClipboardBackend()), \
+                patch('main.ConversionTask') as mock_conversion_task, \
                 patch('main.TextEditor') as mock_text_editor:
             from main import MedicalTextConverter
 
             # 設定モック
-            mock_config = Mock()
-            mock_config.getint.side_effect = lambda section, key, fallback=None: {
-                'window_width': 1100,
-                'window_height': 800,
-                'text_area_font_size': 11,
-                'button_width': 15,
-                'button_height': 2
-            }.get(key, fallback)
-            mock_config.get.side_effect = lambda section, key, fallback=None: {
-                'main_window_position': '+10+10',
-                'text_area_font_name': 'Yu Gothic UI'
-            }.get(key, fallback)
-            mock_load_config.return_value = mock_config
+            mock_load_settings.return_value = AppSettings(window_width=1100, window_height=800,
+                                                          main_window_position='+10+10',
+                                                          text_area_font_size=11,
+                                                          text_area_font_name='Yu Gothic UI',
+                                                          button_width=15, button_height=2)
 
             # tkinter要素のモック
             mock_root = Mock()
@@ -41,10 +57,11 @@ class TestMedicalTextConverter:
             mock_text_output = Mock()
             mock_stats_label = Mock()
             mock_monitor_status_label = Mock()
+            mock_progress_label = Mock()
 
             mock_text_input.get.return_value = "\n"
             mock_scrolled_text.side_effect = [mock_text_input, mock_text_output]
-            mock_label.side_effect = [mock_stats_label, mock_monitor_status_label]
+            mock_label.side_effect = [mock_stats_label, mock_progress_label, mock_monitor_status_label]
 
             # インスタンス作成
             converter = MedicalTextConverter(mock_root)
@@ -54,63 +71,65 @@ class TestMedicalTextConverter:
             converter.text_output = mock_text_output
             converter.stats_label = mock_stats_label
             converter.monitor_status_label = mock_monitor_status_label
+            converter.progress_label = mock_progress_label
 
-            return converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor
+            return converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor
 
     def test_init_configuration_loading(self):
         """初期化時の設定読み込みテスト"""
-        with patch('main.load_config') as mock_load_config, \
+        with patch('main.load_settings') as mock_load_settings, \
                 patch('tkinter.Frame'), \
                 patch('tkinter.LabelFrame'), \
                 patch('tkinter.scrolledtext.ScrolledText'), \
                 patch('tkinter.Label'), \
                 patch('tkinter.Button'), \
-                patch('main.parse_medical_text'), \
                 patch('main.TextEditor'):
             from main import MedicalTextConverter
 
-            mock_config = Mock()
-            mock_config.getint.return_value = 1100
-            mock_config.get.return_value = '+10+10'
-            mock_load_config.return_value = mock_config
+            mock_load_settings.return_value = AppSettings(window_width=1200, window_height=900,
+                                                          main_window_position='+20+30')
 
             mock_root = Mock()
             converter = MedicalTextConverter(mock_root)
 
             # 検証
-            mock_load_config.assert_called_once()
+            mock_load_settings.assert_called_once()
             mock_root.title.assert_called()
-            mock_root.geometry.assert_called()
+            mock_root.geometry.assert_called_with("1200x900+20+30")
 
     def test_update_stats_with_content(self):
         """コンテンツありでの統計更新テスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
 
         # テキスト入力のモック設定
-        mock_text_input.get.return_value = "行1\n行2\n行3\n"
+        set_widget_text(mock_text_input, "行1\n行2\n行3\n")
 
-        # テスト実行
+        # テスト実行 - 更新要求は遅延して反映される
         converter.update_stats(None)
+        mock_text_input.after.assert_called_with(150, converter.text_stats.refresh)
+        converter.text_stats.refresh()
 
-        # 検証
+        # 検証 - 入力欄の内容を文字列として取り出さない
+        mock_text_input.get.assert_not_called()
         mock_stats_label.config.assert_called_with(text="行数: 3  文字数: 6")
 
     def test_update_stats_empty_content(self):
         """空コンテンツでの統計更新テスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
 
         # 空のテキスト入力
-        mock_text_input.get.return_value = "   \n  \n  "
+        set_widget_text(mock_text_input, "   \n  \n  ")
 
         # テスト実行
         converter.update_stats(None)
+        converter.text_stats.refresh()
 
         # 検証
         mock_stats_label.config.assert_called_with(text="行数: 0  文字数: 0")
 
     def test_set_monitoring_state_enabled(self):
         """クリップボード監視有効化のテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
 
         # テスト実行
         converter.set_monitoring_state(True)
@@ -121,7 +140,7 @@ class TestMedicalTextConverter:
 
     def test_set_monitoring_state_disabled(self):
         """クリップボード監視無効化のテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
 
         # テスト実行
         converter.set_monitoring_state(False)
@@ -133,7 +152,10 @@ class TestMedicalTextConverter:
     @patch('pyperclip.copy')
     def test_start_monitoring(self, mock_copy_patch):
         """監視開始のテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+
+        # 起動直後は監視していないため確認処理は予約されない
+        converter.root.after.assert_not_called()
 
         # テスト実行
         converter.start_monitoring()
@@ -143,12 +165,12 @@ class TestMedicalTextConverter:
         mock_text_input.delete.assert_called_with("1.0", "end")
         mock_text_output.delete.assert_called_with("1.0", "end")
         mock_copy_patch.assert_called_with("")
-        assert converter.clipboard_content == ""
-        assert converter.is_first_check is False
+        assert converter.clipboard_watcher.is_running is True
+        converter.root.after.assert_called_with(250, converter.clipboard_watcher.poll)
 
     def test_clear_text(self):
         """テキストクリアのテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
 
         # テスト実行
         converter.clear_text()
@@ -157,141 +179,278 @@ class TestMedicalTextConverter:
         mock_text_input.delete.assert_called_with("1.0", "end")
         mock_text_output.delete.assert_called_with("1.0", "end")
 
-    @patch('pyperclip.paste')
-    def test_check_clipboard_new_content(self, mock_paste):
+    def test_clipboard_change_appends_text(self):
         """新しいクリップボードコンテンツの検出テスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        backend = converter.clipboard_watcher.backend
 
         # 初期設定
-        converter.is_monitoring_clipboard = True
-        converter.is_first_check = False
-        converter.clipboard_content = "古いコンテンツ"
-        mock_paste.return_value = "新しいコンテンツ"
+        backend.set_text("古いコンテンツ")
+        converter.set_monitoring_state(True)
+        backend.set_text("新しいコンテンツ")
         mock_text_input.get.return_value = "既存のテキスト"
 
         # show_notificationメソッドをモック
         converter.show_notification = Mock()
 
         # テスト実行
-        converter.check_clipboard()
+        converter.clipboard_watcher.poll()
 
         # 検証
-        assert converter.clipboard_content == "新しいコンテンツ"
-        mock_text_input.insert.assert_called()
+        mock_text_input.insert.assert_called_with("end", "\n新しいコンテンツ")
+        assert converter.capture_buffer.text() == "既存のテキスト\n新しいコンテンツ"
         converter.show_notification.assert_called_with("コピーしました")
 
-    @patch('pyperclip.paste')
-    def test_check_clipboard_monitoring_disabled(self, mock_paste):
+    def test_capture_does_not_read_input_widget(self):
+        """取り込み時に入力欄全体を読み出さないことのテスト"""
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        backend = converter.clipboard_watcher.backend
+
+        converter.set_monitoring_state(True)
+        converter.show_notification = Mock()
+        converter.update_stats = Mock()
+        mock_text_input.edit_modified.return_value = False
+
+        for capture in ("   ", "一件目", "二件目"):
+            backend.set_text(capture)
+            converter.clipboard_watcher.poll()
+
+        # 空白だけの取り込みの後は改行を付けず、それ以降は改行で区切る
+        mock_text_input.get.assert_not_called()
+        assert [call[0][1] for call in mock_text_input.insert.call_args_list] == ["   ", "一件目", "\n二件目"]
+        assert converter.capture_buffer.chunks == ["   ", "一件目", "\n二件目"]
+
+    def test_overlapping_capture_notification(self):
+        """重複行を省いた取り込みの通知テスト"""
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        backend = converter.clipboard_watcher.backend
+
+        converter.set_monitoring_state(True)
+        converter.show_notification = Mock()
+        mock_text_input.edit_modified.return_value = False
+
+        backend.set_text("S >\n頭痛\n発熱")
+        converter.clipboard_watcher.poll()
+        backend.set_text("頭痛\n発熱\n咳嗽")
+        converter.clipboard_watcher.poll()
+
+        mock_text_input.insert.assert_called_with("end", "\n咳嗽")
+        converter.show_notification.assert_called_with("コピーしました\n（重複 5文字を省略）")
+
+    def test_clipboard_monitoring_disabled(self):
         """監視無効時のクリップボードチェックテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        backend = converter.clipboard_watcher.backend
 
-        # 監視を無効化
-        converter.is_monitoring_clipboard = False
-        mock_paste.return_value = "新しいコンテンツ"
+        # 監視を開始してから無効化
+        converter.set_monitoring_state(True)
+        converter.set_monitoring_state(False)
+        backend.set_text("新しいコンテンツ")
+        read_count = backend.read_count
 
         # テスト実行
-        converter.check_clipboard()
+        converter.clipboard_watcher.poll()
 
-        # 検証 - 監視が無効なので何も処理されない
+        # 検証 - 監視が無効なので予約が取り消され、クリップボードも読み出されない
+        converter.root.after_cancel.assert_called_once()
+        assert backend.read_count == read_count
         mock_text_input.insert.assert_not_called()
 
-    @patch('pyperclip.paste')
-    def test_check_clipboard_first_check(self, mock_paste):
-        """初回チェック時のクリップボード処理テスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+    def test_existing_clipboard_content_is_not_captured(self):
+        """監視開始時のクリップボード内容を取り込まないことのテスト"""
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        backend = converter.clipboard_watcher.backend
 
-        # 初回チェック設定
-        converter.is_monitoring_clipboard = True
-        converter.is_first_check = True
-        converter.clipboard_content = ""
-        mock_paste.return_value = "初回コンテンツ"
+        # 監視開始前からのコンテンツ
+        backend.set_text("初回コンテンツ")
+        converter.set_monitoring_state(True)
 
         # テスト実行
-        converter.check_clipboard()
+        converter.clipboard_watcher.poll()
 
-        # 検証 - 初回チェックなのでテキスト挿入はされない
-        assert converter.clipboard_content == "初回コンテンツ"
-        assert converter.is_first_check is False
+        # 検証 - 監視開始時点の内容なのでテキスト挿入はされない
         mock_text_input.insert.assert_not_called()
+        assert len(converter.capture_buffer) == 0
 
-    @patch('pyperclip.paste')
-    def test_check_clipboard_exception_handling(self, mock_paste):
+    def test_clipboard_exception_handling(self):
         """クリップボードチェック例外処理のテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
 
         # 例外を発生させる
-        converter.is_monitoring_clipboard = True
-        mock_paste.side_effect = Exception("クリップボードエラー")
+        converter.set_monitoring_state(True)
+        converter.clipboard_watcher.backend.error = Exception("クリップボードエラー")
 
         # printをモック
         with patch('builtins.print') as mock_print:
             # テスト実行
-            converter.check_clipboard()
+            converter.clipboard_watcher.poll()
 
             # 検証
             mock_print.assert_called()
             print_args = mock_print.call_args[0][0]
             assert "クリップボード監視エラー" in print_args
 
-    @patch('services.mouse_automation.main')
+        # 例外後も監視は継続される
+        converter.root.after.assert_called_with(250, converter.clipboard_watcher.poll)
+
+    @patch('main.ConversionTask')
+    @patch('tkinter.messagebox.showinfo')
+    @patch('pyperclip.copy')
+    def test_clipboard_captures_update_live_preview(self, mock_copy_method, mock_showinfo, mock_task_class):
+        """クリップボード取り込みごとの差分解析とプレビュー更新のテスト"""
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+
+        converter.set_monitoring_state(True)
+        converter.show_notification = Mock()
+        mock_text_input.edit_modified.return_value = False
+
+        captures = ["2024/05/26(日)\n内科 医師 外来 14:30\nS >\n頭痛があります", "O >\n体温 37.5度"]
+        text = ""
+        for capture in captures:
+            mock_text_input.get.return_value = text + "\n"
+            converter.clipboard_watcher.backend.set_text(capture)
+            converter.clipboard_watcher.poll()
+            text = text + "\n" + capture if text else capture
+
+        # 取り込んだ分だけが解析され、プレビューが全体の解析結果と一致する
+        json_data = mock_text_output.insert.call_args[0][1]
+        assert json.loads(json_data) == parse_medical_text(text)
+
+        # 変換ボタンは再解析せずにプレビューの結果をそのまま出力する
+        converter.convert_to_json()
+
+        mock_task_class.assert_not_called()
+        mock_copy_method.assert_called_with(json_data)
+        mock_showinfo.assert_called_with("完了", "JSON形式に変換しコピーしました")
+
+    @patch('main.ConversionTask')
+    def test_edited_text_falls_back_to_full_parse(self, mock_task_class):
+        """手入力で編集された場合に全体を解析し直すことのテスト"""
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+
+        mock_text_input.edit_modified.return_value = False
+        converter.append_capture("2024/05/26(日)\n内科 医師 外来 14:30\nS >\n頭痛があります")
+
+        # 編集後の取り込みでは入力欄全体から解析状態を作り直す
+        mock_text_input.edit_modified.return_value = True
+        mock_text_input.get.return_value = SAMPLE_TEXT + "O >\n体温 37.5度\n"
+        converter.append_capture("O >\n体温 37.5度\n")
+
+        json_data = mock_text_output.insert.call_args[0][1]
+        assert json.loads(json_data) == parse_medical_text(SAMPLE_TEXT + "O >\n体温 37.5度\n")
+
+        # 編集された状態での変換はワーカースレッドで全体を解析する
+        converter.convert_to_json()
+
+        mock_task_class.assert_called_once_with(SAMPLE_TEXT + "O >\n体温 37.5度\n", stats=None)
+        assert converter.live_preview is None
+
+    @patch('services.mouse_automation.get_helper_command', return_value=[r'C:\test\soap_copy.exe'])
     @patch('tkinter.messagebox.showerror')
-    def test_soap_copy_success(self, mock_showerror, mock_mouse_main):
+    def test_soap_copy_success(self, mock_showerror, mock_get_command):
         """SOAPコピー成功のテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        converter.helper_runner = Mock()
+        converter.helper_runner.run.return_value = True
 
         # テスト実行
         converter.soap_copy()
 
-        # 検証
+        # 検証: ヘルパーの終了を待たずに戻る
+        mock_get_command.assert_called_with("soap_copy")
+        converter.helper_runner.run.assert_called_once_with([r'C:\test\soap_copy.exe'], converter._on_soap_copy_done,
+                                                            request="soap_copy")
         converter.root.iconify.assert_called_once()
-        mock_mouse_main.assert_called_with("soap_copy")
+        converter.root.deiconify.assert_not_called()
+
+        # 終了の通知で画面を戻す
+        converter._on_soap_copy_done(None)
         converter.root.deiconify.assert_called_once()
+        mock_showerror.assert_not_called()
 
-    @patch('services.mouse_automation.main')
+    @patch('services.mouse_automation.get_helper_command', return_value=[r'C:\test\soap_copy.exe'])
     @patch('tkinter.messagebox.showerror')
-    def test_soap_copy_error(self, mock_showerror, mock_mouse_main):
+    def test_soap_copy_error(self, mock_showerror, mock_get_command):
         """SOAPコピーエラーのテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        converter.helper_runner = Mock()
 
-        # 例外を発生させる
-        mock_mouse_main.side_effect = Exception("SOAPエラー")
-
-        # テスト実行
+        # 起動時の例外
+        converter.helper_runner.run.side_effect = Exception("SOAPエラー")
         converter.soap_copy()
 
-        # 検証
-        mock_showerror.assert_called()
         args = mock_showerror.call_args[0]
         assert args[0] == "エラー"
         assert "SOAPコピー中にエラーが発生しました" in args[1]
 
+        # 時間切れなど終了時のエラー
+        mock_showerror.reset_mock()
+        converter._on_soap_copy_done(subprocess.TimeoutExpired([r'C:\test\soap_copy.exe'], 30))
+
+        converter.root.deiconify.assert_called_once()
+        args = mock_showerror.call_args[0]
+        assert "SOAPコピー中にエラーが発生しました" in args[1]
+
+    @patch('services.mouse_automation.get_helper_command', return_value=[r'C:\test\soap_copy.exe'])
+    def test_soap_copy_while_running(self, mock_get_command):
+        """ヘルパー実行中の再実行を受け付けないことのテスト"""
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        converter.helper_runner = Mock()
+        converter.helper_runner.run.return_value = False
+        converter.show_notification = Mock()
+
+        converter.soap_copy()
+
+        converter.root.iconify.assert_not_called()
+        converter.show_notification.assert_called_once_with("実行中です", timeout=1000)
+
     @patch('pyperclip.copy')
-    @patch('main.parse_medical_text')
     @patch('tkinter.messagebox.showinfo')
     @patch('tkinter.messagebox.showwarning')
-    def test_convert_to_json_success(self, mock_showwarning, mock_showinfo, mock_parse_method, mock_copy_method):
+    def test_convert_to_json_success(self, mock_showwarning, mock_showinfo, mock_copy_method):
         """JSON変換成功のテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
 
-        # テスト入力データ（get()は末尾に改行を含む）
-        mock_text_input.get.return_value = "医療テキスト\n"
-        mock_parse_method.return_value = [{"date": "2024/05/26", "content": "テストデータ"}]
+        mock_text_input.get.return_value = SAMPLE_TEXT
 
         # テスト実行
         converter.convert_to_json()
 
-        # 検証（get()の戻り値をそのまま渡すので、改行付きで呼ばれる）
-        mock_parse_method.assert_called_with("医療テキスト\n")
+        # 検証 - 変換はワーカースレッドで行われ、結果はポーリング時に反映される
+        mock_text_output.insert.assert_not_called()
+        converter.root.after.assert_called_with(50, converter.poll_conversion)
+
+        run_conversion(converter)
+
         mock_text_output.delete.assert_called_with("1.0", "end")
-        mock_text_output.insert.assert_called()
-        mock_copy_method.assert_called()
+        json_data = mock_text_output.insert.call_args[0][1]
+        assert json.loads(json_data)[0]['subject'] == '頭痛があります'
+        mock_copy_method.assert_called_with(json_data)
         mock_showinfo.assert_called_with("完了", "JSON形式に変換しコピーしました")
         assert converter.is_monitoring_clipboard is False
+        assert converter.conversion_task is None
+
+    @patch('pyperclip.copy')
+    @patch('tkinter.messagebox.showinfo')
+    def test_large_result_is_rendered_in_chunks(self, mock_showinfo, mock_copy_method):
+        """大きな変換結果を分割して表示し、全体をコピーすることのテスト"""
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        converter.output_renderer.chunk_size = 100
+        json_data = json.dumps([{"subject": f"記載{i}"} for i in range(50)], indent=2, ensure_ascii=False)
+
+        converter._show_conversion_result(json_data)
+
+        first_chunk = mock_text_output.insert.call_args[0][1]
+        assert json_data.startswith(first_chunk)
+        assert len(first_chunk) < len(json_data)
+        mock_text_output.after.assert_called_with(1, converter.output_renderer._render_next)
+        mock_copy_method.assert_called_with(json_data)
+        assert converter.output_renderer.text == json_data
 
     @patch('tkinter.messagebox.showwarning')
     def test_convert_to_json_empty_text(self, mock_showwarning):
         """空テキストでのJSON変換テスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
 
         # 空のテキスト入力
         mock_text_input.get.return_value = "   "
@@ -302,30 +461,69 @@ class TestMedicalTextConverter:
         # 検証
         mock_showwarning.assert_called_with("警告", "変換するテキストがありません。")
 
-    @patch('main.parse_medical_text')
+    @patch('services.txt_parse.MedicalTextParser.feed')
     @patch('tkinter.messagebox.showerror')
-    def test_convert_to_json_error(self, mock_showerror, mock_parse_method):
+    def test_convert_to_json_error(self, mock_showerror, mock_feed):
         """JSON変換エラーのテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
 
         # エラーを発生させる
         mock_text_input.get.return_value = "医療テキスト\n"
-        mock_parse_method.side_effect = Exception("パースエラー")
+        mock_feed.side_effect = Exception("パースエラー")
 
         # テスト実行
         converter.convert_to_json()
+        run_conversion(converter)
 
         # 検証
         mock_showerror.assert_called()
         args = mock_showerror.call_args[0]
         assert args[0] == "エラー"
         assert "変換中にエラーが発生しました" in args[1]
+        assert "パースエラー" in args[1]
+        assert converter.conversion_task is None
+
+    @patch('main.ConversionTask')
+    def test_convert_to_json_progress_and_cancel(self, mock_task_class):
+        """変換中の進捗表示と中止のテスト"""
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+
+        mock_task = mock_task_class.return_value
+        mock_task.total_lines = 4
+        mock_text_input.get.return_value = SAMPLE_TEXT
+
+        converter.convert_to_json()
+
+        # 進捗メッセージでラベルが更新され、ポーリングが継続される
+        mock_task.poll.return_value = [('progress', 2, 4, 0)]
+        converter.root.after.reset_mock()
+        converter.poll_conversion()
+        converter.progress_label.config.assert_called_with(text="変換中: 2 / 4行  0件")
+        converter.root.after.assert_called_once_with(50, converter.poll_conversion)
+
+        # 変換中の再実行は無視される
+        converter.convert_to_json()
+        mock_task_class.assert_called_once_with(SAMPLE_TEXT, stats=None)
+
+        # 中止
+        converter.cancel_conversion()
+        mock_task.cancel.assert_called_once()
+
+        mock_task.poll.return_value = [('cancelled',)]
+        converter.root.after.reset_mock()
+        converter.poll_conversion()
+        converter.root.after.assert_not_called()
+        converter.progress_label.config.assert_called_with(text="変換を中止しました")
+        mock_text_output.insert.assert_not_called()
+        assert converter.conversion_task is None
 
-    @patch('services.mouse_automation.main')
+    @patch('services.mouse_automation.get_helper_command', return_value=[r'C:\test\mouse_operation.exe'])
     @patch('tkinter.messagebox.showerror')
-    def test_run_mouse_automation_success(self, mock_showerror, mock_mouse_main):
+    def test_run_mouse_automation_success(self, mock_showerror, mock_get_command):
         """マウス自動化実行成功のテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        converter.helper_runner = Mock()
+        converter.helper_runner.run.return_value = True
 
         # show_notificationメソッドをモック
         converter.show_notification = Mock()
@@ -334,32 +532,94 @@ class TestMedicalTextConverter:
         converter.run_mouse_automation()
 
         # 検証
+        mock_get_command.assert_called_with()
+        converter.helper_runner.run.assert_called_once_with([r'C:\test\mouse_operation.exe'],
+                                                            converter._on_mouse_automation_done,
+                                                            request="mouse_operation")
         converter.root.iconify.assert_called_once()
-        mock_mouse_main.assert_called_with()
+        converter.show_notification.assert_not_called()
+
+        converter._on_mouse_automation_done(None)
         converter.show_notification.assert_called_with("設定完了", timeout=2000)
 
-    @patch('services.mouse_automation.main')
+    @patch('services.mouse_automation.get_helper_command', return_value=[r'C:\test\mouse_operation.exe'])
     @patch('tkinter.messagebox.showerror')
-    def test_run_mouse_automation_error(self, mock_showerror, mock_mouse_main):
+    def test_run_mouse_automation_error(self, mock_showerror, mock_get_command):
         """マウス自動化実行エラーのテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        converter.helper_runner = Mock()
+        converter.show_notification = Mock()
 
-        # エラーを発生させる
-        mock_mouse_main.side_effect = Exception("マウス操作エラー")
-
-        # テスト実行
-        converter.run_mouse_automation()
+        # 終了コードが0以外の場合
+        converter._on_mouse_automation_done(subprocess.CalledProcessError(1, 'test'))
 
         # 検証
         mock_showerror.assert_called()
         args = mock_showerror.call_args[0]
         assert args[0] == "エラー"
         assert "マウス操作中にエラーが発生しました" in args[1]
+        converter.show_notification.assert_not_called()
+
+    @patch('main.DiagnosticsDialog')
+    def test_diagnostics(self, mock_dialog):
+        """診断情報の表示と計測の切り替えのテスト"""
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        converter.root.bind.assert_any_call("<F12>", converter.open_diagnostics)
+
+        # 既定では計測しない
+        assert converter.live_preview.stats is None
+        converter.open_diagnostics()
+        mock_dialog.assert_called_with(converter.root, None, False, converter.set_parse_stats_enabled,
+                                       converter.create_memory_report, converter.capture_buffer.report())
+
+        # 有効にすると次の取り込みから計測する
+        converter.set_parse_stats_enabled(True)
+        mock_text_input.edit_modified.return_value = False
+        set_widget_text(mock_text_input, SAMPLE_TEXT)
+        converter.append_capture(SAMPLE_TEXT)
+
+        stats = converter.live_preview.stats
+        assert stats is not None
+        assert stats.counts['lines'] == SAMPLE_TEXT.count("\n")
+
+        converter.open_diagnostics()
+        mock_dialog.assert_called_with(converter.root, stats, True, converter.set_parse_stats_enabled,
+                                       converter.create_memory_report, converter.capture_buffer.report())
+        assert "取り込み回数" in mock_dialog.call_args[0][5]
+
+        # メモリ内訳は入力欄の内容をGUIスレッドで読み出し、解析以降はワーカースレッドで計測する
+        on_done = Mock()
+        converter.root.after.reset_mock()
+        converter.create_memory_report(on_done)
+        mock_text_input.get.assert_called_with("1.0", "end-1c")
+        on_done.assert_not_called()
+
+        deadline = time.monotonic() + 10
+        while not on_done.called and time.monotonic() < deadline:
+            interval, callback, *args = converter.root.after.call_args[0]
+            assert (interval, callback) == (100, converter.poll_memory_report)
+            time.sleep(0.01)
+            callback(*args)
+
+        report = on_done.call_args[0][0]
+        assert "入力テキストの取得" in report
+        assert "SOAPレコード一覧" in report
+
+    def test_close_stops_helper(self):
+        """閉じる際に常駐ヘルパーを終了させることのテスト"""
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+        converter.helper_runner = Mock()
+
+        converter.close()
+
+        converter.helper_runner.close.assert_called_once()
+        converter.root.destroy.assert_called_once()
+        converter.root.protocol.assert_called_with("WM_DELETE_WINDOW", converter.close)
 
     @patch('main.TextEditor')
     def test_open_text_editor(self, mock_text_editor_method):
         """テキストエディタ開くテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
 
         # モックエディタインスタンス
         mock_editor_instance = Mock()
@@ -376,7 +636,7 @@ class TestMedicalTextConverter:
 
     def test_restore_clipboard_monitoring(self):
         """クリップボード監視復元のテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
 
         # 監視状態を設定
         converter.is_monitoring_clipboard = True
@@ -387,9 +647,70 @@ class TestMedicalTextConverter:
         # 検証
         assert converter.is_monitoring_clipboard is False
 
+    @patch('tkinter.messagebox.showinfo')
+    @patch('pyperclip.copy')
+    @patch('main.TextEditor')
+    @patch('main.ConversionTask')
+    def test_editor_closed_during_conversion(self, mock_task_class, mock_text_editor_class, mock_copy_method,
+                                             mock_showinfo):
+        """変換中に確認画面を開閉しても変換が完了まで続くことのテスト"""
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+
+        mock_task = mock_task_class.return_value
+        mock_task.total_lines = 4
+        mock_text_input.get.return_value = SAMPLE_TEXT
+        mock_text_input.edit_modified.return_value = True
+
+        converter.convert_to_json()
+        converter.open_text_editor()
+        converter._restore_clipboard_monitoring()
+
+        assert converter.conversion_task is mock_task
+
+        mock_task.poll.return_value = [('done', '[]')]
+        mock_text_input.edit_modified.return_value = False
+        converter.poll_conversion()
+
+        assert converter.conversion_task is None
+        converter.convert_button.config.assert_any_call(state="normal")
+        mock_copy_method.assert_called_with('[]')
+
+    @pytest.mark.parametrize("action", ["start_monitoring", "clear_text"])
+    @patch('tkinter.messagebox.showinfo')
+    @patch('pyperclip.copy')
+    @patch('main.ConversionTask')
+    def test_new_session_discards_running_conversion(self, mock_task_class, mock_copy_method, mock_showinfo,
+                                                     action):
+        """変換中に新規登録・クリアした場合、前のテキストの変換結果を反映しないことのテスト"""
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
+
+        mock_task = mock_task_class.return_value
+        mock_task.total_lines = 4
+        mock_text_input.get.return_value = SAMPLE_TEXT
+        mock_text_input.edit_modified.return_value = True
+
+        converter.convert_to_json()
+        poll_id = converter.root.after.return_value
+        mock_text_input.edit_modified.return_value = False
+        getattr(converter, action)()
+
+        mock_task.cancel.assert_called_once()
+        converter.root.after_cancel.assert_called_with(poll_id)
+        assert converter.conversion_task is None
+        converter.convert_button.config.assert_any_call(state="normal")
+
+        # 破棄した変換が完了しても、新しいセッションのプレビューとクリップボードは変わらない
+        preview = converter.live_preview
+        mock_task.poll.return_value = [('done', '[{"old": "json"}]')]
+        converter.poll_conversion()
+
+        assert converter.live_preview is preview
+        assert all(call.args[0] != '[{"old": "json"}]' for call in mock_copy_method.call_args_list)
+        mock_showinfo.assert_not_called()
+
     def test_show_notification(self):
         """通知表示のテスト"""
-        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_parse, mock_text_editor = self.create_mock_converter()
+        converter, mock_text_input, mock_text_output, mock_stats_label, mock_monitor_status_label, mock_copy, mock_conversion_task, mock_text_editor = self.create_mock_converter()
 
         # Toplevelと関連要素をモック
         with patch('tkinter.Toplevel') as mock_toplevel, \
@@ -414,34 +735,29 @@ class TestMedicalTextConverter:
 class TestMedicalTextConverterIntegration:
     """MedicalTextConverter統合テスト"""
 
-    @patch('main.load_config')
+    @patch('main.load_settings')
     @patch('tkinter.Frame')
     @patch('tkinter.LabelFrame')
     @patch('tkinter.scrolledtext.ScrolledText')
     @patch('tkinter.Label')
     @patch('tkinter.Button')
-    @patch('main.parse_medical_text')
     @patch('pyperclip.copy')
     @patch('tkinter.messagebox.showinfo')
     @patch('main.TextEditor')
-    def test_full_conversion_workflow(self, mock_text_editor, mock_showinfo, mock_copy, mock_parse_method,
+    def test_full_conversion_workflow(self, mock_text_editor, mock_showinfo, mock_copy,
                                       mock_button, mock_label, mock_scrolled_text,
-                                      mock_labelframe, mock_frame, mock_load_config):
+                                      mock_labelframe, mock_frame, mock_load_settings):
         """完全な変換ワークフローの統合テスト"""
         from main import MedicalTextConverter
 
         # 設定とモックの準備
-        mock_config = Mock()
-        mock_config.getint.return_value = 11
-        mock_config.get.return_value = 'Yu Gothic UI'
-        mock_load_config.return_value = mock_config
+        mock_load_settings.return_value = AppSettings()
 
         mock_text_input = Mock()
         mock_text_output = Mock()
-        mock_text_input.get.return_value = "2024/05/26(日)\n内科 医師 外来 14:30\nS >\n頭痛があります\n"
+        mock_text_input.get.return_value = SAMPLE_TEXT
 
         mock_scrolled_text.side_effect = [mock_text_input, mock_text_output]
-        mock_parse_method.return_value = [{"timestamp": "2024-05-26T14:30:00Z", "subject": "頭痛があります"}]
 
         # テスト実行
         mock_root = Mock()
@@ -450,12 +766,17 @@ class TestMedicalTextConverterIntegration:
         converter.text_output = mock_text_output
 
         converter.convert_to_json()
+        run_conversion(converter)
 
-        # 検証（get()の戻り値をそのまま渡す）
-        mock_parse_method.assert_called_once_with("2024/05/26(日)\n内科 医師 外来 14:30\nS >\n頭痛があります\n")
+        # 検証
         mock_text_output.delete.assert_called_with("1.0", "end")
-        mock_text_output.insert.assert_called()
-        mock_copy.assert_called()
+        json_data = mock_text_output.insert.call_args[0][1]
+        assert json.loads(json_data) == [{
+            "timestamp": "2024-05-26T14:30:00Z",
+            "department": "内科",
+            "subject": "頭痛があります"
+        }]
+        mock_copy.assert_called_with(json_data)
         mock_showinfo.assert_called_with("完了", "JSON形式に変換しコピーしました")
 
 
@@ -464,9 +785,8 @@ class TestMainFunction:
 
     @patch('main.MedicalTextConverter')
     @patch('tkinter.Tk')
-    @patch('main.parse_medical_text')
     @patch('main.TextEditor')
-    def test_main_execution(self, mock_text_editor, mock_parse, mock_tk, mock_converter_class):
+    def test_main_execution(self, mock_text_editor, mock_tk, mock_converter_class):
         """メイン実行のテスト"""
         from main import MedicalTextConverter
 
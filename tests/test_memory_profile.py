@@ -0,0 +1,113 @@
+import threading
+import tracemalloc
+
+import pytest
+
+from services.conversion_task import MESSAGE_DONE, MESSAGE_ERROR
+from services.memory_profile import (MEMORY_STAGE_GROUPS, MEMORY_STAGE_INPUT, MEMORY_STAGE_JSON,
+                                     MEMORY_STAGE_RECORDS, MEMORY_STAGE_RESULT, MemoryProfileTask,
+                                     profile_memory)
+
+SAMPLE_TEXT = "".join(
+    f"2024/05/{day:02d}(日)\n内科 医師 外来 14:30\nS >\n頭痛があります{day}\nO >\n体温 37.{day % 10}度\n"
+    for day in range(1, 29)
+)
+
+
+class TestProfileMemory:
+    """段階ごとのメモリ計測のテスト"""
+
+    def test_stages(self):
+        """各段階のピーク・保持量・件数の記録テスト"""
+        profile = profile_memory(SAMPLE_TEXT)
+
+        stages = {stage.name: stage for stage in profile.stages}
+        assert list(stages) == [MEMORY_STAGE_RECORDS, MEMORY_STAGE_GROUPS, MEMORY_STAGE_RESULT, MEMORY_STAGE_JSON]
+        assert stages[MEMORY_STAGE_RECORDS].items == 56
+        assert stages[MEMORY_STAGE_GROUPS].items == 28
+        assert stages[MEMORY_STAGE_JSON].items == 28
+
+        for stage in profile.stages:
+            assert stage.peak >= stage.retained > 0
+        assert profile.total_retained() == sum(stage.retained for stage in profile.stages)
+        assert not tracemalloc.is_tracing()
+
+    def test_top_sites(self):
+        """保持量の多い確保箇所の記録テスト"""
+        profile = profile_memory(SAMPLE_TEXT, top=3)
+
+        records = profile.stages[0]
+        assert 0 < len(records.top_sites) <= 3
+        assert all(location.startswith("txt_parse.py:") for location, size, count in records.top_sites)
+        assert all(not location.startswith(("memory_profile.py", "tracemalloc.py"))
+                   for stage in profile.stages for location, size, count in stage.top_sites)
+
+        report = profile.report()
+        assert "SOAPレコード一覧の主な確保箇所" in report
+        assert "JSON文字列" in report
+
+    def test_read_text_and_fast_mode(self):
+        """テキスト取得の計測と、確保箇所を集計しない計測のテスト"""
+        profile = profile_memory(read_text=lambda: "".join(list(SAMPLE_TEXT)), top=0)
+
+        assert profile.stages[0].name == MEMORY_STAGE_INPUT
+        assert profile.stages[0].items == SAMPLE_TEXT.count("\n")
+        assert profile.stages[0].retained >= len(SAMPLE_TEXT)
+        assert all(stage.top_sites == [] for stage in profile.stages)
+        assert "主な確保箇所" not in profile.report()
+
+    def test_keeps_existing_tracing(self):
+        """既に開始しているtracemallocを止めないことのテスト"""
+        tracemalloc.start()
+        try:
+            profile_memory(SAMPLE_TEXT, top=0)
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
+
+
+
+class TestMemoryProfileTask:
+    """ワーカースレッドでのメモリ計測のテスト"""
+
+    def test_parses_in_worker_thread(self):
+        """入力の取得は呼び出し元のスレッドで、解析以降はワーカースレッドで計測することのテスト"""
+        read_threads = []
+
+        def read_text():
+            read_threads.append(threading.current_thread())
+            return SAMPLE_TEXT
+
+        task = MemoryProfileTask(read_text, top=0)
+        task.start()
+        task.thread.join(10)
+
+        assert read_threads == [threading.current_thread()]
+        assert task.thread is not threading.current_thread()
+
+        kind, profile = task.poll()
+        assert kind == MESSAGE_DONE
+        assert [stage.name for stage in profile.stages] == [MEMORY_STAGE_INPUT, MEMORY_STAGE_RECORDS,
+                                                            MEMORY_STAGE_GROUPS, MEMORY_STAGE_RESULT,
+                                                            MEMORY_STAGE_JSON]
+        assert profile.stages[1].items == 56
+        assert task.poll() is None
+        assert not tracemalloc.is_tracing()
+
+    def test_read_error(self):
+        """入力の取得に失敗した場合はスレッドを起動せずにエラーを渡すことのテスト"""
+        def read_text():
+            raise RuntimeError("読み出し失敗")
+
+        task = MemoryProfileTask(read_text, top=0)
+        task.start()
+
+        kind, error = task.poll()
+        assert kind == MESSAGE_ERROR
+        assert str(error) == "読み出し失敗"
+        assert task.thread is None
+        assert not tracemalloc.is_tracing()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
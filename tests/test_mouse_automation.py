@@ -2,7 +2,84 @@ import pytest
 from unittest.mock import Mock, patch, MagicMock
 import subprocess
 import os
-from services.mouse_automation import soap_copy, run_mouse_operation, main
+import sys
+import time
+from services.mouse_automation import (soap_copy, run_mouse_operation, main, HelperRunner, PersistentHelper,
+                                      get_helper_command, get_helper_request)
+from utils.config_manager import AppSettings
+
+
+def helper_command(seconds, exit_code=0):
+    """指定秒数待ってから終了する代替ヘルパーのコマンド"""
+    return [sys.executable, "-c", f"import sys, time; time.sleep({seconds}); sys.exit({exit_code})"]
+
+
+# 常駐ヘルパーの代替スクリプト。操作名の後に秒数を付けると応答まで待つ
+# 引数に秒数を渡すと、起動してから要求を読み始めるまで待つ
+HELPER_SERVER_SCRIPT = """
+import sys, time
+if len(sys.argv) > 1:
+    time.sleep(float(sys.argv[1]))
+for line in sys.stdin:
+    request, _, seconds = line.strip().partition(" ")
+    if seconds:
+        time.sleep(float(seconds))
+    if request == "ping":
+        print("pong", flush=True)
+    elif request == "quit":
+        break
+    elif request == "crash":
+        sys.exit(1)
+    elif request in ("soap_copy", "mouse_operation"):
+        print("ok", flush=True)
+    else:
+        print("error unknown request", flush=True)
+"""
+
+
+@pytest.fixture
+def helper_server(tmp_path):
+    """代替の常駐ヘルパーを起動するコマンド"""
+    script = tmp_path / "helper_server.py"
+    script.write_text(HELPER_SERVER_SCRIPT, encoding="utf-8")
+    return [sys.executable, str(script)]
+
+
+def wait_until_ready(helper, limit=10):
+    """常駐ヘルパーを起動してpingの応答を待つ"""
+    helper.start()
+    end = time.monotonic() + limit
+    while not helper.poll_ready() and time.monotonic() < end:
+        time.sleep(0.01)
+
+
+class RealTimeScheduler:
+    """after()で予約された処理を実時間で実行するスケジューラ"""
+
+    def __init__(self):
+        self.pending = {}
+        self.next_id = 0
+        self.ticks = 0
+
+    def after(self, delay, callback):
+        self.next_id += 1
+        self.pending[self.next_id] = (time.monotonic() + delay / 1000, callback)
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_until(self, condition, limit=10):
+        # GUIのイベントループと同様に短い間隔で処理を回し、その回数を数える
+        end = time.monotonic() + limit
+        while not condition() and time.monotonic() < end:
+            self.ticks += 1
+            now = time.monotonic()
+            for after_id, (due, callback) in sorted(self.pending.items()):
+                if due <= now:
+                    self.pending.pop(after_id)
+                    callback()
+            time.sleep(0.01)
 
 
 class TestMouseAutomation:
@@ -251,5 +328,310 @@ class TestIntegration:
         mock_subprocess.assert_called_once_with([r'C:\test\mouse_operation.exe'], check=True)
 
 
+class TestHelperRunner:
+    """HelperRunnerクラスのテスト"""
+
+    def test_run_does_not_block(self):
+        """ヘルパーの終了を待たずに戻り、終了後にコールバックされることのテスト"""
+        scheduler = RealTimeScheduler()
+        runner = HelperRunner(scheduler, poll_interval=10)
+        results = []
+
+        started = time.monotonic()
+        assert runner.run(helper_command(0.5), results.append, timeout=10)
+        assert time.monotonic() - started < 0.4
+        assert runner.is_running()
+
+        scheduler.run_until(lambda: results)
+
+        # 実行中もイベントループが回り続けている
+        assert results == [None]
+        assert scheduler.ticks > 10
+        assert not runner.is_running()
+
+    def test_second_run_is_rejected(self):
+        """実行中の再実行を受け付けないことのテスト"""
+        scheduler = RealTimeScheduler()
+        runner = HelperRunner(scheduler, poll_interval=10)
+        results = []
+
+        assert runner.run(helper_command(0.3), results.append, timeout=10)
+        assert not runner.run(helper_command(0), results.append, timeout=10)
+
+        scheduler.run_until(lambda: results)
+        assert results == [None]
+
+        assert runner.run(helper_command(0), results.append, timeout=10)
+        scheduler.run_until(lambda: len(results) == 2)
+        assert results == [None, None]
+
+    def test_timeout_kills_helper(self):
+        """制限時間を過ぎたヘルパーを強制終了することのテスト"""
+        scheduler = RealTimeScheduler()
+        runner = HelperRunner(scheduler, poll_interval=10)
+        results = []
+
+        runner.run(helper_command(30), results.append, timeout=0.3)
+        process = runner.process
+        started = time.monotonic()
+        scheduler.run_until(lambda: results)
+
+        assert time.monotonic() - started < 5
+        assert isinstance(results[0], subprocess.TimeoutExpired)
+        assert process.returncode is not None
+        assert not runner.is_running()
+
+    def test_exit_code_error(self):
+        """終了コードが0以外の場合のテスト"""
+        scheduler = RealTimeScheduler()
+        runner = HelperRunner(scheduler, poll_interval=10)
+        results = []
+
+        runner.run(helper_command(0, exit_code=3), results.append, timeout=10)
+        scheduler.run_until(lambda: results)
+
+        assert isinstance(results[0], subprocess.CalledProcessError)
+        assert results[0].returncode == 3
+
+    def test_missing_executable(self):
+        """ヘルパーが見つからない場合は起動時に例外となることのテスト"""
+        runner = HelperRunner(RealTimeScheduler())
+
+        with pytest.raises(FileNotFoundError):
+            runner.run([os.path.join("nonexistent", "helper.exe")], Mock(), timeout=10)
+
+        assert not runner.is_running()
+
+    def test_cancel(self):
+        """取り消しでヘルパーを終了しコールバックしないことのテスト"""
+        scheduler = RealTimeScheduler()
+        runner = HelperRunner(scheduler, poll_interval=10)
+        on_done = Mock()
+
+        runner.run(helper_command(30), on_done, timeout=60)
+        process = runner.process
+        runner.cancel()
+
+        assert process.returncode is not None
+        assert scheduler.pending == {}
+        assert not runner.is_running()
+        on_done.assert_not_called()
+
+    @patch('services.mouse_automation.load_settings')
+    def test_helper_command(self, mock_settings):
+        """設定からヘルパーのコマンドを組み立てるテスト"""
+        mock_settings.return_value = AppSettings(operation_file_path=r'C:\test\mouse_operation.exe',
+                                                 soap_copy_file_path=r'C:\test\soap_copy.exe')
+
+        assert get_helper_command("soap_copy") == [r'C:\test\soap_copy.exe']
+        assert get_helper_command() == [r'C:\test\mouse_operation.exe']
+
+
+class TestPersistentHelper:
+    """PersistentHelperクラスのテスト"""
+
+    def test_request_and_response(self, helper_server):
+        """常駐ヘルパーへの要求と応答のテスト"""
+        helper = PersistentHelper(helper_server)
+        try:
+            wait_until_ready(helper)
+
+            assert helper.request("soap_copy", 5) == "ok"
+            assert helper.request("mouse_operation", 5) == "ok"
+            with pytest.raises(RuntimeError, match="unknown request"):
+                helper.request("unknown", 5)
+
+            # エラー応答の後も同じプロセスを使い続ける
+            assert helper.request("ping", 5) == "pong"
+            assert helper.start_count == 1
+        finally:
+            helper.stop()
+
+        assert not helper.is_alive()
+
+    def test_restart_after_exit(self, helper_server):
+        """ヘルパーが終了した場合に起動し直すことのテスト"""
+        helper = PersistentHelper(helper_server)
+        try:
+            wait_until_ready(helper)
+            with pytest.raises(RuntimeError, match="終了しました"):
+                helper.request("crash", 5)
+            assert not helper.is_alive()
+
+            wait_until_ready(helper)
+
+            assert helper.start_count == 2
+            assert helper.request("soap_copy", 5) == "ok"
+        finally:
+            helper.stop()
+
+    def test_start_does_not_wait_for_ping(self, helper_server):
+        """起動はpingの応答を待たずに戻り、応答はpoll_readyで確認することのテスト"""
+        helper = PersistentHelper(helper_server + ["0.5"])
+        try:
+            started = time.perf_counter()
+            helper.start()
+            assert time.perf_counter() - started < 0.3
+            assert not helper.poll_ready()
+
+            end = time.monotonic() + 10
+            while not helper.poll_ready() and time.monotonic() < end:
+                time.sleep(0.01)
+            assert helper.ready
+        finally:
+            helper.stop()
+
+        assert not helper.ready
+
+    def test_unresponsive_helper(self):
+        """応答しないヘルパーは制限時間の後に起動に失敗することのテスト"""
+        helper = PersistentHelper(helper_command(30), ping_timeout=0.3)
+        helper.start()
+
+        with pytest.raises(RuntimeError, match="応答しません"):
+            while not helper.poll_ready():
+                time.sleep(0.01)
+
+        assert not helper.is_alive()
+
+    def test_latency_is_lower_than_spawn(self, helper_server):
+        """常駐ヘルパーの1操作あたりの遅延が毎回の起動より小さいことのテスト"""
+        helper = PersistentHelper(helper_server)
+        try:
+            wait_until_ready(helper)
+
+            started = time.perf_counter()
+            for _ in range(20):
+                helper.request("mouse_operation", 5)
+            persistent_latency = (time.perf_counter() - started) / 20
+        finally:
+            helper.stop()
+
+        started = time.perf_counter()
+        for _ in range(3):
+            subprocess.run(helper_command(0), check=True)
+        spawn_latency = (time.perf_counter() - started) / 3
+
+        assert persistent_latency < spawn_latency
+
+
+class TestHelperRunnerWithPersistentHelper:
+    """常駐ヘルパーを使うHelperRunnerのテスト"""
+
+    def test_run_uses_persistent_helper(self, helper_server):
+        """常駐ヘルパーに要求を送り、EXEを起動しないことのテスト"""
+        scheduler = RealTimeScheduler()
+        helper = PersistentHelper(helper_server)
+        runner = HelperRunner(scheduler, poll_interval=10, persistent_helper=helper)
+        results = []
+        try:
+            wait_until_ready(helper)
+            with patch('subprocess.Popen') as mock_popen:
+                for _ in range(3):
+                    assert runner.run(helper_command(0), results.append, timeout=5, request="soap_copy")
+                    scheduler.run_until(lambda: not runner.is_running())
+                mock_popen.assert_not_called()
+
+            assert results == [None, None, None]
+            assert helper.start_count == 1
+            assert runner.last_elapsed < 5
+        finally:
+            runner.close()
+
+        assert not helper.is_alive()
+
+    def test_error_response(self, helper_server):
+        """常駐ヘルパーのエラー応答をコールバックで通知することのテスト"""
+        scheduler = RealTimeScheduler()
+        runner = HelperRunner(scheduler, poll_interval=10, persistent_helper=PersistentHelper(helper_server))
+        results = []
+        try:
+            runner.run(helper_command(0), results.append, timeout=5, request="unknown")
+            scheduler.run_until(lambda: results)
+        finally:
+            runner.close()
+
+        assert isinstance(results[0], RuntimeError)
+
+    def test_timeout_restarts_helper(self, helper_server):
+        """応答が制限時間を過ぎた場合に常駐ヘルパーを起動し直すことのテスト"""
+        scheduler = RealTimeScheduler()
+        helper = PersistentHelper(helper_server)
+        runner = HelperRunner(scheduler, poll_interval=10, persistent_helper=helper)
+        results = []
+        try:
+            runner.run(helper_command(0), results.append, timeout=0.3, request="soap_copy 30")
+            scheduler.run_until(lambda: results)
+            assert isinstance(results[0], subprocess.TimeoutExpired)
+            assert not helper.is_alive()
+
+            runner.run(helper_command(0), results.append, timeout=5, request="soap_copy")
+            scheduler.run_until(lambda: len(results) == 2)
+        finally:
+            runner.close()
+
+        assert results[1] is None
+        assert helper.start_count == 2
+
+    @patch('builtins.print')
+    def test_fallback_to_spawn(self, mock_print):
+        """常駐ヘルパーを起動できない場合は毎回EXEを起動することのテスト"""
+        scheduler = RealTimeScheduler()
+        helper = PersistentHelper([os.path.join("nonexistent", "helper_server.exe")])
+        runner = HelperRunner(scheduler, poll_interval=10, persistent_helper=helper)
+        results = []
+
+        assert runner.run(helper_command(0, exit_code=2), results.append, timeout=5, request="soap_copy")
+        scheduler.run_until(lambda: results)
+
+        assert isinstance(results[0], subprocess.CalledProcessError)
+        assert "常駐ヘルパーを使用できません" in mock_print.call_args[0][0]
+
+    def test_startup_does_not_block(self, helper_server):
+        """常駐ヘルパーの起動を待つ間もrunが戻り、イベントループが回り続けることのテスト"""
+        scheduler = RealTimeScheduler()
+        helper = PersistentHelper(helper_server + ["0.5"])
+        runner = HelperRunner(scheduler, poll_interval=10, persistent_helper=helper)
+        results = []
+        try:
+            started = time.perf_counter()
+            assert runner.run(helper_command(0), results.append, timeout=5, request="soap_copy")
+            assert time.perf_counter() - started < 0.3
+
+            scheduler.run_until(lambda: results)
+        finally:
+            runner.close()
+
+        assert results == [None]
+        assert helper.start_count == 1
+        assert scheduler.ticks > 10
+
+    @patch('builtins.print')
+    def test_unresponsive_helper_falls_back_to_spawn(self, mock_print):
+        """pingに応答しない常駐ヘルパーはpollの中で見切り、EXEを起動することのテスト"""
+        scheduler = RealTimeScheduler()
+        helper = PersistentHelper(helper_command(30), ping_timeout=0.3)
+        runner = HelperRunner(scheduler, poll_interval=10, persistent_helper=helper)
+        results = []
+        try:
+            started = time.perf_counter()
+            assert runner.run(helper_command(0, exit_code=2), results.append, timeout=5, request="soap_copy")
+            assert time.perf_counter() - started < 0.2
+
+            scheduler.run_until(lambda: results)
+        finally:
+            runner.close()
+
+        assert isinstance(results[0], subprocess.CalledProcessError)
+        assert not helper.is_alive()
+        assert "応答しません" in mock_print.call_args[0][0]
+
+    def test_helper_request(self):
+        """操作名から要求を決めるテスト"""
+        assert get_helper_request("soap_copy") == "soap_copy"
+        assert get_helper_request() == "mouse_operation"
+        assert get_helper_request("unknown_operation") == "mouse_operation"
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
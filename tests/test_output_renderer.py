@@ -0,0 +1,88 @@
+from unittest.mock import Mock
+
+import pytest
+
+from services.output_renderer import ChunkedTextRenderer
+
+
+class FakeTextWidget:
+    """insert/deleteとafterの予約を記録するTextウィジェット"""
+
+    def __init__(self):
+        self.content = ""
+        self.inserted = []
+        self.pending = {}
+        self.next_id = 0
+
+    def insert(self, index, text):
+        self.inserted.append(text)
+        self.content += text
+
+    def delete(self, index1, index2):
+        self.content = ""
+
+    def after(self, delay, callback):
+        self.next_id += 1
+        self.pending[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_pending(self):
+        while self.pending:
+            after_id = min(self.pending)
+            self.pending.pop(after_id)()
+
+
+class TestChunkedTextRenderer:
+    """ChunkedTextRendererクラスのテスト"""
+
+    DOCUMENT = "".join(f"行{i:03d}\n" for i in range(100))
+
+    def test_first_chunk_is_inserted_immediately(self):
+        """最初のチャンクだけがすぐに挿入されることのテスト"""
+        widget = FakeTextWidget()
+        renderer = ChunkedTextRenderer(widget, chunk_size=50)
+
+        renderer.render(self.DOCUMENT)
+
+        assert len(widget.inserted) == 1
+        assert len(widget.inserted[0]) < 60
+        assert renderer.text == self.DOCUMENT
+        assert not renderer.is_complete()
+
+        widget.run_pending()
+
+        assert widget.content == self.DOCUMENT
+        assert renderer.is_complete()
+        assert all(chunk.endswith("\n") for chunk in widget.inserted)
+
+    def test_render_replaces_pending_document(self):
+        """表示途中の再描画で古い文書の残りを挿入しないことのテスト"""
+        widget = FakeTextWidget()
+        renderer = ChunkedTextRenderer(widget, chunk_size=50)
+
+        renderer.render(self.DOCUMENT)
+        renderer.render("新しい文書")
+        widget.run_pending()
+
+        assert widget.content == "新しい文書"
+
+        renderer.clear()
+        assert widget.content == ""
+        assert renderer.text == ""
+
+    def test_small_document_needs_no_scheduling(self):
+        """小さな文書は1回で挿入され予約を行わないことのテスト"""
+        widget = Mock()
+        renderer = ChunkedTextRenderer(widget)
+
+        renderer.render('[\n  {}\n]')
+
+        widget.insert.assert_called_once_with("end", '[\n  {}\n]')
+        widget.after.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,138 @@
+import json
+import time
+
+import pytest
+
+from services.live_preview import LivePreview
+from services.parse_stats import (COUNT_DUPLICATE_CONTENTS, COUNT_DUPLICATE_GROUPS, COUNT_GROUPS, COUNT_LINES,
+                                  COUNT_OUTPUT_GROUPS, COUNT_RECORDS, STAGE_CLASSIFY, STAGE_FLUSH, STAGE_GROUP,
+                                  STAGE_JSON, STAGE_SORT, STAGE_TIMESTAMP, ParseStats, iter_timed)
+from services.txt_parse import RecordGrouper, parse_medical_text
+
+SAMPLE_TEXT = """2024/05/26(日)
+内科 医師 外来 14:30
+S >
+頭痛があります
+S >
+頭痛があります
+O >
+体温 37.5度
+2024/05/27(月)
+外科 医師 外来 09:00
+P >
+経過観察
+"""
+
+
+class TestParseStats:
+    """ParseStatsクラスのテスト"""
+
+    def test_nested_stages_are_exclusive(self):
+        """内側の段階の時間を外側の段階から差し引くことのテスト"""
+        stats = ParseStats()
+
+        stats.start('outer')
+        time.sleep(0.02)
+        stats.start('inner')
+        time.sleep(0.05)
+        stats.stop()
+        stats.stop()
+
+        assert 0.015 < stats.times['outer'] < 0.045
+        assert stats.times['inner'] >= 0.045
+        assert stats.calls == {'outer': 1, 'inner': 1}
+        assert stats.total_time() == pytest.approx(stats.times['outer'] + stats.times['inner'])
+
+    def test_iter_timed(self):
+        """反復の取り出し時間を記録することのテスト"""
+        stats = ParseStats()
+
+        def slow_items():
+            for item in range(3):
+                time.sleep(0.01)
+                yield item
+
+        assert list(iter_timed(slow_items(), stats, 'wait')) == [0, 1, 2]
+        assert stats.calls['wait'] == 4
+        assert stats.times['wait'] >= 0.03
+
+    def test_report(self):
+        """表示用の集計のテスト"""
+        stats = ParseStats()
+        parse_medical_text(SAMPLE_TEXT, stats=stats)
+
+        report = stats.report()
+
+        assert "行の分類" in report
+        assert "タイムスタンプ変換" in report
+        assert "読み込み" not in report
+        assert "SOAPレコード" in report
+        assert json.loads(json.dumps(stats.to_dict()))['counts'] == stats.counts
+
+
+class TestParseInstrumentation:
+    """解析処理の計測のテスト"""
+
+    def test_output_is_unchanged(self):
+        """計測の有無で出力が変わらないことのテスト"""
+        assert parse_medical_text(SAMPLE_TEXT, stats=ParseStats()) == parse_medical_text(SAMPLE_TEXT)
+
+    def test_counts(self):
+        """行数・レコード数・重複件数の記録テスト"""
+        stats = ParseStats()
+        parse_medical_text(SAMPLE_TEXT, stats=stats)
+
+        assert stats.counts[COUNT_LINES] == SAMPLE_TEXT.count("\n")
+        assert stats.counts[COUNT_RECORDS] == 4
+        assert stats.counts[COUNT_DUPLICATE_CONTENTS] == 1
+        assert stats.counts[COUNT_GROUPS] == 2
+        assert stats.counts[COUNT_OUTPUT_GROUPS] == 2
+        assert COUNT_DUPLICATE_GROUPS not in stats.counts
+
+        assert stats.calls[STAGE_TIMESTAMP] == 2
+        assert stats.calls[STAGE_SORT] == 1
+        for stage in (STAGE_CLASSIFY, STAGE_FLUSH, STAGE_GROUP):
+            assert stats.times[stage] >= 0
+
+    def test_duplicate_groups(self):
+        """同じ内容のグループを省略した件数の記録テスト"""
+        stats = ParseStats()
+        grouper = RecordGrouper(stats)
+        grouper.add_all([
+            {'date': '2024/05/26(日)', 'department': '内科', 'time': '14:30', 'soap_section': 'S', 'content': '頭痛'},
+            {'date': '2024/05/26(日)', 'department': '内科', 'time': '14:30 ', 'soap_section': 'S', 'content': '頭痛'},
+        ])
+
+        assert len(grouper.result()) == 1
+        assert stats.counts[COUNT_DUPLICATE_GROUPS] == 1
+
+    def test_parallel_parse(self, monkeypatch):
+        """並列解析でも計測できることのテスト"""
+        monkeypatch.setattr('services.txt_parse.PARALLEL_MIN_CHUNK_SIZE', 64)
+        stats = ParseStats()
+
+        result = parse_medical_text(SAMPLE_TEXT * 4, workers=2, stats=stats)
+
+        assert result == parse_medical_text(SAMPLE_TEXT * 4)
+        assert stats.calls[STAGE_CLASSIFY] > 0
+        assert stats.counts[COUNT_OUTPUT_GROUPS] == len(result)
+
+    def test_live_preview_accumulates(self):
+        """取り込みをまたいで計測結果を積み上げることのテスト"""
+        stats = ParseStats()
+        preview = LivePreview(stats)
+
+        first, second = SAMPLE_TEXT.split("2024/05/27")
+        preview.append(first)
+        preview.to_json()
+        preview.append("2024/05/27" + second)
+        preview.to_json()
+
+        assert stats.counts[COUNT_LINES] == SAMPLE_TEXT.count("\n")
+        assert stats.calls[STAGE_JSON] == 2
+        # 未確定のレコードはプレビューのたびに数え直さない
+        assert stats.counts[COUNT_GROUPS] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
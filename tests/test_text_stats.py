@@ -0,0 +1,69 @@
+from unittest.mock import Mock
+
+import pytest
+
+from services.text_stats import TextStats
+
+
+def create_text_widget(text):
+    """get("1.0", END)がtextを返すTextウィジェットのindex/count/searchを模したモック"""
+    widget = Mock()
+    widget.search.return_value = "1.0" if text.strip() else ""
+    widget.index.return_value = f"{text.count(chr(10)) + 1}.0"
+    widget.count.return_value = (len(text),) if text else None
+    widget.after.side_effect = lambda delay, callback: f"after#{widget.after.call_count}"
+    return widget
+
+
+class TestTextStats:
+    """TextStatsクラスのテスト"""
+
+    @pytest.mark.parametrize("text, expected", [
+        ("行1\n行2\n行3\n", (3, 6)),
+        ("これは1行のテキストです\n", (1, 12)),
+        ("   \n  \n  \n", (0, 0)),
+        ("", (0, 0))
+    ])
+    def test_count(self, text, expected):
+        """行数と文字数の計算テスト"""
+        stats = TextStats(create_text_widget(text), Mock())
+
+        assert stats.count() == expected
+
+    def test_refresh_updates_label(self):
+        """ラベル表示の更新テスト"""
+        widget = create_text_widget("行1\n行2\n")
+        label = Mock()
+        stats = TextStats(widget, label)
+
+        stats.refresh()
+
+        label.config.assert_called_once_with(text="行数: 2  文字数: 4")
+        widget.get.assert_not_called()
+
+    def test_schedule_is_debounced(self):
+        """連続した更新要求が1回の反映にまとめられることのテスト"""
+        widget = create_text_widget("行1\n")
+        label = Mock()
+        stats = TextStats(widget, label, delay=200)
+
+        for _ in range(5):
+            stats.schedule()
+
+        # 直前の予約を取り消してから予約し直すため、実行待ちは常に1件
+        assert widget.after.call_count == 5
+        assert [call[0][0] for call in widget.after_cancel.call_args_list] == [
+            "after#1", "after#2", "after#3", "after#4"]
+        widget.after.assert_called_with(200, stats.refresh)
+        label.config.assert_not_called()
+
+        stats.refresh()
+        stats.schedule()
+
+        # 反映後の予約では取り消しを行わない
+        assert widget.after_cancel.call_count == 4
+        label.config.assert_called_once_with(text="行数: 1  文字数: 2")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -4,11 +4,21 @@ import tempfile
 import os
 from datetime import datetime
 
+from utils.config_manager import AppSettings
+
+
+def set_widget_text(widget, text):
+    """Textウィジェットのモックに、get("1.0", END)がtextを返す状態のindex/count/searchを設定する"""
+    widget.get.return_value = text
+    widget.search.return_value = "1.0" if text.strip() else ""
+    widget.index.return_value = f"{text.count(chr(10)) + 1}.0"
+    widget.count.return_value = (len(text),)
+
 
 class TestTextEditor:
     """TextEditorクラスのテスト"""
 
-    @patch('services.txt_editor.load_config')
+    @patch('services.txt_editor.load_settings')
     @patch('tkinter.Toplevel')
     @patch('tkinter.scrolledtext.ScrolledText')
     @patch('tkinter.Frame')
@@ -20,19 +30,10 @@ class TestTextEditor:
         from services.txt_editor import TextEditor
 
         # モック設定
-        mock_config_obj = Mock()
-        mock_config_obj.getint.side_effect = lambda section, key, fallback=None: {
-            'editor_width': 800,
-            'editor_height': 800,
-            'text_area_font_size': 11,
-            'button_width': 15,
-            'button_height': 2
-        }.get(key, fallback)
-        mock_config_obj.get.side_effect = lambda section, key, fallback=None: {
-            'editor_window_position': '+10+10',
-            'text_area_font_name': 'Yu Gothic UI'
-        }.get(key, fallback)
-        mock_config.return_value = mock_config_obj
+        mock_config.return_value = AppSettings(editor_width=800, editor_height=800,
+                                               editor_window_position='+10+10',
+                                               text_area_font_size=11, text_area_font_name='Yu Gothic UI',
+                                               button_width=15, button_height=2)
 
         mock_parent = Mock()
         mock_window = Mock()
@@ -50,7 +51,7 @@ class TestTextEditor:
         mock_window.geometry.assert_called_with("800x800+10+10")
         mock_text_area.insert.assert_called_with("end", "初期テキスト")  # 修正：tk.ENDの実際の値
 
-    @patch('services.txt_editor.load_config')
+    @patch('services.txt_editor.load_settings')
     @patch('tkinter.Tk')
     @patch('tkinter.scrolledtext.ScrolledText')
     @patch('tkinter.Frame')
@@ -62,10 +63,7 @@ class TestTextEditor:
         from services.txt_editor import TextEditor
 
         # モック設定
-        mock_config_obj = Mock()
-        mock_config_obj.getint.side_effect = lambda section, key, fallback=None: fallback
-        mock_config_obj.get.side_effect = lambda section, key, fallback=None: fallback
-        mock_config.return_value = mock_config_obj
+        mock_config.return_value = AppSettings()
 
         mock_window = Mock()
         mock_tk.return_value = mock_window
@@ -82,7 +80,7 @@ class TestTextEditor:
 
     def create_mock_editor(self):
         """テスト用のモックエディタを作成"""
-        with patch('services.txt_editor.load_config') as mock_config, \
+        with patch('services.txt_editor.load_settings') as mock_config, \
                 patch('tkinter.Toplevel') as mock_toplevel, \
                 patch('tkinter.scrolledtext.ScrolledText') as mock_scrolled_text, \
                 patch('tkinter.Frame'), \
@@ -91,10 +89,7 @@ class TestTextEditor:
             from services.txt_editor import TextEditor
 
             # モック設定
-            mock_config_obj = Mock()
-            mock_config_obj.getint.return_value = 11
-            mock_config_obj.get.return_value = 'Yu Gothic UI'
-            mock_config.return_value = mock_config_obj
+            mock_config.return_value = AppSettings()
 
             mock_text_area = Mock()
             mock_text_area.get.return_value = ""  # 修正：初期値を空文字列に設定
@@ -115,10 +110,11 @@ class TestTextEditor:
         editor, mock_text_area, mock_stats_label = self.create_mock_editor()
 
         # テキストの内容を設定
-        mock_text_area.get.return_value = "行1\n行2\n行3\n"
+        set_widget_text(mock_text_area, "行1\n行2\n行3\n")
 
         # テスト実行
         editor.update_stats(None)
+        editor.text_stats.refresh()
 
         # 検証
         mock_stats_label.config.assert_called_with(text="行数: 3  文字数: 6")
@@ -128,10 +124,11 @@ class TestTextEditor:
         editor, mock_text_area, mock_stats_label = self.create_mock_editor()
 
         # 空のテキストを設定
-        mock_text_area.get.return_value = "   \n\n  \n"
+        set_widget_text(mock_text_area, "   \n\n  \n")
 
         # テスト実行
         editor.update_stats(None)
+        editor.text_stats.refresh()
 
         # 検証
         mock_stats_label.config.assert_called_with(text="行数: 0  文字数: 0")
@@ -141,10 +138,11 @@ class TestTextEditor:
         editor, mock_text_area, mock_stats_label = self.create_mock_editor()
 
         # 単一行のテキストを設定
-        mock_text_area.get.return_value = "これは1行のテキストです"
+        set_widget_text(mock_text_area, "これは1行のテキストです")
 
         # テスト実行
         editor.update_stats(None)
+        editor.text_stats.refresh()
 
         # 検証
         mock_stats_label.config.assert_called_with(text="行数: 0  文字数: 12")
@@ -356,7 +354,7 @@ class TestTextEditor:
 class TestTextEditorIntegration:
     """TextEditor統合テスト"""
 
-    @patch('services.txt_editor.load_config')
+    @patch('services.txt_editor.load_settings')
     @patch('tkinter.Toplevel')
     @patch('tkinter.scrolledtext.ScrolledText')
     @patch('tkinter.Frame')
@@ -369,10 +367,7 @@ class TestTextEditorIntegration:
         from services.txt_editor import TextEditor
 
         # モック設定
-        mock_config_obj = Mock()
-        mock_config_obj.getint.return_value = 11
-        mock_config_obj.get.return_value = 'Yu Gothic UI'
-        mock_config.return_value = mock_config_obj
+        mock_config.return_value = AppSettings()
 
         mock_parent = Mock()
         mock_window = Mock()
@@ -390,11 +385,11 @@ class TestTextEditorIntegration:
         editor.text_area = mock_text_area
         editor.stats_label = mock_stats_label
 
-        # 貼り付け実行後にgetの戻り値を変更
-        mock_text_area.get.return_value = "テスト行1\nテスト行2\n"
+        # 貼り付け実行後のウィジェットの状態を設定
+        set_widget_text(mock_text_area, "テスト行1\nテスト行2\n")
 
         editor.paste_text()
-        editor.update_stats(None)
+        editor.text_stats.refresh()
 
         # 検証
         mock_text_area.insert.assert_called_with("insert", "テスト行1\nテスト行2\n")  # 修正：tk.INSERTの実際の値
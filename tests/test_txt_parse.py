@@ -1,11 +1,34 @@
+import json
+import pickle
+import time
+
 import pytest
 from datetime import datetime
+from io import StringIO
 from services.txt_parse import (
     convert_to_timestamp,
     process_record,
     group_records_by_datetime,
     remove_duplicates,
-    parse_medical_text
+    parse_medical_text,
+    MedicalTextParser,
+    RecordGrouper,
+    SoapRecord,
+    ContentAccumulator,
+    SuffixAutomaton,
+    timestamp_sort_key,
+    NO_TIMESTAMP,
+    ORDER_ASCENDING,
+    ORDER_DESCENDING_RUNS,
+    ORDER_UNORDERED,
+    iter_medical_records,
+    classify_line,
+    match_entry_line,
+    LINE_DATE,
+    LINE_ENTRY,
+    LINE_SOAP,
+    split_at_date_headers,
+    iter_medical_records_parallel
 )
 
 
@@ -39,6 +62,26 @@ class TestConvertToTimestamp:
         assert convert_to_timestamp(None, "14:30") is None
         assert convert_to_timestamp("2024/05/26", None) is None
 
+    def test_trailing_text_and_unicode_digits(self):
+        """曜日などの後続文字と全角数字の変換テスト"""
+        assert convert_to_timestamp("2024/05/26(日)", "14:30 ") == "2024-05-26T14:30:00Z"
+        assert convert_to_timestamp("２０２４/05/26", "1４:30") == "２０２４-05-26T1４:30:00Z"
+        assert convert_to_timestamp("2024/05/2", "14:30") is None
+        assert convert_to_timestamp("2024/05/26", "14:3") is None
+        assert convert_to_timestamp(["2024/05/26"], "14:30") is None
+
+    def test_sort_key(self):
+        """整数の並べ替えキーがISO文字列と同じ順になることのテスト"""
+        pairs = [("2024/05/26", "14:30"), ("2023/12/31", "23:59"), ("2024/05/26", "09:00"), ("2024/13/45", "99:99")]
+        keys = [timestamp_sort_key(date, time) for date, time in pairs]
+
+        assert keys[0] == 202405261430
+        assert sorted(keys) == [timestamp_sort_key(*pair) for pair in
+                                sorted(pairs, key=lambda pair: convert_to_timestamp(*pair))]
+        assert timestamp_sort_key("invalid", "14:30") == NO_TIMESTAMP
+        assert timestamp_sort_key(None, None) == NO_TIMESTAMP
+        assert NO_TIMESTAMP < min(keys)
+
 
 class TestProcessRecord:
     """レコード処理機能のテスト"""
@@ -57,7 +100,7 @@ class TestProcessRecord:
         result = process_record(current_record, content_buffer, records)
         
         assert len(records) == 1
-        assert records[0]['content'] == "患者の主訴"
+        assert records[0].content == "患者の主訴"
         assert result == ""
         
     def test_process_incomplete_record(self):
@@ -210,6 +253,281 @@ class TestRemoveDuplicates:
         assert len(result) == 0
 
 
+class TestRecordGrouper:
+    """1パスのグループ化エンジンのテスト"""
+
+    def test_duplicate_records_are_merged_once(self):
+        """同一レコードが重複して追加されないことのテスト"""
+        record = {'date': '2024/05/26(日)', 'department': '内科', 'time': '14:30', 'soap_section': 'S', 'content': '頭痛'}
+        grouper = RecordGrouper()
+
+        grouper.add_all([record, dict(record), dict(record)])
+
+        result = grouper.result()
+        assert len(result) == 1
+        assert result[0]['subject'] == '頭痛'
+
+    def test_identical_groups_are_deduplicated(self):
+        """内容が同一になるグループの重複除去テスト"""
+        grouper = RecordGrouper()
+        grouper.add({'date': '2024/05/26(日)', 'department': '内科', 'time': '14:30', 'soap_section': 'S', 'content': '頭痛'})
+        grouper.add({'date': '2024/05/26(月)', 'department': '内科', 'time': '14:30', 'soap_section': 'S', 'content': '頭痛'})
+
+        assert len(grouper.sorted_groups()) == 2
+        assert len(grouper.result()) == 1
+
+    def test_result_is_sorted_by_timestamp(self):
+        """タイムスタンプ順に並ぶことのテスト"""
+        grouper = RecordGrouper()
+        grouper.add({'date': '2024/05/27(月)', 'department': '内科', 'time': '09:00', 'soap_section': 'S', 'content': 'B'})
+        grouper.add({'date': '2024/05/26(日)', 'department': '内科', 'time': '14:30', 'soap_section': 'S', 'content': 'A'})
+
+        result = grouper.result()
+
+        assert [record['subject'] for record in result] == ['A', 'B']
+
+    def test_iter_result_matches_result(self):
+        """逐次取り出しとリスト取得の結果が一致することのテスト"""
+        grouper = RecordGrouper()
+        grouper.add({'date': '2024/05/27(月)', 'department': '内科', 'time': '09:00', 'soap_section': 'S', 'content': 'B'})
+        grouper.add({'date': '2024/05/26(日)', 'department': '内科', 'time': '14:30', 'soap_section': 'S', 'content': 'A'})
+        grouper.add({'date': '2024/05/26(月)', 'department': '内科', 'time': '14:30', 'soap_section': 'S', 'content': 'A'})
+
+        assert list(grouper.iter_result()) == grouper.result()
+        assert len(grouper.result()) == 2
+
+    def test_touched_groups_keeps_original_groups(self):
+        """未確定レコードを重ねても元のグループが変更されないことのテスト"""
+        grouper = RecordGrouper()
+        grouper.add({'date': '2024/05/26(日)', 'department': '内科', 'time': '14:30', 'soap_section': 'S', 'content': '頭痛'})
+
+        touched = grouper.touched_groups([
+            {'date': '2024/05/26(日)', 'department': '内科', 'time': '14:30', 'soap_section': 'S', 'content': '発熱'},
+            {'date': '2024/05/27(月)', 'department': '外科', 'time': '09:00', 'soap_section': 'P', 'content': '経過観察'}
+        ])
+
+        assert list(touched) == [('2024/05/26(日)', '内科', '14:30'), ('2024/05/27(月)', '外科', '09:00')]
+        assert touched[('2024/05/26(日)', '内科', '14:30')][1]['subject'].text() == '頭痛\n発熱'
+        assert touched[('2024/05/27(月)', '外科', '09:00')][1]['plan'].text() == '経過観察'
+        assert grouper.result() == [{'timestamp': '2024-05-26T14:30:00Z', 'department': '内科', 'subject': '頭痛'}]
+
+    def test_malformed_timestamps_sort_first(self):
+        """日時の形式に合わないグループが出現順のまま先頭に並ぶことのテスト"""
+        grouper = RecordGrouper()
+        for date, time in [("2024/05/27(月)", "09:00"), ("2024/05/26(日)", "時刻不明"),
+                           ("2024/05/26(日)", "14:30"), ("日付不明", "08:00")]:
+            grouper.add({'date': date, 'department': '内科', 'time': time, 'soap_section': 'S', 'content': date + time})
+
+        result = grouper.result()
+
+        assert [record['timestamp'] for record in result] == [None, None, '2024-05-26T14:30:00Z',
+                                                              '2024-05-27T09:00:00Z']
+        assert [record['subject'] for record in result[:2]] == ["2024/05/26(日)時刻不明", "日付不明08:00"]
+
+    @staticmethod
+    def _grouper(entries):
+        grouper = RecordGrouper()
+        for index, (day, time) in enumerate(entries):
+            grouper.add({'date': f'2024/05/{day:02d}(日)', 'department': '内科', 'time': time,
+                         'soap_section': 'S', 'content': f'記載{index}'})
+        return grouper
+
+    @pytest.mark.parametrize("entries, order", [
+        ([(26, '09:00'), (26, '14:30'), (27, '09:00'), (27, '09:00 ')], ORDER_ASCENDING),
+        ([(28, '09:00'), (27, '14:30'), (27, '09:00'), (26, '09:00')], ORDER_DESCENDING_RUNS),
+        ([(28, '09:00'), (28, '14:30'), (27, '09:00'), (27, '09:00 '), (26, '18:00')], ORDER_DESCENDING_RUNS),
+        ([(28, '09:00'), (27, '09:00'), (27, '14:30'), (28, '08:00')], ORDER_DESCENDING_RUNS),
+        ([(28, '09:00'), (27, '09:00'), (27, '14:30'), (28, '10:00')], ORDER_UNORDERED),
+        ([(28, '09:00'), (27, '09:00'), (28, '09:00 ')], ORDER_UNORDERED),
+        ([(26, '09:00'), (28, '09:00'), (27, '09:00')], ORDER_UNORDERED),
+    ])
+    def test_ordered_runs_match_full_sort(self, entries, order):
+        """出現順の判定と、並べ替えを省いた結果が全体の並べ替えと一致することのテスト"""
+        grouper = self._grouper(entries)
+        # 同じ日時のグループは出現順のまま並ぶ
+        expected = sorted(range(len(entries)), key=lambda index: (entries[index][0], entries[index][1].strip()))
+
+        assert grouper.order == order
+        assert [record['subject'] for record in grouper.result()] == [f'記載{index}' for index in expected]
+
+    def test_accumulator_keeps_single_content_without_set(self):
+        """記載が1件のフィールドでは集合を作らないことのテスト"""
+        accumulator = ContentAccumulator()
+
+        assert accumulator.add('頭痛')
+        assert accumulator.seen == '頭痛'
+        assert not accumulator.add('頭痛')
+
+        copied = accumulator.copy()
+        assert copied.add('発熱')
+        assert copied.seen == {'頭痛', '発熱'}
+        assert not copied.add('発熱')
+        assert accumulator.text() == '頭痛'
+        assert copied.text() == '頭痛\n発熱'
+
+
+class TestGroupingScaling:
+    """同一キーへの記載追加が線形時間で行われることのベンチマーク"""
+
+    @staticmethod
+    def _grouping_time(fragment_count, distinct=False):
+        # distinctでなければ重複取り込みを想定し、記載の種類は一定数に抑える
+        records = [
+            {'date': '2024/05/26(日)', 'department': '内科', 'time': '14:30', 'soap_section': 'S',
+             'content': f'記載{i if distinct else i % 200:05d} 血圧130/80'}
+            for i in range(fragment_count)
+        ]
+
+        best = float('inf')
+        for _ in range(3):
+            start = time.perf_counter()
+            grouper = RecordGrouper()
+            grouper.add_all(records)
+            grouper.result()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def test_fragment_merge_scales_linearly(self):
+        """記載数を8倍にしたときの処理時間が線形の範囲に収まることのテスト"""
+        small = self._grouping_time(2000)
+        large = self._grouping_time(16000)
+
+        # 二乗オーダーなら約64倍になる
+        assert large / small < 24
+
+    def test_distinct_fragment_merge_scales_linearly(self, monkeypatch):
+        """すべて異なる記載でも、記載数を8倍にしたときの処理時間が線形の範囲に収まることのテスト"""
+        # 既出判定が早い段階で接尾辞オートマトンに切り替わるようにする
+        monkeypatch.setattr('services.txt_parse.CONTENT_SCAN_LIMIT', 1 << 10)
+        small = self._grouping_time(500, distinct=True)
+        large = self._grouping_time(4000, distinct=True)
+
+        # 連結済みの記載を毎回探索すると約64倍になる
+        assert large / small < 24
+
+    def test_suffix_automaton(self):
+        """接尾辞オートマトンの部分文字列判定のテスト"""
+        text = "頭痛があります\n血圧 130/80\nabcbc"
+        automaton = SuffixAutomaton(text[:10])
+        automaton.extend(text[10:])
+
+        for start in range(len(text)):
+            for end in range(start, len(text) + 1):
+                assert text[start:end] in automaton
+        for pattern in ("頭痛が ", "abcbcb", "cbb", "80\nb", "\n\n"):
+            assert pattern not in automaton
+
+    def test_fragments_keep_first_seen_order(self):
+        """最初に出現した順序で連結されることのテスト"""
+        grouper = RecordGrouper()
+        for content in ['B', 'A', 'B', 'C', 'A']:
+            grouper.add({'date': '2024/05/26(日)', 'department': '内科', 'time': '14:30',
+                         'soap_section': 'S', 'content': content})
+
+        assert grouper.result()[0]['subject'] == 'B\nA\nC'
+
+    def test_contained_fragment_is_not_appended(self):
+        """既存の記載に含まれる断片が追加されないことのテスト"""
+        grouper = RecordGrouper()
+        for content in ['血圧 130/80', '頭痛があります', '血圧 130/80\n頭痛があります', '頭痛']:
+            grouper.add({'date': '2024/05/26(日)', 'department': '内科', 'time': '14:30',
+                         'soap_section': 'S', 'content': content})
+
+        assert grouper.result()[0]['subject'] == '血圧 130/80\n頭痛があります'
+
+
+class TestLineClassifier:
+    """行分類機能のテスト"""
+
+    def test_classify_line_types(self):
+        """日付・エントリ・SOAP・本文行の分類テスト"""
+        assert classify_line("2024/05/26(日) （入院 5 日目）") == (LINE_DATE, "2024/05/26(日)")
+        assert classify_line("内科    担当医    外来    14:30") == (LINE_ENTRY, ("内科", "14:30"))
+        assert classify_line("S >") == (LINE_SOAP, "S")
+        assert classify_line("頭痛があります") == (None, None)
+
+    def test_entry_line_matches_legacy_pattern(self):
+        """旧正規表現と同じ診療科・時刻を返すことのテスト"""
+        assert match_entry_line("a b c d 12:34") == ("a", "12:34")
+        assert match_entry_line("A B   12:34 Z 12:35") == ("A", "12:35")
+        assert match_entry_line("A   B 12:34") == ("A", "12:34")
+        assert match_entry_line("A     12:34") == ("A", "12:34")
+        assert match_entry_line("A    12:34") is None
+        assert match_entry_line("内科 担当医 外来 1430") is None
+        assert match_entry_line("S > 頭痛 10:00") == ("S", "10:00")
+
+    def test_pathological_line_is_linear(self):
+        """時刻を含まない長い空白区切り行で破滅的バックトラックが起きないことのテスト"""
+        def classify_time(word_count):
+            line = "記載 " * word_count + "終了"
+            start = time.perf_counter()
+            for _ in range(5):
+                classify_line(line)
+            return time.perf_counter() - start
+
+        small = classify_time(20000)
+        large = classify_time(160000)
+
+        # 旧パターンでは1000語で数十秒かかっていた
+        assert large < 1.0
+        assert large / small < 24
+
+
+class TestParallelParsing:
+    """日付行単位の並列解析のテスト"""
+
+    SAMPLE_TEXT = """2024/05/26(日)
+内科 担当医 外来 14:30
+S >
+頭痛があります
+O >
+血圧 130/80
+2024/05/26(日)
+本文のみの行は前のチャンクの状態を引き継ぐ
+内科 担当医 外来 14:30
+S >
+頭痛があります
+追加の記載
+2024/05/27(月)
+S >
+診療科行の前のSOAP行
+外科 担当医 病棟 09:00
+P >
+経過観察
+2024/05/28(火)
+整形外科 担当医 外来 10:00
+A >
+改善傾向"""
+
+    def test_split_at_date_headers(self):
+        """日付行の先頭で分割されることのテスト"""
+        chunks = split_at_date_headers(self.SAMPLE_TEXT, 3)
+
+        assert "".join(chunks) == self.SAMPLE_TEXT
+        assert len(chunks) > 1
+        assert all(classify_line(chunk.split("\n", 1)[0].strip())[0] == LINE_DATE for chunk in chunks)
+
+    def test_parallel_records_match_serial(self):
+        """並列解析のレコードが逐次解析と一致することのテスト"""
+        parser = MedicalTextParser()
+        expected = parser.feed(self.SAMPLE_TEXT) + parser.close()
+
+        for chunk_count in (1, 2, 3, 4):
+            records = list(iter_medical_records_parallel(self.SAMPLE_TEXT, workers=2, chunk_count=chunk_count))
+            assert records == expected
+
+    def test_parse_medical_text_with_workers(self, monkeypatch):
+        """workers指定時の出力が逐次解析と同一であることのテスト"""
+        monkeypatch.setattr('services.txt_parse.PARALLEL_MIN_CHUNK_SIZE', 64)
+        expected = parse_medical_text(self.SAMPLE_TEXT)
+
+        result = parse_medical_text(self.SAMPLE_TEXT, workers=2)
+
+        assert json.dumps(result, ensure_ascii=False) == json.dumps(expected, ensure_ascii=False)
+        assert result[0]['subject'] == '頭痛があります\n頭痛があります\n追加の記載'
+        assert '本文のみの行は前のチャンクの状態を引き継ぐ' in result[0]['object']
+
+
 class TestParseMedicalText:
     """医療テキスト解析のテスト"""
     
@@ -279,5 +597,144 @@ S >
         # 入院日数は日付パースで処理されるが、現在の実装では特別な処理はなし
 
 
+class TestMedicalTextParser:
+    """逐次パーサーのテスト"""
+
+    SAMPLE_TEXT = """2024/05/26(日)
+内科    担当医    外来    14:30
+S >
+頭痛があります
+O >
+血圧 130/80
+2024/05/27(月)
+外科    担当医    外来    09:00
+S >
+腹痛があります
+"""
+
+    def test_feed_emits_completed_records(self):
+        """確定したレコードがfeed時点で返されるテスト"""
+        parser = MedicalTextParser()
+
+        records = parser.feed("2024/05/26(日)\n内科 担当医 外来 14:30\nS >\n頭痛があります\n")
+        assert records == []
+
+        records = parser.feed("O >\n")
+        assert len(records) == 1
+        assert records[0].soap_section == 'S'
+        assert records[0].content == '頭痛があります'
+
+    def test_records_are_compact_tuples(self):
+        """レコードが辞書ではなくタプルで、見出しの文字列を共有することのテスト"""
+        parser = MedicalTextParser()
+        records = parser.feed(self.SAMPLE_TEXT.replace("2024/05/27(月)", "2024/05/26(日)"))
+        records.extend(parser.close())
+
+        assert all(type(record) is SoapRecord for record in records)
+        assert records[0] == ('2024/05/26(日)', '内科', '14:30', 'S', '頭痛があります')
+        assert records[0].date is records[2].date
+        assert records[0].soap_section is records[2].soap_section
+        assert pickle.loads(pickle.dumps(records)) == records
+
+    def test_records_from_dicts(self):
+        """辞書のレコードでもグループ化の結果が変わらないことのテスト"""
+        parser = MedicalTextParser()
+        records = parser.feed(self.SAMPLE_TEXT)
+        records.extend(parser.close())
+
+        from_records = RecordGrouper()
+        from_records.add_all(records)
+        from_dicts = RecordGrouper()
+        from_dicts.add_all(record._asdict() for record in records)
+
+        assert from_dicts.result() == from_records.result() == parse_medical_text(self.SAMPLE_TEXT)
+
+    def test_close_flushes_open_record(self):
+        """close時に未確定レコードが出力されるテスト"""
+        parser = MedicalTextParser()
+        parser.feed("2024/05/26(日)\n内科 担当医 外来 14:30\nS >\n頭痛があります")
+
+        records = parser.close()
+
+        assert len(records) == 1
+        assert records[0].content == '頭痛があります'
+
+    def test_pending_records_do_not_change_state(self):
+        """未確定レコードの取り出しが解析状態を変更しないことのテスト"""
+        parser = MedicalTextParser()
+        parser.feed("2024/05/26(日)\n内科 担当医 外来 14:30\nS >\n頭痛が\nあります")
+
+        assert [record.content for record in parser.pending_records()] == ['頭痛が\nあります']
+        assert parser.pending_records() == parser.pending_records()
+
+        records = parser.feed("\n続き\n") + parser.close()
+
+        assert [record.content for record in records] == ['頭痛が\nあります\n続き']
+
+    def test_chunk_boundaries_do_not_change_result(self):
+        """チャンク分割位置に依存しないことのテスト"""
+        whole = MedicalTextParser()
+        expected = whole.feed(self.SAMPLE_TEXT) + whole.close()
+
+        for size in (1, 2, 3, 7, 16):
+            parser = MedicalTextParser()
+            records = []
+            for i in range(0, len(self.SAMPLE_TEXT), size):
+                records.extend(parser.feed(self.SAMPLE_TEXT[i:i + size]))
+            records.extend(parser.close())
+            assert records == expected
+
+    def test_crlf_and_indented_markers(self):
+        """CRLF改行やインデントされた見出し行の解析テスト"""
+        text = "  2024/05/26(日)\r\n\t内科 担当医 外来 14:30\r\n  S >\r\n  頭痛があります\r\n\r\n  経過観察\r\n"
+        parser = MedicalTextParser()
+
+        records = parser.feed(text) + parser.close()
+
+        assert len(records) == 1
+        assert records[0].department == '内科'
+        assert records[0].content == '頭痛があります\n経過観察'
+
+    def test_content_line_with_time_stays_content(self):
+        """時刻を含む本文行が見出しと誤認されないことのテスト"""
+        text = "2024/05/26(日)\n内科 担当医 外来 14:30\nS >\n10:30に内服\n服薬後 10:45 に改善\n"
+        parser = MedicalTextParser()
+
+        records = parser.feed(text) + parser.close()
+
+        assert len(records) == 1
+        assert records[0].content == '10:30に内服\n服薬後 10:45 に改善'
+
+    def test_large_content_is_built_in_blocks(self, monkeypatch):
+        """巨大な本文をブロック単位で整形しても結果が変わらないことのテスト"""
+        body = "".join(f"  記載{i}  \n\n" for i in range(200))
+        text = "2024/05/26(日)\n内科 担当医 外来 14:30\nS >\n" + body
+
+        expected_parser = MedicalTextParser()
+        expected = expected_parser.feed(text) + expected_parser.close()
+
+        monkeypatch.setattr('services.txt_parse.CONTENT_BLOCK_SIZE', 16)
+        parser = MedicalTextParser()
+        records = parser.feed(text) + parser.close()
+
+        assert records == expected
+        assert records[0].content == "\n".join(f"記載{i}" for i in range(200))
+
+    def test_open_record_does_not_keep_whole_chunk(self):
+        """持ち越す本文がチャンク全体を参照しないことのテスト"""
+        parser = MedicalTextParser()
+        parser.feed("2024/05/26(日)\n内科 担当医 外来 14:30\nS >\n頭痛\n" + "x" * 100000 + "\nO >\n")
+        parser.feed("経過良好\n")
+
+        assert parser._carried_content == ["経過良好"]
+
+    def test_iter_medical_records_from_stream(self):
+        """ストリームからのレコード読み出しテスト"""
+        records = list(iter_medical_records(StringIO(self.SAMPLE_TEXT), chunk_size=5))
+
+        assert [record.soap_section for record in records] == ['S', 'O', 'S']
+        assert records[2].date == '2024/05/27(月)'
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -1,7 +1,8 @@
 import configparser
 import os
 import sys
-from typing import Any
+from dataclasses import dataclass, field, fields
+from typing import Any, Optional, Tuple
 
 
 def get_config_path():
@@ -16,7 +17,51 @@ def get_config_path():
 CONFIG_PATH = get_config_path()
 
 
-def load_config() -> configparser.ConfigParser:
+_cached_config: Optional[configparser.ConfigParser] = None
+_cached_stamp: Optional[Tuple[int, int]] = None
+_cached_settings: Optional[Tuple[configparser.ConfigParser, 'AppSettings']] = None
+
+
+@dataclass(frozen=True)
+class AppSettings:
+    window_width: int = 1100
+    window_height: int = 800
+    main_window_position: str = '+10+10'
+    editor_width: int = 800
+    editor_height: int = 800
+    editor_window_position: str = '+10+10'
+    text_area_font_size: int = 11
+    text_area_font_name: str = 'Yu Gothic UI'
+    button_width: int = 15
+    button_height: int = 2
+    operation_file_path: str = field(default='', metadata={'section': 'Paths'})
+    soap_copy_file_path: str = field(default='', metadata={'section': 'Paths'})
+    helper_timeout: int = field(default=30, metadata={'section': 'Automation'})
+    helper_server_path: str = field(default='', metadata={'section': 'Automation'})
+    collect_parse_stats: int = field(default=0, metadata={'section': 'Diagnostics'})
+
+    @classmethod
+    def from_config(cls, config: configparser.ConfigParser) -> 'AppSettings':
+        # 型に合わせて値を変換し、未設定の項目は既定値を使う
+        values: dict[str, Any] = {}
+        for setting in fields(cls):
+            section = setting.metadata.get('section', 'Appearance')
+            if setting.type in (int, 'int'):
+                values[setting.name] = config.getint(section, setting.name, fallback=setting.default)
+            else:
+                values[setting.name] = config.get(section, setting.name, fallback=setting.default)
+        return cls(**values)
+
+
+def _get_file_stamp() -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(CONFIG_PATH)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_config() -> configparser.ConfigParser:
     config = configparser.ConfigParser()
     try:
         with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
@@ -33,7 +78,40 @@ def load_config() -> configparser.ConfigParser:
     return config
 
 
+def load_config() -> configparser.ConfigParser:
+    # 解析済みの設定をプロセス内で共有し、ファイルの更新日時とサイズが変わった場合だけ読み直す
+    global _cached_config, _cached_stamp
+
+    stamp = _get_file_stamp()
+    if _cached_config is not None and stamp is not None and stamp == _cached_stamp:
+        return _cached_config
+
+    config = _read_config()
+    _cached_config = config
+    _cached_stamp = stamp
+    return config
+
+
+def load_settings() -> AppSettings:
+    global _cached_settings
+
+    config = load_config()
+    if _cached_settings is None or _cached_settings[0] is not config:
+        _cached_settings = (config, AppSettings.from_config(config))
+    return _cached_settings[1]
+
+
+def clear_config_cache():
+    global _cached_config, _cached_stamp, _cached_settings
+
+    _cached_config = None
+    _cached_stamp = None
+    _cached_settings = None
+
+
 def save_config(config: configparser.ConfigParser):
+    global _cached_config, _cached_stamp, _cached_settings
+
     try:
         with open(CONFIG_PATH, 'w', encoding='utf-8') as configfile:
             config.write(configfile)
@@ -43,3 +121,8 @@ def save_config(config: configparser.ConfigParser):
     except IOError as e:
         print(f"設定ファイルの保存中にエラーが発生しました: {e}")
         raise
+
+    # 保存した内容をそのままキャッシュとし、次回の読み込みでファイルを開かない
+    _cached_config = config
+    _cached_stamp = _get_file_stamp()
+    _cached_settings = None